@@ -0,0 +1,88 @@
+"""译文缓存基准 — W-TinyLFU（src/cache.py）与旧版「dict + 满时排序删一半」对比
+
+Zipf 分布的重复消息混入大量一次性消息，报告命中率、单次操作耗时与最慢一次写入（淘汰停顿）。
+
+用法: python bench/bench_cache.py [操作数 200000] [容量条数 50000]
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.cache import TranslationCache, entry_size, make_key  # noqa: E402
+
+ONE_OFF_RATIO = 0.5  # 一次性消息比例
+ZIPF_S = 1.1
+
+
+class LegacyCache:
+    """旧实现：hash(text) 为键，满时按时间戳排序删除最旧一半，查找时才过期"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size, self.ttl = max_size, ttl
+        self.data: dict[str, dict] = {}
+        self.hits = self.misses = 0
+
+    def get(self, text: str):
+        entry = self.data.get(f"deepseek::中文:{hash(text)}")
+        if entry and time.time() - entry["_ts"] < self.ttl:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, text: str, result: dict):
+        if len(self.data) >= self.max_size:
+            for k in sorted(self.data, key=lambda k: self.data[k]["_ts"])[: self.max_size // 2]:
+                del self.data[k]
+        self.data[f"deepseek::中文:{hash(text)}"] = {**result, "_ts": time.time()}
+
+
+def workload(n: int, universe: int, rng: random.Random) -> list[str]:
+    weights = [1 / (i + 1) ** ZIPF_S for i in range(universe)]
+    popular = rng.choices(range(universe), weights=weights, k=n)
+    return [f"one-off message {i} {rng.random()}" if rng.random() < ONE_OFF_RATIO
+            else f"Frequently repeated message number {p}: see pinned rules." for i, p in enumerate(popular)]
+
+
+def run(name: str, texts: list[str], get, put):
+    worst = total = 0.0
+    for text in texts:
+        t0 = time.perf_counter()
+        if get(text) is None:
+            put(text, {"translation": f"译文 {text}", "detected_lang": "English", "target_lang": "中文",
+                       "engine": "deepseek", "latency": 0.5})
+        dt = time.perf_counter() - t0
+        total += dt
+        worst = max(worst, dt)
+    print(f"{name:<12}{total / len(texts) * 1e6:>10.2f}{worst * 1000:>12.2f}", end="")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    texts = workload(n, capacity * 4, random.Random(1))
+
+    legacy = LegacyCache(capacity, ttl=3600)
+    # 按旧实现同等条目数折算字节预算
+    sample = {"translation": "译文 " + texts[0], "detected_lang": "English", "target_lang": "中文",
+              "engine": "deepseek", "latency": 0.5}
+    cache = TranslationCache(capacity * entry_size(sample), ttl=3600)
+
+    print(f"操作: {n:,} | 容量: {capacity:,} 条 | 一次性消息 {ONE_OFF_RATIO:.0%}")
+    print(f"{'实现':<12}{'µs/次':>10}{'最慢 ms':>12}{'命中率':>9}")
+    run("legacy", texts, legacy.get, legacy.put)
+    print(f"{legacy.hits / (legacy.hits + legacy.misses):>9.1%}")
+    run("w-tinylfu", texts, lambda t: cache.get(make_key(t, "中文", "deepseek")),
+        lambda t, r: cache.put(make_key(t, "中文", "deepseek"), r))
+    s = cache.snapshot()
+    print(f"{s['hit_rate']:>9.1%}")
+    print(f"\nw-tinylfu: {s['entries']:,} 条 / {s['bytes'] / 1048576:.1f}MB | 淘汰 {s['evictions']:,}"
+          f" | 拒入 {s['rejected']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""处理器端到端基准 — 合成 Telegram 更新经真实 Application 分发，统计吞吐 / 分段耗时 / 内存增长
+
+私聊 / 群组文本、图片说明、命令、回调按比例混合，经 main.register_handlers 注册的处理器处理，
+与线上相同经 ChatOrderedProcessor 分发（同一聊天按顺序，--concurrency 为并发上限）；
+Bot API 请求由假传输层记录并立即返回，翻译引擎为进程内桩（可设延迟）。
+数据目录使用临时目录。频率限制各级上限关闭，仍走完整检查逻辑。
+
+用法: python bench/bench_handlers.py [--updates 5000] [--concurrency 64] [--provider-latency-ms 0]
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import store  # noqa: E402
+
+_tmp = tempfile.TemporaryDirectory()
+store.DATA_DIR = Path(_tmp.name)
+for _name in ("SETTINGS_FILE", "STATS_FILE", "LATENCY_FILE", "TM_FILE", "CACHE_FILE"):
+    setattr(store, _name, store.DATA_DIR / getattr(store, _name).name)
+
+from telegram import Update  # noqa: E402
+from telegram.ext import ApplicationBuilder  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+from src import handlers, translator  # noqa: E402
+from src.dispatcher import ChatOrderedProcessor  # noqa: E402
+from src.config import Config  # noqa: E402
+from src.main import register_handlers  # noqa: E402
+from src.providers import PROVIDER_MODELS, BaseProvider  # noqa: E402
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+ADMINS = list(range(1000, 1050))
+GROUPS = list(range(-100200, -100100))
+SENTENCES = [
+    f"Message {i}: the meeting has been moved to Thursday afternoon, please check the channel."
+    for i in range(300)
+]
+# 更新类型权重
+MIX = {"private": 55, "group": 20, "caption": 10, "command": 10, "callback": 5}
+COMMANDS = ("/status", "/help", "/settings", "/id", "/translate good morning everyone")
+CALLBACKS = ("settings:lang", "settings:provider", "settings:back", "lang:English", "lang:中文")
+
+
+class FakeRequest(BaseRequest):
+    """假 Bot API 传输层：记录调用并返回合法响应"""
+
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        self._message_id = 0
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        params = request_data.parameters if request_data else {}
+        if endpoint == "getMe":
+            result = BOT_USER
+        elif endpoint in ("sendMessage", "editMessageText"):
+            self._message_id += 1
+            chat_id = int(params.get("chat_id", 0))
+            result = {
+                "message_id": params.get("message_id", self._message_id), "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                "from": BOT_USER, "text": params.get("text", ""),
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class StubProvider(BaseProvider):
+    """进程内翻译引擎桩"""
+
+    def __init__(self, latency: float):
+        self.name, self.model, self.latency = "deepseek", PROVIDER_MODELS["deepseek"], latency
+
+    async def _complete(self, system, user):
+        return ""
+
+    async def translate(self, text, target_lang, source_lang="auto"):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {"detected_lang": "English", "translation": f"【译】{text}"}
+
+
+def _user(uid: int) -> dict:
+    return {"id": uid, "is_bot": False, "first_name": f"u{uid}"}
+
+
+def make_update(i: int, kind: str, rng: random.Random) -> dict:
+    uid = rng.choice(ADMINS)
+    now = int(time.time())
+    chat = ({"id": rng.choice(GROUPS), "type": "supergroup", "title": "bench"} if kind == "group"
+            else {"id": uid, "type": "private"})
+    message = {"message_id": i, "date": now, "chat": chat, "from": _user(uid)}
+    if kind == "callback":
+        return {"update_id": i, "callback_query": {
+            "id": str(i), "from": _user(uid), "chat_instance": "bench", "data": rng.choice(CALLBACKS),
+            "message": {**message, "from": BOT_USER, "text": "⚙️"},
+        }}
+    if kind == "command":
+        text = rng.choice(COMMANDS)
+        message.update(text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}])
+    elif kind == "caption":
+        message.update(caption=rng.choice(SENTENCES),
+                       photo=[{"file_id": "f", "file_unique_id": "u", "width": 1, "height": 1}])
+    else:
+        message["text"] = rng.choice(SENTENCES)
+    return {"update_id": i, "message": message}
+
+
+class PhaseTimer:
+    """包装 handlers 模块内的函数，累计各阶段耗时"""
+
+    def __init__(self, names: tuple[str, ...]):
+        self.total: dict[str, float] = defaultdict(float)
+        self.count: Counter[str] = Counter()
+        for name in names:
+            setattr(handlers, name, self._wrap(name, getattr(handlers, name)))
+
+    def _wrap(self, name, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def timed_async(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.total[name] += time.perf_counter() - t0
+                    self.count[name] += 1
+            return timed_async
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.total[name] += time.perf_counter() - t0
+                self.count[name] += 1
+        return timed
+
+    def reset(self):
+        self.total.clear()
+        self.count.clear()
+
+
+async def drive(app, updates: list[tuple[str, dict]], concurrency: int) -> tuple[float, dict[str, list[float]]]:
+    sem = asyncio.Semaphore(concurrency)
+    per_kind: dict[str, list[float]] = defaultdict(list)
+
+    async def one(kind: str, data: dict):
+        update = Update.de_json(data, app.bot)
+        async with sem:
+            t0 = time.perf_counter()
+            await app.update_processor.process_update(update, app.process_update(update))
+            per_kind[kind].append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(k, d) for k, d in updates))
+    return time.perf_counter() - start, per_kind
+
+
+def _q(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+async def main_async(args):
+    Config.PROVIDER_KEYS = {"deepseek": "stub"}
+    Config.DEFAULT_PROVIDER = "deepseek"
+    Config.ADMIN_USER_IDS[:] = ADMINS
+    for tier in handlers._rate_limiter.tiers.values():
+        tier.limit = 0  # 不限频率，只测处理路径
+    Config.STREAM_TRANSLATION = Config.TM_ENABLED = False
+    translator._provider_cache[("deepseek", PROVIDER_MODELS["deepseek"])] = StubProvider(args.provider_latency_ms / 1000)
+    for gid in GROUPS:
+        store.set_chat_config(gid, {"auto_translate": True})
+
+    fake = FakeRequest()
+    app = (ApplicationBuilder().token("123456:BENCH").request(fake).get_updates_request(FakeRequest())
+           .concurrent_updates(ChatOrderedProcessor(args.concurrency)).build())
+    register_handlers(app)
+    timer = PhaseTimer(("get_chat_config", "_check_rate_limit", "_get_cached", "_set_cache", "translate_text",
+                        "_escape_md", "_safe_reply", "record_translation"))
+
+    rng = random.Random(7)
+    kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=args.updates)
+    updates = [(k, make_update(i, k, rng)) for i, k in enumerate(kinds)]
+
+    async with app:
+        await drive(app, updates[: min(500, len(updates))], args.concurrency)  # 预热
+        timer.reset()
+        fake.calls.clear()
+
+        elapsed, per_kind = await drive(app, updates, args.concurrency)
+        print(f"更新: {len(updates):,} | 并发 {args.concurrency} | 引擎桩延迟 {args.provider_latency_ms}ms")
+        print(f"吞吐: {len(updates) / elapsed:,.0f} 更新/秒（{elapsed:.2f}s）\n")
+        print(f"{'类型':<9}{'数量':>7}{'p50 ms':>9}{'p99 ms':>9}")
+        for kind, values in sorted(per_kind.items()):
+            print(f"{kind:<9}{len(values):>7}{_q(values, 0.5):>9.2f}{_q(values, 0.99):>9.2f}")
+        print(f"\n{'阶段':<20}{'次数':>7}{'合计 ms':>10}{'单次 µs':>9}")
+        for name, total in sorted(timer.total.items(), key=lambda kv: -kv[1]):
+            n = timer.count[name]
+            print(f"{name:<20}{n:>7}{total * 1000:>10.1f}{total / n * 1e6:>9.1f}")
+        print("\nBot API 调用: " + ", ".join(f"{k} {v}" for k, v in fake.calls.most_common()))
+
+        # 内存增长：同一批更新再跑一轮（tracemalloc 会显著拖慢，单独统计）
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        await drive(app, updates, args.concurrency)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        own = tracemalloc.Filter(False, __file__)  # 排除基准脚本自身的统计列表
+        stats = after.filter_traces([own]).compare_to(before.filter_traces([own]), "lineno")
+        growth = sum(s.size_diff for s in stats)
+        print(f"\n内存增长: {growth / 1024:,.1f} KiB / {len(updates):,} 更新（{growth / len(updates):.0f} B/更新）")
+        for s in stats[:5]:
+            print(f"  {s.size_diff / 1024:>8.1f} KiB  {s.traceback[0].filename.rsplit('/', 2)[-1]}:{s.traceback[0].lineno}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="处理器端到端基准")
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--provider-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""本地语言识别基准 — /lang 15 种快捷语言的准确率与单条耗时（微秒）
+
+「预判」列为 detect_unambiguous（调用前切换目标语言所用）的 命中/给出结果 条数，
+另列出共用文字的相近语言，预判应全部放弃。
+
+用法: python bench/bench_langid.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.langid import detect, detect_unambiguous, MIN_CONFIDENCE  # noqa: E402
+
+SAMPLES: dict[str, list[str]] = {
+    "中文": [
+        "今天天气很好，我们一起去公园散步吧。",
+        "这个项目下周一上线，请大家提前做好准备",
+        "群规：禁止发广告，违者直接踢出",
+        "我用 Python 写了一个小工具",
+    ],
+    "English": [
+        "The meeting has been moved to Thursday afternoon.",
+        "Can you send me the report before the end of the day?",
+        "I think this is the best price we can get right now",
+        "Thanks for the update, will check it later",
+    ],
+    "日本語": [
+        "明日の会議は午後三時からです。",
+        "このプロジェクトについてどう思いますか？",
+        "ありがとうございます、よろしくお願いします",
+        "東京駅で待っています",
+    ],
+    "한국어": [
+        "오늘 회의는 오후 세 시에 시작합니다.",
+        "이 프로젝트에 대해 어떻게 생각하세요?",
+        "감사합니다 좋은 하루 보내세요",
+        "내일 서울에서 만나요",
+    ],
+    "Русский": [
+        "Встреча перенесена на четверг.",
+        "Спасибо за информацию, я посмотрю позже.",
+        "Сколько стоит доставка в Москву?",
+        "Привет, как дела?",
+    ],
+    "Français": [
+        "La réunion est reportée à jeudi après-midi.",
+        "Je pense que c'est le meilleur prix pour nous.",
+        "Merci pour votre message, je vous réponds demain.",
+        "Est-ce que vous avez reçu le colis ?",
+    ],
+    "Español": [
+        "La reunión se ha movido al jueves por la tarde.",
+        "¿Puedes enviarme el informe antes del final del día?",
+        "Creo que este es el mejor precio que podemos conseguir.",
+        "Gracias por la información, lo reviso más tarde",
+    ],
+    "Deutsch": [
+        "Das Treffen wurde auf Donnerstag verschoben.",
+        "Kannst du mir den Bericht bis heute Abend schicken?",
+        "Ich glaube, das ist der beste Preis, den wir bekommen können.",
+        "Vielen Dank für die schnelle Antwort",
+    ],
+    "Português": [
+        "A reunião foi adiada para quinta-feira à tarde.",
+        "Você pode me enviar o relatório antes do fim do dia?",
+        "Acho que este é o melhor preço que conseguimos agora.",
+        "Obrigado pela informação, vou verificar depois",
+    ],
+    "العربية": [
+        "تم تأجيل الاجتماع إلى يوم الخميس.",
+        "هل يمكنك إرسال التقرير قبل نهاية اليوم؟",
+        "شكرا جزيلا على المساعدة",
+        "مرحبا كيف حالك",
+    ],
+    "ไทย": [
+        "การประชุมถูกเลื่อนไปเป็นวันพฤหัสบดี",
+        "คุณช่วยส่งรายงานให้ฉันก่อนสิ้นวันได้ไหม",
+        "ขอบคุณมากครับ",
+        "สวัสดีค่ะ วันนี้อากาศดีมาก",
+    ],
+    "Tiếng Việt": [
+        "Cuộc họp đã được dời sang chiều thứ Năm.",
+        "Bạn có thể gửi cho tôi báo cáo trước cuối ngày không?",
+        "Cảm ơn bạn rất nhiều",
+        "Hôm nay trời đẹp quá",
+    ],
+    "Italiano": [
+        "La riunione è stata spostata a giovedì pomeriggio.",
+        "Puoi mandarmi il rapporto prima della fine della giornata?",
+        "Penso che questo sia il prezzo migliore che possiamo ottenere.",
+        "Grazie per le informazioni, ci guardo più tardi",
+    ],
+    "Bahasa Indonesia": [
+        "Rapat dipindahkan ke hari Kamis sore.",
+        "Bisakah kamu mengirim laporan itu sebelum akhir hari?",
+        "Saya pikir ini adalah harga terbaik yang bisa kita dapatkan.",
+        "Terima kasih atas informasinya, nanti saya cek",
+    ],
+    "हिन्दी": [
+        "बैठक गुरुवार दोपहर तक के लिए स्थगित कर दी गई है।",
+        "क्या आप दिन के अंत से पहले रिपोर्ट भेज सकते हैं?",
+        "बहुत बहुत धन्यवाद",
+        "आज मौसम बहुत अच्छा है",
+    ],
+}
+
+# 与快捷语言共用文字 / 词形相近的语言：预判必须返回 None
+LOOKALIKES = [
+    "Привіт усім, як справи?",  # 乌克兰语
+    "Здравейте на всички, как сте?",  # 保加利亚语
+    "東京駅",  # 纯汉字日文
+    "東京都庁",  # 纯汉字日文
+    "سلام به همه، حال شما چطور است؟",  # 波斯语
+    "Merhaba herkese, nasılsınız? Bugün hava çok güzel.",  # 土耳其语
+    "Bună ziua tuturor, ce mai faceți? Mă bucur să vă văd.",  # 罗马尼亚语
+    "Hallo allemaal, hoe gaat het met jullie vandaag?",  # 荷兰语
+]
+
+ROUNDS = 2000
+
+
+def main():
+    total = correct = confident = confident_correct = sure = sure_correct = 0
+    print(f"{'语言':<18}{'准确率':>8}{'置信命中':>10}{'预判':>8}{'µs/条':>10}")
+    for lang, texts in SAMPLES.items():
+        ok = conf_ok = conf_n = sure_ok = sure_n = 0
+        for t in texts:
+            got, conf = detect(t)
+            ok += got == lang
+            if conf >= MIN_CONFIDENCE:
+                conf_n += 1
+                conf_ok += got == lang
+            pre = detect_unambiguous(t)
+            if pre is not None:
+                sure_n += 1
+                sure_ok += pre == lang
+            if got != lang:
+                print(f"  ✗ {lang}: {t!r} → {got} ({conf:.2f})")
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            for t in texts:
+                detect(t)
+        us = (time.perf_counter() - start) / (ROUNDS * len(texts)) * 1e6
+        print(f"{lang:<18}{ok / len(texts):>8.0%}{f'{conf_ok}/{conf_n}':>10}{f'{sure_ok}/{sure_n}':>8}{us:>10.1f}")
+        total += len(texts)
+        correct += ok
+        confident += conf_n
+        confident_correct += conf_ok
+        sure += sure_n
+        sure_correct += sure_ok
+    print(f"\n总体准确率: {correct / total:.1%} ({correct}/{total})")
+    print(f"高置信 (≥{MIN_CONFIDENCE}) 准确率: {confident_correct}/{confident}，覆盖 {confident / total:.0%}")
+    print(f"预判准确率: {sure_correct}/{sure}，覆盖 {sure / total:.0%}")
+    wrong = [(t, detect_unambiguous(t)) for t in LOOKALIKES if detect_unambiguous(t) is not None]
+    print(f"相近语言误判: {len(wrong)}/{len(LOOKALIKES)}")
+    for t, got in wrong:
+        print(f"  ✗ {t!r} → {got}")
+
+
+if __name__ == "__main__":
+    main()
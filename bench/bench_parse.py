@@ -0,0 +1,92 @@
+"""响应解析基准 — 新旧 parse_response 的单条耗时（微秒）与回退率
+
+语料为各引擎实际出现过的输出形态：结构化输出、代码块包裹、前后说明文字、
+字符串内裸换行、达到 max_tokens 被截断、纯文本等。
+回退率 = 译文解析错误（把 JSON 原样当译文）或源语言丢失（"未知"）的比例。
+
+用法: python bench/bench_parse.py [重复次数]
+"""
+
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.providers.base import BaseProvider  # noqa: E402
+
+# (原始输出, 期望译文, 期望源语言)；权重大致对应线上比例
+CORPUS: list[tuple[str, str, str, int]] = [
+    ('{"detected_lang": "English", "translation": "会议改到周四下午。"}', "会议改到周四下午。", "English", 60),
+    ('{"detected_lang":"中文","translation":"The project goes live next Monday."}',
+     "The project goes live next Monday.", "中文", 20),
+    ('```json\n{"detected_lang": "日本語", "translation": "明天的会议从下午三点开始。"}\n```',
+     "明天的会议从下午三点开始。", "日本語", 5),
+    ('Here is the translation:\n{"detected_lang": "Русский", "translation": "谢谢你的帮助！"}',
+     "谢谢你的帮助！", "Русский", 3),
+    ('{"detected_lang": "English", "translation": "第一行\n第二行\n第三行"}', "第一行\n第二行\n第三行", "English", 4),
+    ('{"detected_lang": "English", "translation": "用 {name} 替换 \\"占位符\\""}',
+     '用 {name} 替换 "占位符"', "English", 2),
+    ('{"detected_lang": "English", "translation": "这是一段很长的文本，输出在中途被截', "这是一段很长的文本，输出在中途被截", "English", 2),
+    ("Translation: 今天天气很好", "今天天气很好", "未知", 2),
+    ('{"detected_lang": "Deutsch", "translation": "请阅读群规。"} Note: formal register kept.',
+     "请阅读群规。", "Deutsch", 2),
+]
+
+
+def legacy_parse(raw: str) -> dict:
+    """旧实现（对照基线）"""
+    raw = raw.strip()
+    raw = re.sub(r'^```(?:json)?\s*', '', raw)
+    raw = re.sub(r'\s*```$', '', raw)
+    raw = raw.strip()
+    try:
+        data = json.loads(raw)
+        if isinstance(data, dict) and "translation" in data:
+            return {"detected_lang": data.get("detected_lang", "未知"), "translation": data["translation"]}
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r'\{[^{}]*"translation"\s*:\s*"((?:[^"\\]|\\.)*)"[^{}]*\}', raw, re.DOTALL)
+    if match:
+        try:
+            data = json.loads(match.group(0))
+            return {"detected_lang": data.get("detected_lang", "未知"), "translation": data["translation"]}
+        except json.JSONDecodeError:
+            pass
+    cleaned = raw
+    for prefix in ['翻译：', '翻译:', 'Translation:', 'Translation：']:
+        if cleaned.startswith(prefix):
+            cleaned = cleaned[len(prefix):].strip()
+    cleaned = re.sub(r'</?text_to_translate>', '', cleaned).strip()
+    return {"detected_lang": "未知", "translation": cleaned}
+
+
+def run(parse, samples: list[tuple[str, str, str]], repeat: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw, _, _ in samples:
+            parse(raw)
+    us = (time.perf_counter() - start) / (repeat * len(samples)) * 1e6
+    bad = 0
+    for raw, translation, lang in samples:
+        r = parse(raw)
+        bad += r["translation"] != translation or r["detected_lang"] != lang
+    return us, bad / len(samples)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    samples = [(raw, t, lang) for raw, t, lang, weight in CORPUS for _ in range(weight)]
+    fast = [s for s in samples if s[0].startswith("{")][:1]
+
+    print(f"语料: {len(samples)} 条（{len(CORPUS)} 种形态）")
+    for name, parse in (("旧解析", legacy_parse), ("新解析", BaseProvider.parse_response)):
+        us, fallback = run(parse, samples, repeat)
+        fast_us, _ = run(parse, fast, repeat * 50)
+        print(f"{name}: {us:6.2f} µs/条 | 规范 JSON {fast_us:5.2f} µs | 回退率 {fallback:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""翻译记忆基准 — 精确 / 宽松查找与写入的单条耗时（微秒），使用临时数据库
+
+用法: python bench/bench_tm.py [句段数量]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.tm import TranslationMemory  # noqa: E402
+
+WORDS = ("group rules message please read before posting spam links ads admin welcome new member "
+         "thanks support channel bot command update release price meeting tomorrow").split()
+
+
+def make_sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(1)
+    sentences = list({make_sentence(rng) for _ in range(n)})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = TranslationMemory(Path(tmp) / "tm.sqlite3")
+        start = time.perf_counter()
+        for i in range(0, len(sentences), 100):
+            memory.store([(s, f"译文 {s}", "English", "bench") for s in sentences[i:i + 100]], "中文")
+        write_us = (time.perf_counter() - start) / len(sentences) * 1e6
+
+        probes = rng.sample(sentences, min(1000, len(sentences)))
+        start = time.perf_counter()
+        exact = sum(memory.lookup(s, "中文") is not None for s in probes)
+        exact_us = (time.perf_counter() - start) / len(probes) * 1e6
+
+        # 宽松：句末标点改为感叹号、多一个空格并改为大写
+        variants = [s[:-1].upper() + " !" for s in probes]
+        start = time.perf_counter()
+        fuzzy = sum(memory.lookup(s, "中文") is not None for s in variants)
+        fuzzy_us = (time.perf_counter() - start) / len(variants) * 1e6
+
+        misses = [make_sentence(rng) + " zzz" for _ in range(len(probes))]
+        start = time.perf_counter()
+        for s in misses:
+            memory.lookup(s, "中文")
+        miss_us = (time.perf_counter() - start) / len(misses) * 1e6
+        memory.close()
+
+    print(f"句段数: {len(sentences):,}")
+    print(f"写入:     {write_us:8.1f} µs/句")
+    print(f"精确命中: {exact_us:8.1f} µs/句  ({exact}/{len(probes)})")
+    print(f"宽松命中: {fuzzy_us:8.1f} µs/句  ({fuzzy}/{len(variants)})")
+    print(f"未命中:   {miss_us:8.1f} µs/句")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""翻译吞吐基准 — 经本地压测桩（bench/mock_provider.py）驱动 translate_text，逐级提高并发
+
+报告各并发级别的吞吐、p50/p95/p99 延迟、降级次数与失败数。不消耗 API 额度，
+数据目录使用临时目录，不影响 data/。
+
+用法: python bench/bench_translate.py [--engines deepseek,gemini] [--requests 200] [--concurrency 1,4,16,64]
+                                     [--latency lognormal:300,0.5] [--error-rate 0.02] [--ratelimit-rate 0.01]
+                                     [--malformed-rate 0.02] [--url http://127.0.0.1:8999]
+未指定 --url 时在后台线程启动压测桩。
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_provider import MockProvider  # noqa: E402
+from src import store  # noqa: E402
+from src.config import Config  # noqa: E402
+from src.providers.openai_compatible import PROVIDER_CONFIGS  # noqa: E402
+
+_tmp = tempfile.TemporaryDirectory()
+store.DATA_DIR = Path(_tmp.name)
+for _name in ("SETTINGS_FILE", "STATS_FILE", "LATENCY_FILE", "TM_FILE", "CACHE_FILE"):
+    setattr(store, _name, store.DATA_DIR / getattr(store, _name).name)
+
+from src import translator  # noqa: E402
+
+
+def start_mock(args) -> str:
+    """在后台线程（独立事件循环）启动压测桩，返回地址"""
+    ready = threading.Event()
+    address = {}
+
+    async def run():
+        mock = MockProvider(args.latency, args.error_rate, args.ratelimit_rate, args.malformed_rate, seed=1)
+        server = await mock.start()
+        address["url"] = "http://127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+        ready.set()
+        async with server:
+            await server.serve_forever()
+
+    threading.Thread(target=lambda: asyncio.run(run()), daemon=True).start()
+    ready.wait()
+    return address["url"]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_level(primary: str, concurrency: int, n: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    fallbacks = failures = 0
+
+    async def one(i: int):
+        nonlocal fallbacks, failures
+        text = f"Message {concurrency}-{i}: the meeting has been moved to Thursday afternoon."
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await translator.translate_text(text, "中文", provider_name=primary)
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - t0)
+            fallbacks += r["engine"] != primary
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": n / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "fallbacks": fallbacks,
+        "failures": failures,
+    }
+
+
+async def main_async(args, url: str):
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    Config.PROVIDER_KEYS = {e: "mock" for e in engines}
+    Config.PROVIDER_BASE_URLS = {e: f"{url}/v1" if e in PROVIDER_CONFIGS else url for e in engines}
+    Config.TM_ENABLED = False
+
+    print(f"引擎: {', '.join(engines)}（主: {engines[0]}） | 每级 {args.requests} 请求 | 桩: {url}")
+    print(f"{'并发':>4} {'吞吐 req/s':>11} {'p50':>7} {'p95':>7} {'p99':>7} {'降级':>5} {'失败':>5}")
+    for c in [int(v) for v in args.concurrency.split(",")]:
+        r = await run_level(engines[0], c, args.requests)
+        print(f"{c:>4} {r['throughput']:>11.1f} {r['p50']:>6.2f}s {r['p95']:>6.2f}s {r['p99']:>6.2f}s "
+              f"{r['fallbacks']:>5} {r['failures']:>5}")
+    hedge = translator.get_hedge_stats()
+    print(f"对冲: {hedge['fired']} 次 / 备选胜出 {hedge['won']} | 限流: "
+          + " ".join(f"{e} {s['limit']}" for e, s in translator.get_limiter_states().items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="translate_text 吞吐基准")
+    parser.add_argument("--engines", default="deepseek,gemini")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--latency", default="lognormal:300,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ratelimit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--url", default=None, help="外部压测桩地址（缺省自动启动）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    url = args.url or start_mock(args)
+    asyncio.run(main_async(args, url))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""本地引擎压测桩 — 模拟 OpenAI chat/completions、Anthropic messages、Gemini generateContent 接口
+
+不消耗任何 API 额度：译文为原文加前缀，延迟按分布采样，可注入 5xx / 429 / 畸形 JSON。
+机器人或基准脚本把 <引擎>_BASE_URL 指向本服务即可：
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8999/v1
+    CLAUDE_BASE_URL=http://127.0.0.1:8999
+    GEMINI_BASE_URL=http://127.0.0.1:8999
+
+用法: python bench/mock_provider.py [--port 8999] [--latency lognormal:800,0.5]
+                                    [--error-rate 0.01] [--ratelimit-rate 0.01] [--malformed-rate 0.02]
+延迟分布: fixed:<ms> | uniform:<最小ms>,<最大ms> | lognormal:<中位数ms>,<sigma>
+GET /stats 返回请求与注入计数。流式请求不支持（返回 400）。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+from collections import Counter
+
+TRANSLATION_PREFIX = "【译】"
+_TEXT_RE = re.compile(r"<text_to_translate>\n(.*)\n</text_to_translate>", re.DOTALL)
+_BATCH_RE = re.compile(r"<texts_to_translate>\n(.*)\n</texts_to_translate>", re.DOTALL)
+_GEMINI_RE = re.compile(r"/models/([^/:]+):(generateContent|streamGenerateContent)")
+
+
+def parse_latency(spec: str):
+    """解析延迟分布，返回采样函数（秒）"""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median / 1000), sigma)
+    raise ValueError(f"未知延迟分布: {spec}")
+
+
+class MockProvider:
+    """请求处理：按路径区分接口格式，按概率注入故障"""
+
+    def __init__(self, latency: str = "lognormal:800,0.5", error_rate: float = 0.0,
+                 ratelimit_rate: float = 0.0, malformed_rate: float = 0.0, seed: int | None = None):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.ratelimit_rate = ratelimit_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.stats: Counter[str] = Counter()
+
+    # ── 请求 → (状态码, 响应头, 响应体) ──
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict, bytes]:
+        if method == "HEAD":
+            return 200, {}, b""
+        if method == "GET" and path.startswith("/stats"):
+            return 200, {}, json.dumps(self.stats).encode()
+        if method != "POST":
+            return 404, {}, b"{}"
+        try:
+            req = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return 400, {}, _error("invalid json")
+
+        if path.endswith("/chat/completions"):
+            fmt = "openai"
+        elif path.endswith("/messages"):
+            fmt = "anthropic"
+        elif _GEMINI_RE.search(path):
+            fmt = "gemini"
+        else:
+            return 404, {}, _error(f"unknown path {path}")
+        self.stats[fmt] += 1
+        if req.get("stream") or "streamGenerateContent" in path:
+            return 400, {}, _error("streaming is not supported by the mock")
+
+        await asyncio.sleep(self.sample_latency())
+        roll = self.rng.random()
+        if roll < self.ratelimit_rate:
+            self.stats["injected_429"] += 1
+            return 429, {"retry-after": "1"}, _error("rate limited (mock)")
+        if roll < self.ratelimit_rate + self.error_rate:
+            self.stats["injected_5xx"] += 1
+            return 503, {}, _error("overloaded (mock)")
+
+        user = _user_text(fmt, req)
+        content = _answer(user)
+        if self.rng.random() < self.malformed_rate:
+            self.stats["injected_malformed"] += 1
+            content = _malform(content, self.rng)
+        tool = fmt == "anthropic" and bool(req.get("tools"))
+        return 200, _ratelimit_headers(), json.dumps(_wrap(fmt, req, content, tool), ensure_ascii=False).encode()
+
+    # ── HTTP/1.1（keep-alive）──
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (h := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0) or 0))
+                status, extra, payload = await self.handle(method, path, body)
+                head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                        "Content-Type: application/json", f"Content-Length: {len(payload)}"]
+                head += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + (b"" if method == "HEAD" else payload))
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self.serve_client, host, port)
+
+
+def _error(message: str) -> bytes:
+    return json.dumps({"error": {"message": message, "type": "mock_error"}}).encode()
+
+
+def _user_text(fmt: str, req: dict) -> str:
+    if fmt == "gemini":
+        contents = req.get("contents") or [{}]
+        return "".join(p.get("text", "") for p in contents[-1].get("parts", []))
+    content = (req.get("messages") or [{}])[-1].get("content", "")
+    if isinstance(content, list):
+        content = "".join(b.get("text", "") for b in content if isinstance(b, dict))
+    return content
+
+
+def _answer(user: str) -> str:
+    """按提示格式生成 JSON 结果：批量为 translations 数组，否则单条"""
+    m = _BATCH_RE.search(user)
+    if m:
+        texts = json.loads(m.group(1))
+        items = [{"detected_lang": "English", "translation": TRANSLATION_PREFIX + t} for t in texts]
+        return json.dumps({"translations": items}, ensure_ascii=False)
+    m = _TEXT_RE.search(user)
+    text = m.group(1) if m else user
+    return json.dumps({"detected_lang": "English", "translation": TRANSLATION_PREFIX + text}, ensure_ascii=False)
+
+
+def _malform(content: str, rng: random.Random) -> str:
+    """线上见过的畸形输出：代码块包裹、前置说明、被截断"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"```json\n{content}\n```"
+    if kind == 1:
+        return f"Here is the translation:\n{content}"
+    return content[: max(1, len(content) * 2 // 3)]
+
+
+def _ratelimit_headers() -> dict:
+    return {"x-ratelimit-limit-requests": "10000", "x-ratelimit-remaining-requests": "9999"}
+
+
+def _wrap(fmt: str, req: dict, content: str, tool: bool) -> dict:
+    usage_in, usage_out = 300, max(1, len(content) // 4)
+    if fmt == "openai":
+        return {
+            "id": "mock", "object": "chat.completion", "created": 0, "model": req.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": usage_in, "completion_tokens": usage_out,
+                      "total_tokens": usage_in + usage_out},
+        }
+    if fmt == "anthropic":
+        if tool:
+            try:
+                block = {"type": "tool_use", "id": "toolu_mock", "name": req["tools"][0]["name"],
+                         "input": json.loads(content)}
+            except json.JSONDecodeError:
+                block = {"type": "text", "text": content}
+        else:
+            block = {"type": "text", "text": content}
+        return {
+            "id": "msg_mock", "type": "message", "role": "assistant", "model": req.get("model", "mock"),
+            "content": [block], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": usage_in, "output_tokens": usage_out,
+                      "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        }
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": content}]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": usage_in, "candidatesTokenCount": usage_out,
+                          "totalTokenCount": usage_in + usage_out},
+    }
+
+
+async def _main(args):
+    mock = MockProvider(args.latency, args.error_rate, args.ratelimit_rate, args.malformed_rate, args.seed)
+    server = await mock.start(args.host, args.port)
+    print(f"🧪 Mock 引擎已启动: http://{args.host}:{args.port}  延迟 {args.latency}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地引擎压测桩")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", default="lognormal:800,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ratelimit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -185,7 +185,7 @@ DEFAULT_PROVIDER=${DEFAULT_PROVIDER}
 DEFAULT_TARGET_LANG=${DEFAULT_LANG}
 
 # ========== 限制设置 ==========
-MAX_TEXT_LENGTH=5000
+MAX_TEXT_LENGTH=20000
 RATE_LIMIT_PER_MIN=30
 
 # 管理员用户 ID（多个用逗号分隔）
@@ -0,0 +1,167 @@
+"""微批处理 — 短时间窗口内同引擎/模型/目标语言的消息合并为一次请求
+
+繁忙群组每秒多条短消息，逐条请求会重复发送 ~300 token 的系统提示词，
+也更容易触发每分钟请求配额。批处理在窗口内收集待翻译消息，以 JSON 数组
+一次发送，再把结果按顺序分发回各个等待者。
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+from src import limiter
+from src.providers import BaseProvider, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Batch:
+    provider: BaseProvider
+    target: str
+    source: str
+    items: list[tuple[str, asyncio.Future]] = field(default_factory=list)
+    chars: int = 0
+    timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher:
+    """按 (引擎, 模型, 目标语言, 源语言) 聚合请求，窗口到期或攒满即发送"""
+
+    def __init__(self, window: float, max_items: int = 8, max_chars: int = 2000):
+        self.window = window
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self._pending: dict[tuple, _Batch] = {}
+        self._running: set[asyncio.Task] = set()  # 持有发送任务引用，防止被回收
+        self.stats = {"batches": 0, "batched_items": 0, "fallbacks": 0}
+
+    async def submit(self, provider: BaseProvider, text: str, target: str, source: str = "auto") -> dict:
+        """提交一条待翻译文本，返回与 provider.translate 相同格式的结果"""
+        # 长文本单独发送，不占用批次（仍经引擎限流排队）
+        if len(text) >= self.max_chars:
+            lim = limiter.get_limiter(provider.name)
+            await lim.acquire()
+            try:
+                return await provider.translate(text, target, source)
+            finally:
+                lim.release()
+
+        key = (provider.name, provider.model, target, source)
+        batch = self._pending.get(key)
+        if batch and batch.chars + len(text) > self.max_chars:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._pending[key] = _Batch(provider, target, source)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+        fut = asyncio.get_running_loop().create_future()
+        batch.items.append((text, fut))
+        batch.chars += len(text)
+        if len(batch.items) >= self.max_items:
+            self._flush(key)
+        # 等待者被取消（超时）时 future 随之取消，发送结果时跳过
+        return await fut
+
+    def _flush(self, key: tuple):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer:
+            batch.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("批量发送任务异常: %s", task.exception())
+
+    async def _run(self, batch: _Batch):
+        items = [(text, fut) for text, fut in batch.items if not fut.done()]
+        if not items:
+            return
+        try:
+            await self._acquire_and_send(batch, items)
+        except BaseException as e:
+            # 意外异常 / 关停取消：不让任何等待者悬空
+            for _, fut in items:
+                if fut.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    fut.cancel()
+                else:
+                    fut.set_exception(e)
+            raise
+
+    async def _acquire_and_send(self, batch: _Batch, items: list[tuple[str, asyncio.Future]]):
+        # 一批只占一个引擎限流名额（一次请求）
+        lim = limiter.get_limiter(batch.provider.name)
+        try:
+            await lim.acquire()
+        except RateLimitError as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        try:
+            await self._send(batch, items)
+        finally:
+            lim.release()
+
+    async def _send(self, batch: _Batch, items: list[tuple[str, asyncio.Future]]):
+        provider = batch.provider
+        if len(items) == 1:
+            text, fut = items[0]
+            await self._settle(fut, provider.translate(text, batch.target, batch.source))
+            return
+
+        self.stats["batches"] += 1
+        self.stats["batched_items"] += len(items)
+        try:
+            results = await provider.translate_batch([t for t, _ in items], batch.target, batch.source)
+        except ValueError as e:
+            # 批量输出格式不符：逐条重发
+            self.stats["fallbacks"] += 1
+            logger.warning("[%s] 批量结果解析失败，逐条重试: %s", provider.name, e)
+            await asyncio.gather(*(
+                self._settle(fut, provider.translate(text, batch.target, batch.source))
+                for text, fut in items
+            ))
+            return
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        logger.info("[%s] 📦 批量翻译 %d 条", provider.name, len(items))
+        for (_, fut), result in zip(items, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    async def close(self):
+        """关停：丢弃未发送的批次，取消并等待发送中的任务（等待者随之取消）"""
+        for key in list(self._pending):
+            batch = self._pending.pop(key)
+            if batch.timer:
+                batch.timer.cancel()
+            for _, fut in batch.items:
+                fut.cancel()
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    @staticmethod
+    async def _settle(fut: asyncio.Future, coro):
+        try:
+            result = await coro
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+        else:
+            if not fut.done():
+                fut.set_result(result)
@@ -0,0 +1,512 @@
+"""译文缓存 — 内存 W-TinyLFU（L1）+ 磁盘 SQLite（L2）
+
+L1：新条目先进入小窗口（约 1%）；窗口溢出的候选只有在访问频率（Count-Min Sketch 估计）
+高于主区淘汰对象时才被接纳，一次性消息不会把常用译文挤出去。
+所有操作 O(1)（OrderedDict），TTL 统一，按写入顺序从队首批量过期，不再整表排序。
+L2：data/cache.sqlite3（WAL，多进程可并发读、共享写），按字节预算淘汰最久未用条目；
+L1 未命中时回查 L2，启动时把最热条目预载入 L1，重启 / 部署后无需重新请求引擎。
+L2 写入在后台线程提交，查找只读（WAL），事件循环上不等待写锁。
+键为规范化文本的 blake2b 摘要，跨进程稳定、不依赖 hash() 随机化。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import struct
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src import store
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+WINDOW_RATIO = 0.01  # 窗口区占总预算比例
+PROTECTED_RATIO = 0.8  # 主区中受保护段比例
+SKETCH_MAX_COUNT = 15  # 计数上限（4 bit）
+SKETCH_RESET_FACTOR = 10  # 累计 N × 宽度 次计数后全部减半（老化）
+AVG_ENTRY_BYTES = 1024  # 估算容量（草图宽度）用
+ENTRY_OVERHEAD = 240  # 字典 / 键 / 元组等固定开销（字节，估算）
+
+WINDOW, PROBATION, PROTECTED = 0, 1, 2
+
+_HALVE = bytes(i >> 1 for i in range(256))
+_UNPACK = struct.Struct("<4I").unpack_from
+
+
+def make_key(text: str, target_lang: str, provider: str, model: str | None = None) -> bytes:
+    """缓存键：规范化（NFC、统一换行、去首尾空白）后的 blake2b-128 摘要"""
+    norm = unicodedata.normalize("NFC", text.replace("\r\n", "\n").strip())
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{provider.lower()}\x1f{model or ''}\x1f{target_lang.strip().lower()}\x1f".encode())
+    h.update(norm.encode("utf-8", "surrogatepass"))
+    return h.digest()
+
+
+def entry_size(value: dict) -> int:
+    """条目内存估算（字节）"""
+    return ENTRY_OVERHEAD + sys.getsizeof(value) + sum(map(sys.getsizeof, value.values()))
+
+
+class FrequencySketch:
+    """Count-Min Sketch（4 行，计数饱和于 15，定期减半老化）"""
+
+    def __init__(self, capacity: int):
+        width = 1024
+        while width < capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [bytearray(width) for _ in range(4)]
+        self._additions = 0
+        self._reset_at = width * SKETCH_RESET_FACTOR
+
+    def increment(self, key: bytes):
+        mask = self._mask
+        # 摘要本身均匀分布，直接切成 4 段作为各行哈希
+        for row, h in zip(self._rows, _UNPACK(key)):
+            i = h & mask
+            if row[i] < SKETCH_MAX_COUNT:
+                row[i] += 1
+        self._additions += 1
+        if self._additions >= self._reset_at:
+            self._rows = [row.translate(_HALVE) for row in self._rows]
+            self._additions //= 2
+
+    def frequency(self, key: bytes) -> int:
+        mask = self._mask
+        r0, r1, r2, r3 = self._rows
+        a, b, c, d = _UNPACK(key)
+        return min(r0[a & mask], r1[b & mask], r2[c & mask], r3[d & mask])
+
+
+class TranslationCache:
+    """
+    W-TinyLFU 译文缓存。值为翻译结果 dict（调用方勿修改返回值）。
+    统计: hits / misses / evictions（容量淘汰）/ rejected（未被准入）/ expired
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._window_max = max(1, int(max_bytes * WINDOW_RATIO))
+        self._main_max = max_bytes - self._window_max
+        self._protected_max = int(self._main_max * PROTECTED_RATIO)
+        self._entries: dict[bytes, list] = {}  # key → [value, size, expires_at, 所在段]
+        # 各段只维护访问顺序（队首为最久未用）
+        self._window: OrderedDict[bytes, None] = OrderedDict()
+        self._probation: OrderedDict[bytes, None] = OrderedDict()
+        self._protected: OrderedDict[bytes, None] = OrderedDict()
+        self._expiry: OrderedDict[bytes, float] = OrderedDict()  # 写入顺序 = 过期顺序（TTL 统一）
+        self._bytes = {WINDOW: 0, PROBATION: 0, PROTECTED: 0}
+        self._segments = {WINDOW: self._window, PROBATION: self._probation, PROTECTED: self._protected}
+        self._sketch = FrequencySketch(max(1, max_bytes // AVG_ENTRY_BYTES))
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "rejected": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def bytes(self) -> int:
+        return sum(self._bytes.values())
+
+    def _move(self, key: bytes, entry: list, segment: int):
+        del self._segments[entry[3]][key]
+        self._bytes[entry[3]] -= entry[1]
+        entry[3] = segment
+        self._segments[segment][key] = None
+        self._bytes[segment] += entry[1]
+
+    def _remove(self, key: bytes):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            del self._segments[entry[3]][key]
+            self._bytes[entry[3]] -= entry[1]
+        self._expiry.pop(key, None)
+
+    def _expire(self, now: float):
+        """从写入最早的一端批量移除已过期条目（均摊 O(1)）"""
+        expiry = self._expiry
+        while expiry:
+            key = next(iter(expiry))
+            if expiry[key] > now:
+                break
+            self._remove(key)
+            self.stats["expired"] += 1
+
+    def get(self, key: bytes) -> dict | None:
+        self._sketch.increment(key)
+        entry = self._entries.get(key)
+        if entry is not None and entry[2] <= time.monotonic():
+            self._remove(key)
+            self.stats["expired"] += 1
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        if entry[3] == PROBATION:
+            # 试用段再次命中 → 晋升保护段，保护段超额时把最久未用的降回试用段
+            self._move(key, entry, PROTECTED)
+            while self._bytes[PROTECTED] > self._protected_max and len(self._protected) > 1:
+                demoted = next(iter(self._protected))
+                self._move(demoted, self._entries[demoted], PROBATION)
+        else:
+            self._segments[entry[3]].move_to_end(key)
+        return entry[0]
+
+    def seed(self, key: bytes, hits: int):
+        """预置访问频率（预热时按历史命中数），使载入的条目不会被新条目轻易挤出"""
+        for _ in range(hits):
+            self._sketch.increment(key)
+
+    def put(self, key: bytes, value: dict):
+        now = time.monotonic()
+        self._expire(now)
+        size = entry_size(value)
+        if size > self._main_max:
+            return
+        self._remove(key)
+        self._entries[key] = [value, size, now + self.ttl, WINDOW]
+        self._window[key] = None
+        self._bytes[WINDOW] += size
+        self._expiry[key] = now + self.ttl
+        while self._bytes[WINDOW] > self._window_max and len(self._window) > 1:
+            self._admit(next(iter(self._window)))
+
+    def _admit(self, candidate: bytes):
+        """窗口淘汰的候选：主区有空间直接进入试用段，否则与主区淘汰对象比较频率，低者出局"""
+        entry = self._entries[candidate]
+        freq = None
+        while self._bytes[PROBATION] + self._bytes[PROTECTED] + entry[1] > self._main_max:
+            victim = next(iter(self._probation or self._protected))
+            if freq is None:
+                freq = self._sketch.frequency(candidate)
+            if freq <= self._sketch.frequency(victim):
+                self._remove(candidate)
+                self.stats["rejected"] += 1
+                return
+            self._remove(victim)
+            self.stats["evictions"] += 1
+        self._move(candidate, entry, PROBATION)
+
+    def clear(self):
+        for segment in (self._entries, self._window, self._probation, self._protected, self._expiry):
+            segment.clear()
+        self._bytes = dict.fromkeys(self._bytes, 0)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+
+# ═══════════════════════════════════════════
+#  L2：磁盘缓存
+# ═══════════════════════════════════════════
+
+DISK_WRITE_BATCH = 32  # 攒够 N 条写入一次事务
+DISK_WRITE_DELAY = 2.0  # 或最早一条等待超过 N 秒
+DISK_PRUNE_EVERY = 1000  # 每写入 N 条检查一次容量
+DISK_PRUNE_TARGET = 0.9  # 超出预算时淘汰到预算的 90%
+DISK_BUSY_TIMEOUT_MS = 200  # 其他进程持有写锁时最多等待（超时则放弃本次写入）
+WARM_FRACTION = 0.5  # 启动预热最多占 L1 预算比例
+WARM_MAX_FREQ = 4  # 预热条目按历史命中数预置频率（上限）
+
+_DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    used REAL NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_used ON cache(used);
+CREATE INDEX IF NOT EXISTS cache_hits ON cache(hits);
+"""
+
+
+class DiskCache:
+    """
+    SQLite 译文缓存：写入与命中计数攒批后交给后台线程提交（独立写连接），降低多进程写锁争用；
+    查找走单独的读连接（WAL 下读不等待写锁），事件循环不会因其他进程持有写锁而等待 busy_timeout。
+    写入失败只记日志（缓存可丢）
+    """
+
+    def __init__(self, path, max_bytes: int, ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._db: sqlite3.Connection | None = None  # 读连接（调用方线程）
+        self._wdb: sqlite3.Connection | None = None  # 写连接（后台线程）
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-disk")
+        self._pending: dict[bytes, tuple[str, float]] = {}  # 待写入 key → (JSON, 过期时间)
+        self._pending_since = 0.0
+        self._writing: list[dict[bytes, tuple[str, float]]] = []  # 已交给后台线程、尚未提交的批次
+        self._touched: dict[bytes, int] = {}  # 待提交的命中计数
+        self._writes = 0
+        self._closed = False
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "pruned": 0, "errors": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        db.execute(f"PRAGMA busy_timeout={DISK_BUSY_TIMEOUT_MS}")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_DISK_SCHEMA)
+        return db
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def _wconn(self) -> sqlite3.Connection:
+        if self._wdb is None:
+            self._wdb = self._connect()
+        return self._wdb
+
+    def _buffered(self, key: bytes) -> tuple[str | None, float]:
+        """尚未提交的条目（待写入 / 后台写入中），新的优先"""
+        if key in self._pending:
+            return self._pending[key]
+        for batch in reversed(self._writing):
+            if key in batch:
+                return batch[key]
+        return None, 0.0
+
+    def get(self, key: bytes) -> dict | None:
+        now = time.time()
+        raw, expires = self._buffered(key)
+        if raw is not None and expires <= now:
+            raw = None
+        if raw is None:
+            try:
+                row = self._conn().execute(
+                    "SELECT value FROM cache WHERE key = ? AND expires > ?", (key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._error("读取", e)
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            raw = row[0]
+            self._touched[key] = self._touched.get(key, 0) + 1
+        self.stats["hits"] += 1
+        return json.loads(raw)
+
+    def put(self, key: bytes, value: dict):
+        if not self._pending:
+            self._pending_since = time.monotonic()
+            self._schedule_flush()
+        self._pending[key] = (json.dumps(value, ensure_ascii=False), time.time() + self.ttl)
+        if len(self._pending) >= DISK_WRITE_BATCH or time.monotonic() - self._pending_since >= DISK_WRITE_DELAY:
+            self.flush()
+
+    def _schedule_flush(self):
+        """事件循环内：DISK_WRITE_DELAY 后提交，之后没有新写入时待写入条目也不会滞留"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        loop.call_later(DISK_WRITE_DELAY, self.flush)
+
+    def flush(self):
+        """把待写入条目与命中计数交给后台线程提交（不等待完成）"""
+        if self._closed or (not self._pending and not self._touched):
+            return
+        pending, touched = self._pending, self._touched
+        self._pending, self._touched = {}, {}
+        self._writing.append(pending)
+        self._io.submit(self._write, pending, touched).add_done_callback(_report_io_error)
+
+    def _write(self, pending: dict[bytes, tuple[str, float]], touched: dict[bytes, int]):
+        """后台线程：一次事务提交一批写入与命中计数"""
+        now = time.time()
+        db = self._wconn()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT INTO cache (key, value, used, expires) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, used = excluded.used, "
+                    "expires = excluded.expires",
+                    [(k, v, now, expires) for k, (v, expires) in pending.items()],
+                )
+                db.executemany("UPDATE cache SET hits = hits + ?, used = ? WHERE key = ?",
+                               [(n, now, k) for k, n in touched.items()])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._error("写入", e)
+            return
+        finally:
+            self._writing.remove(pending)
+        self.stats["writes"] += len(pending)
+        self._writes += len(pending)
+        if self._writes >= DISK_PRUNE_EVERY:
+            self._writes = 0
+            self.prune()
+
+    def _used_bytes(self) -> int:
+        db = self._wconn()
+        pages = db.execute("PRAGMA page_count").fetchone()[0] - db.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * db.execute("PRAGMA page_size").fetchone()[0]
+
+    def prune(self):
+        """删除过期条目；超出字节预算时按最久未用淘汰到预算的 90%（后台线程或启动时调用）"""
+        db = self._wconn()
+        try:
+            removed = db.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),)).rowcount
+            used = self._used_bytes()
+            if used > self.max_bytes:
+                (rows,) = db.execute("SELECT COUNT(*) FROM cache").fetchone()
+                excess = 1 - self.max_bytes * DISK_PRUNE_TARGET / used
+                cur = db.execute(
+                    "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used LIMIT ?)",
+                    (max(1, int(rows * excess)),),
+                )
+                removed += cur.rowcount
+        except sqlite3.Error as e:
+            self._error("淘汰", e)
+            return
+        if removed:
+            self.stats["pruned"] += removed
+            logger.info("💽 磁盘缓存淘汰 %d 条", removed)
+
+    def hottest(self, limit: int) -> list[tuple[bytes, dict, int]]:
+        """命中最多的未过期条目 [(key, value, hits)]"""
+        rows = self._conn().execute(
+            "SELECT key, value, hits FROM cache WHERE expires > ? ORDER BY hits DESC, used DESC LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+        return [(k, json.loads(v), hits) for k, v, hits in rows]
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def _error(self, action: str, e: Exception):
+        self.stats["errors"] += 1
+        logger.warning("磁盘缓存%s失败: %s", action, e)
+
+    def close(self):
+        """提交剩余写入并等待后台线程结束，关闭连接"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._io.shutdown(wait=True)
+        for db in (self._db, self._wdb):
+            if db is not None:
+                db.close()
+        self._db = self._wdb = None
+
+
+def _report_io_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("磁盘缓存后台写入失败: %s", future.exception())
+
+
+class TieredCache:
+    """L1 内存 + L2 磁盘：L1 未命中回查 L2 并提升到 L1，写入同时落两级"""
+
+    def __init__(self, memory: TranslationCache, disk: DiskCache | None):
+        self.memory = memory
+        self.disk = disk
+
+    def __len__(self) -> int:
+        return len(self.memory)
+
+    @property
+    def bytes(self) -> int:
+        return self.memory.bytes
+
+    @property
+    def stats(self) -> dict:
+        return self.memory.stats
+
+    def get(self, key: bytes) -> dict | None:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key: bytes, value: dict):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def warm(self) -> int:
+        """启动预热：按历史命中数把最热条目载入 L1（最多占 L1 预算的 WARM_FRACTION），返回条数"""
+        if self.disk is None:
+            return 0
+        budget = self.memory.max_bytes * WARM_FRACTION
+        loaded = 0
+        try:
+            rows = self.disk.hottest(max(1, int(budget // AVG_ENTRY_BYTES) * 2))
+        except sqlite3.Error as e:
+            logger.warning("磁盘缓存预热失败: %s", e)
+            return 0
+        for key, value, hits in rows:
+            if self.memory.bytes + entry_size(value) > budget:
+                break
+            self.memory.seed(key, min(hits, WARM_MAX_FREQ))
+            self.memory.put(key, value)
+            loaded += 1
+        return loaded
+
+    def snapshot(self) -> dict:
+        snap = self.memory.snapshot()
+        if self.disk is not None:
+            snap["disk"] = dict(self.disk.stats)
+        return snap
+
+
+_cache: TieredCache | None = None
+
+
+def get_cache() -> TieredCache:
+    """进程内译文缓存（CACHE_DISK_MAX_MB > 0 时带磁盘 L2）"""
+    global _cache
+    if _cache is None:
+        disk = (DiskCache(store.CACHE_FILE, int(Config.CACHE_DISK_MAX_MB * 1024 * 1024), Config.CACHE_DISK_TTL)
+                if Config.CACHE_DISK_MAX_MB > 0 else None)
+        _cache = TieredCache(TranslationCache(int(Config.CACHE_MAX_MB * 1024 * 1024), Config.CACHE_TTL), disk)
+    return _cache
+
+
+def warm() -> int:
+    """启动时调用：清理过期 / 超额条目后预热 L1"""
+    cache = get_cache()
+    if cache.disk is None:
+        return 0
+    cache.disk.prune()
+    loaded = cache.warm()
+    if loaded:
+        logger.info("💽 译文缓存预热 %d 条", loaded)
+    return loaded
+
+
+def flush():
+    if _cache is not None and _cache.disk is not None:
+        _cache.disk.flush()
+
+
+def close():
+    if _cache is not None and _cache.disk is not None:
+        _cache.disk.close()
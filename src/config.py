@@ -50,8 +50,47 @@ class Config:
     DEFAULT_TARGET_LANG: str = os.getenv("DEFAULT_TARGET_LANG", "中文")
 
     # 翻译限制
-    MAX_TEXT_LENGTH: int = int(os.getenv("MAX_TEXT_LENGTH", "5000"))
+    MAX_TEXT_LENGTH: int = int(os.getenv("MAX_TEXT_LENGTH", "20000"))
     RATE_LIMIT_PER_MIN: int = int(os.getenv("RATE_LIMIT_PER_MIN", "30"))
+    # 聊天级 / 全局频率限制（每分钟，0 = 不限）；超额自动翻译进入延迟队列（条数 / 最长等待秒数）
+    RATE_LIMIT_CHAT_PER_MIN: int = int(os.getenv("RATE_LIMIT_CHAT_PER_MIN", "60"))
+    RATE_LIMIT_GLOBAL_PER_MIN: int = int(os.getenv("RATE_LIMIT_GLOBAL_PER_MIN", "0"))
+    RATE_LIMIT_QUEUE_SIZE: int = int(os.getenv("RATE_LIMIT_QUEUE_SIZE", "200"))
+    RATE_LIMIT_MAX_DELAY: float = float(os.getenv("RATE_LIMIT_MAX_DELAY", "120"))
+
+    # 译文缓存：内存预算（MB）与过期时间（秒）
+    CACHE_MAX_MB: float = float(os.getenv("CACHE_MAX_MB", "32"))
+    CACHE_TTL: float = float(os.getenv("CACHE_TTL", "600"))
+    # 磁盘二级缓存 data/cache.sqlite3：容量（MB，0 = 关闭）与过期时间（秒）；同机多进程共享
+    CACHE_DISK_MAX_MB: float = float(os.getenv("CACHE_DISK_MAX_MB", "256"))
+    CACHE_DISK_TTL: float = float(os.getenv("CACHE_DISK_TTL", str(7 * 86400)))
+
+    # 并发处理更新：不同聊天并行、同一聊天按顺序，同时处理的更新数上限（1 = 逐条处理）
+    UPDATE_CONCURRENCY: int = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+
+    # 对冲请求：主引擎超过 P95 延迟未返回时并发请求备选引擎
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # 流式翻译：先发占位消息，随生成进度编辑（STREAM_EDIT_INTERVAL 秒最多编辑一次）
+    STREAM_TRANSLATION: bool = os.getenv("STREAM_TRANSLATION", "false").lower() in ("1", "true", "yes")
+    STREAM_EDIT_INTERVAL: float = float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+
+    # 微批处理：窗口内同引擎/模型/目标语言的消息合并为一次请求（0 = 关闭）
+    BATCH_WINDOW_MS: int = int(os.getenv("BATCH_WINDOW_MS", "0"))
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "8"))
+
+    # 翻译记忆：句段级译文持久化，重复句段（群规 / 签名 / 模板）本地复用
+    TM_ENABLED: bool = os.getenv("TM_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # 引擎健康探测：每 N 秒向各引擎发送极短请求，提前标记故障引擎（0 = 关闭）
+    HEALTH_PROBE_INTERVAL: float = float(os.getenv("HEALTH_PROBE_INTERVAL", "60"))
+
+    # 慢请求日志：单条消息处理超过 N 毫秒时输出各阶段耗时（0 = 关闭）
+    TRACE_SLOW_MS: float = float(os.getenv("TRACE_SLOW_MS", "5000"))
+
+    # Prometheus 指标端点：http://METRICS_HOST:METRICS_PORT/metrics（0 = 关闭）
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
 
     # 管理员（第一个 ID 为主管理员，不可被移除）
     ADMIN_USER_IDS: list[int] = [
@@ -65,6 +104,8 @@ class Config:
 
     # 提供商 → API Key 映射
     PROVIDER_KEYS: dict[str, str] = {}
+    # 自定义 API 地址（<引擎>_BASE_URL，如代理 / 自建网关 / 本地压测桩），留空使用官方地址
+    PROVIDER_BASE_URLS: dict[str, str] = {}
 
     @classmethod
     def init(cls):
@@ -76,6 +117,9 @@ class Config:
             "groq": cls.GROQ_API_KEY,
             "mistral": cls.MISTRAL_API_KEY,
         }
+        cls.PROVIDER_BASE_URLS = {
+            name: url for name in cls.PROVIDER_KEYS if (url := os.getenv(f"{name.upper()}_BASE_URL", "").strip())
+        }
 
     @classmethod
     def available_providers(cls) -> list[str]:
@@ -0,0 +1,94 @@
+"""更新分发 — 不同聊天的更新并发处理，同一聊天内按到达顺序串行
+
+PTB 默认逐条处理更新，一个群里 10~30 秒的引擎调用会拖住所有聊天。
+ChatOrderedProcessor 为每个聊天维护一把 FIFO 锁：同一聊天的更新（及延迟队列补发的翻译）
+按到达顺序执行，译文按顺序发出；不同聊天之间并发，总数受 UPDATE_CONCURRENCY 限制。
+先取聊天锁、再占全局并发名额，排队中的同聊天更新不占用名额，繁忙的群最多占一个。
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from src import metrics
+
+logger = logging.getLogger(__name__)
+
+UPDATE_BACKLOG = 4096  # 已接收未完成的更新上限（PTB 信号量），超过后拉取更新暂停
+
+_active: "ChatOrderedProcessor | None" = None  # 最近创建的处理器，指标从它采集
+
+
+def _from_active(read):
+    return lambda: read(_active) if _active is not None else {}
+
+
+# 指标只注册一次：多次创建处理器（测试、进程内重启）不重复登记序列
+metrics.Gauge("tgbot_updates_running", "正在处理的更新数", collect=_from_active(lambda p: p._running))
+metrics.Gauge("tgbot_updates_pending", "已接收未完成的更新数（含同聊天排队）",
+              collect=_from_active(lambda p: p.current_concurrent_updates))
+metrics.Gauge("tgbot_updates_busy_chats", "有更新在处理或排队的聊天数", collect=_from_active(lambda p: len(p._chats)))
+
+
+def chat_key(update: object) -> int | None:
+    """更新所属聊天；无聊天的更新（内联查询等）返回 None，不参与排序"""
+    if isinstance(update, Update) and update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class ChatOrderedProcessor(BaseUpdateProcessor):
+    """按聊天保序的并发更新处理器（ApplicationBuilder.concurrent_updates 传入）"""
+
+    __slots__ = ("concurrency", "_slots", "_chats", "_running")
+
+    def __init__(self, concurrency: int, backlog: int = UPDATE_BACKLOG):
+        # PTB 在调用 do_process_update 之前就占用其信号量：这里只用它限制积压总数，
+        # 真正的并发上限在取得聊天锁之后才占用，避免同一聊天排队的更新占满名额
+        super().__init__(max(backlog, concurrency))
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._chats: dict[int, list] = {}  # 聊天 → [锁, 排队 + 执行中的数量]
+        self._running = 0
+        global _active
+        _active = self
+
+    @asynccontextmanager
+    async def ordered(self, chat_id: int | None):
+        """同一聊天内按进入顺序独占执行，并占用一个全局并发名额"""
+        if chat_id is None:
+            async with self._slots:
+                yield
+            return
+        entry = self._chats.get(chat_id)
+        if entry is None:
+            entry = self._chats[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                self._running += 1
+                try:
+                    yield
+                finally:
+                    self._running -= 1
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[chat_id]
+
+    async def do_process_update(self, update: object, coroutine):
+        async with self.ordered(chat_key(update)):
+            await coroutine
+
+    async def initialize(self) -> None:
+        logger.info("🔀 并发处理更新: 上限 %d，同一聊天按顺序", self.concurrency)
+
+    async def shutdown(self) -> None:
+        pass
+
+    def snapshot(self) -> dict:
+        return {"running": self._running, "pending": self.current_concurrent_updates,
+                "chats": len(self._chats), "limit": self.concurrency}
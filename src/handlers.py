@@ -1,10 +1,12 @@
 """Telegram 消息处理器 — 全功能升级版 v2.1"""
 
+import io
+import json
 import re
 import logging
 import time
 import asyncio
-from collections import defaultdict
+import functools
 from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup, CopyTextButton
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
@@ -16,8 +18,15 @@ from src.store import (
     get_stats, get_global_stats, reset_chat_config, clear_chat_stats,
     export_all_stats,
 )
-from src.translator import translate_text, get_provider, get_engine_avg_latency, _provider_cache
-from src.providers import PROVIDER_MODELS, PROVIDER_DISPLAY
+from src.translator import (
+    translate_text, translate_text_stream, get_engine_avg_latency, get_engine_latency_stats, get_engine_timeout,
+    get_coalesce_stats, get_hedge_stats, get_batch_stats,
+    get_breaker_states, get_limiter_states, get_memory_stats, get_mask_stats,
+)
+from src.providers import PROVIDER_MODELS, PROVIDER_DISPLAY, get_usage_stats
+from src import cache, health, masking, metrics, ratelimit, tracing
+from src.dispatcher import ChatOrderedProcessor
+from src.cache import make_key as make_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -43,12 +52,19 @@ QUICK_LANGS = [
     ("🇮🇳 हिन्दी", "हिन्दी"),
 ]
 
-RATE_LIMIT_PER_MIN = Config.RATE_LIMIT_PER_MIN
-_rate_limiter: dict[int, list[float]] = defaultdict(list)
+_rate_limiter = ratelimit.get_limiter()
+_delay_queue = ratelimit.get_queue()
+
+_translate_cache = cache.get_cache()
 
-_translate_cache: dict[str, dict] = {}
-CACHE_MAX_SIZE = 500
-_CACHE_TTL = 600  # 缓存 10 分钟过期
+metrics.Gauge("tgbot_translate_cache_entries", "译文缓存条目数", collect=lambda: len(_translate_cache))
+metrics.Gauge("tgbot_translate_cache_bytes", "译文缓存估算内存（字节）", collect=lambda: _translate_cache.bytes)
+metrics.Gauge("tgbot_translate_cache_hit_ratio", "译文缓存累计命中率",
+              collect=lambda: _translate_cache.snapshot()["hit_rate"])
+metrics.Counter("tgbot_translate_cache_evictions_total", "译文缓存淘汰（evicted=容量淘汰 rejected=未准入 expired=过期）",
+                ("reason",), collect=lambda: {(r,): _translate_cache.stats[k] for r, k in
+                                              (("evicted", "evictions"), ("rejected", "rejected"),
+                                               ("expired", "expired"))})
 
 
 # ═══════════════════════════════════════════
@@ -74,49 +90,101 @@ def _escape_md(text: str) -> str:
     return text
 
 
+_BREAKER_ICONS = {"closed": "🟢", "open": "🔴", "half_open": "🟡"}
+
+
+def _breaker_str(state: dict | None) -> str:
+    """熔断状态简短展示，无记录返回空串"""
+    if not state:
+        return ""
+    s = f" {_BREAKER_ICONS.get(state['state'], '')}"
+    if state["state"] == "open":
+        s += f" 熔断 {state['retry_in']:.0f}s"
+    return s
+
+
+def _limiter_str(state: dict | None) -> str:
+    """限流状态简短展示：并发上限 / 在途 / 排队，暂停时附剩余秒数"""
+    if not state:
+        return ""
+    s = f" · 🚦 {state['inflight']}/{state['limit']}"
+    if state["queued"]:
+        s += f" 排队 {state['queued']}"
+    if state["paused"] > 0:
+        s += f" 暂停 {state['paused']:.0f}s"
+    return s
+
+
+def _probe_str(result: health.ProbeResult | None) -> str:
+    """健康探测结果简短展示：延迟或错误，附距今时间"""
+    if not result:
+        return ""
+    age = time.time() - result.checked_at
+    status = f"{result.latency * 1000:.0f}ms" if result.ok else "❌"
+    return f" · 🩺 {status} ({age:.0f}s 前)"
+
+
 def _truncate(text: str, max_len: int = 3000) -> str:
     if len(text) <= max_len:
         return text
     return text[:max_len] + "\n\n⚠️ _(文本过长，已截断)_"
 
 
-def _check_rate_limit(user_id: int) -> bool:
-    now = time.time()
-    _rate_limiter[user_id] = [t for t in _rate_limiter[user_id] if now - t < 60]
-    if len(_rate_limiter[user_id]) >= RATE_LIMIT_PER_MIN:
-        return False
-    _rate_limiter[user_id].append(now)
-    # 定期清理不活跃用户，防止内存泄漏
-    if len(_rate_limiter) > 1000:
-        stale = [uid for uid, ts in _rate_limiter.items() if not ts or now - ts[-1] > 300]
-        for uid in stale:
-            del _rate_limiter[uid]
-    return True
+def _check_rate_limit(user_id: int, chat_id: int) -> tuple[str | None, float]:
+    """用户 / 聊天 / 全局频率限制：未超限则计入并返回 (None, 0)，否则返回 (受限级别, 需等待秒数)"""
+    tier, wait = _rate_limiter.acquire(user_id, chat_id)
+    if tier is not None:
+        metrics.RATE_LIMITED.inc(tier)
+    return tier, wait
 
 
-def _cache_key(text: str, target_lang: str, provider: str) -> str:
-    return f"{provider}:{target_lang}:{hash(text)}"
+def _get_cached(text: str, target_lang: str, provider: str, model: str | None = None) -> dict | None:
+    return _translate_cache.get(make_cache_key(text, target_lang, provider, model))
 
 
-def _get_cached(text: str, target_lang: str, provider: str) -> dict | None:
-    key = _cache_key(text, target_lang, provider)
-    entry = _translate_cache.get(key)
-    if entry and (time.time() - entry.get("_ts", 0)) < _CACHE_TTL:
-        return entry
-    if entry:
-        del _translate_cache[key]  # 过期删除
-    return None
+def _set_cache(text: str, target_lang: str, provider: str, result: dict, model: str | None = None):
+    _translate_cache.put(make_cache_key(text, target_lang, provider, model), dict(result))
 
 
-def _set_cache(text: str, target_lang: str, provider: str, result: dict):
-    if len(_translate_cache) >= CACHE_MAX_SIZE:
-        # 清除最旧的一半
-        sorted_keys = sorted(_translate_cache, key=lambda k: _translate_cache[k].get("_ts", 0))
-        for k in sorted_keys[:CACHE_MAX_SIZE // 2]:
-            del _translate_cache[k]
-    _translate_cache[_cache_key(text, target_lang, provider)] = {**result, "_ts": time.time()}
+def _timed_send(method: str):
+    """记录 Telegram 发送耗时（含 RetryAfter 等待与纯文本重试）"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                with tracing.span(f"telegram_{method}"):
+                    return await func(*args, **kwargs)
+            finally:
+                metrics.TELEGRAM_SEND.observe(time.monotonic() - start, method)
+        return wrapper
+    return decorator
+
+
+@_timed_send("edit")
+async def _safe_edit(message, text: str, **kwargs):
+    """编辑消息，Markdown 解析失败时退回纯文本"""
+    try:
+        return await message.edit_text(text, **kwargs)
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return message
+        kwargs.pop("parse_mode", None)
+        try:
+            return await message.edit_text(text.replace("\\", ""), **kwargs)
+        except Exception as e2:
+            logger.warning(f"编辑消息失败: {e2}")
+            return None
+    except RetryAfter as e:
+        metrics.TELEGRAM_RETRY_AFTER.inc("edit")
+        await asyncio.sleep(e.retry_after)
+        return await message.edit_text(text, **kwargs)
+    except (TimedOut, NetworkError) as e:
+        logger.error(f"网络异常: {e}")
+        return None
 
 
+@_timed_send("reply")
 async def _safe_reply(message, text: str, **kwargs):
     try:
         return await message.reply_text(text, **kwargs)
@@ -131,6 +199,7 @@ async def _safe_reply(message, text: str, **kwargs):
                 return await message.reply_text(clean[:4000])
         raise
     except RetryAfter as e:
+        metrics.TELEGRAM_RETRY_AFTER.inc("reply")
         await asyncio.sleep(e.retry_after)
         return await message.reply_text(text, **kwargs)
     except (TimedOut, NetworkError) as e:
@@ -191,7 +260,9 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/clear\\_stats — 清除统计\n\n"
         "*🛠 工具:*\n"
         "/id — 查看 ID\n"
-        "/ping — 测试延迟\n\n"
+        "/ping — 测试延迟\n"
+        "/profile `秒数` — 采样分析热点函数\n"
+        "/trace — 导出请求追踪（Chrome Trace）\n\n"
         "*🔐 授权管理:*\n"
         "/authorize `ID` — 授权用户\n"
         "/unauthorize `ID` — 取消授权\n"
@@ -308,7 +379,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         elif data.startswith("provider:"):
             provider = data[9:]
-            set_chat_config(chat_id, {"provider": provider})
+            # 切换引擎时清除自定义模型（模型名不跨引擎通用）
+            set_chat_config(chat_id, {"provider": provider, "model": None})
             await query.answer(f"✅ 已切换到 {provider}")
             text, markup = _build_settings_panel(chat_id, chat_type)
             await query.edit_message_text(text, parse_mode="Markdown", reply_markup=markup)
@@ -398,7 +470,8 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"⏱ 引擎延迟: {lat_str}\n\n"
                 f"🌐 全局: {g['total_translations']:,} 次 | {g['total_chars']:,} 字\n"
                 f"💬 聊天数: {g['total_chats']} | 全局成功率: {g.get('success_rate', 'N/A')}\n"
-                f"📦 缓存: {len(_translate_cache)} | ⏱ 运行: {uptime_str()}"
+                f"📦 缓存: {len(_translate_cache)} | 命中 {_translate_cache.snapshot()['hit_rate']:.0%}"
+                f" | ⏱ 运行: {uptime_str()}"
             )
             await query.answer()
             await query.edit_message_text(
@@ -479,7 +552,7 @@ async def cmd_set_provider(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown")
         return
 
-    set_chat_config(update.effective_chat.id, {"provider": name})
+    set_chat_config(update.effective_chat.id, {"provider": name, "model": None})
     await _safe_reply(update.message,
         f"✅ 引擎: *{name}*\n模型: `{PROVIDER_MODELS.get(name, 'N/A')}`",
         parse_mode="Markdown")
@@ -506,8 +579,7 @@ async def cmd_set_model(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     model = " ".join(context.args).strip()
     if model.lower() == "default":
-        cfg.pop("model", None)
-        set_chat_config(chat_id, cfg)
+        set_chat_config(chat_id, {"model": None})
         await _safe_reply(update.message,
             f"✅ 恢复默认: `{PROVIDER_MODELS.get(provider, '默认')}`", parse_mode="Markdown")
     else:
@@ -554,6 +626,48 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     model = cfg.get("model", PROVIDER_MODELS.get(provider, "默认"))
     rate = f"{stats['success']/stats['total']*100:.1f}%" if stats["total"] > 0 else "N/A"
     top = max(stats["providers"], key=stats["providers"].get) if stats.get("providers") else "N/A"
+    co = get_coalesce_stats()
+    hedge = get_hedge_stats()
+    batch = get_batch_stats()
+    cache_stats = _translate_cache.snapshot()
+    disk = cache_stats.get("disk")
+    processor = context.application.update_processor
+    if isinstance(processor, ChatOrderedProcessor):
+        up = processor.snapshot()
+        update_line = f"🔀 更新: 处理中 {up['running']}/{up['limit']} | 待处理 {up['pending']} | 活跃聊天 {up['chats']}\n"
+    else:
+        update_line = ""
+    rl = _delay_queue.snapshot()
+    rate_line = (
+        f"🚦 频率限制: 排队 {rl['queued']} | 延迟 {rl['delayed']} | 丢弃 {rl['dropped']} · 超时 {rl['expired']}\n"
+        if rl["delayed"] or rl["dropped"] else ""
+    )
+    disk_line = f"💽 磁盘缓存: 命中 {disk['hits']} / 未命中 {disk['misses']} | 写入 {disk['writes']}\n" if disk else ""
+    batch_line = (
+        f"\n📦 批处理: {batch['batches']} 批 / {batch['batched_items']} 条 | 回退: {batch['fallbacks']}"
+        if batch else ""
+    )
+    usage = get_usage_stats()
+    cache_line = " · ".join(
+        f"{p} {u['cached_tokens'] / u['prompt_tokens']:.0%}" for p, u in usage.items() if u["prompt_tokens"]
+    )
+    cache_line = f"\n🧩 提示缓存命中: {cache_line}" if cache_line else ""
+    tm_stats = get_memory_stats()
+    if tm_stats:
+        cache_line += (
+            f"\n📚 翻译记忆: {tm_stats['size']:,} 句 | 命中 {tm_stats['exact']} + 宽松 {tm_stats['fuzzy']}"
+            f" | 未命中 {tm_stats['miss']}"
+        )
+    mask = get_mask_stats()
+    if mask["masked"] or mask["skipped"]:
+        cache_line += (
+            f"\n🔒 占位符: {mask['masked']} 条 / {mask['spans']} 处 | 省 {mask['chars_saved']:,} 字"
+            f" | 跳过 {mask['skipped']} | 还原失败 {mask['restore_failed']}"
+        )
+    breakers = get_breaker_states()
+    breaker_line = " ".join(
+        f"{p}{_BREAKER_ICONS.get(b['state'], '')}" for p, b in breakers.items()
+    ) or "N/A"
 
     await _safe_reply(update.message,
         f"📊 *设置与统计* · v{VERSION}\n\n"
@@ -562,7 +676,13 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"📈 翻译: {stats['total']} 次 | 字符: {stats['chars']:,}\n"
         f"✅ {stats['success']} | ❌ {stats['fail']} | 率: {rate} | 常用: {top}\n\n"
         f"🌐 全局: {g['total_translations']:,} 次 | {g['total_chars']:,} 字 | {g['total_chats']} 聊天\n"
-        f"📦 缓存: {len(_translate_cache)} | 授权: {len(Config.ADMIN_USER_IDS)} | ⏱ {uptime_str()}",
+        f"📦 缓存: {cache_stats['entries']:,} 条 / {cache_stats['bytes'] / 1048576:.1f}MB"
+        f" | 命中 {cache_stats['hit_rate']:.0%} | 淘汰 {cache_stats['evictions']} · 拒入 {cache_stats['rejected']}"
+        f" · 过期 {cache_stats['expired']}\n{disk_line}{rate_line}{update_line}"
+        f"👥 授权: {len(Config.ADMIN_USER_IDS)} | ⏱ {uptime_str()}\n"
+        f"🔗 合并请求: {co['coalesced']} / 调用 {co['leaders']} | 在途: {co['inflight']}\n"
+        f"🛡 对冲: {hedge['fired']} 次 | 备选胜出: {hedge['won']}\n"
+        f"⚡ 熔断: {breaker_line}{batch_line}{cache_line}",
         parse_mode="Markdown")
 
 
@@ -573,8 +693,9 @@ async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def cmd_translate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if await _admin_only(update):
         return
-    if not _check_rate_limit(update.effective_user.id):
-        await _safe_reply(update.message, "⚠️ 请求太频繁，请稍后")
+    tier, wait = _check_rate_limit(update.effective_user.id, update.effective_chat.id)
+    if tier is not None:
+        await _safe_reply(update.message, f"⚠️ 请求太频繁，请 {max(1, round(wait))} 秒后再试")
         return
 
     reply_msg = update.message.reply_to_message
@@ -599,12 +720,21 @@ async def cmd_providers(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     available = Config.available_providers()
     current = get_chat_config(update.effective_chat.id).get("provider", Config.DEFAULT_PROVIDER)
+    breakers = get_breaker_states()
+    limiters = get_limiter_states()
+    probes = health.get_results()
     lines = ["🤖 *AI 翻译引擎*\n"]
     for p in ["deepseek", "openai", "claude", "gemini", "groq", "mistral"]:
         m = PROVIDER_MODELS.get(p, "")
         display = PROVIDER_DISPLAY.get(p, p)
-        latency = get_engine_avg_latency(p)
-        lat_str = f" · {latency:.1f}s" if latency else ""
+        st = get_engine_latency_stats(p)
+        lat_str = (
+            f" · p50 {st['p50']:.1f}s / p95 {st['p95']:.1f}s / p99 {st['p99']:.1f}s · 错误 {st['error_rate']:.0%}"
+            if st and st["count"] else ""
+        )
+        if p in available:
+            lat_str += f" · ⏱ {get_engine_timeout(p):.1f}s"
+        lat_str += _limiter_str(limiters.get(p)) + _probe_str(probes.get(p)) + _breaker_str(breakers.get(p))
         if p == current:
             lines.append(f"  👉 {display} — `{m}`{lat_str} *(当前)*")
         elif p in available:
@@ -809,63 +939,157 @@ async def cmd_ping(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await _safe_reply(update.message, "🏓 Pong!")
     bot_ms = (time.time() - t0) * 1000
 
+    # 读取后台健康探测结果；当前引擎尚无结果（探测关闭）时现场探测一次
     provider_name = get_chat_config(update.effective_chat.id).get("provider", Config.DEFAULT_PROVIDER)
-    try:
-        t1 = time.time()
-        p = get_provider(provider_name)
-        await p.translate("hello", "中文")
-        ai_ms = (time.time() - t1) * 1000
-        ai_txt = f"✅ {provider_name} ({ai_ms:.0f}ms)"
-    except Exception as e:
-        ai_txt = f"❌ {provider_name}: {str(e)[:50]}"
+    probes = health.get_results()
+    if provider_name not in probes and provider_name in Config.available_providers():
+        probes[provider_name] = await health.probe(provider_name)
+    lines = []
+    for name in Config.available_providers():
+        r = probes.get(name)
+        if r is None:
+            continue
+        mark = "👉 " if name == provider_name else ""
+        status = f"✅ {r.latency * 1000:.0f}ms" if r.ok else f"❌ {r.error[:50]}"
+        lines.append(f"{mark}{name} {status} · {time.time() - r.checked_at:.0f}s 前")
+    ai_txt = "\n".join(lines) or f"⬜ {provider_name}: 未配置"
 
     if msg:
         try:
             await msg.edit_text(
-                f"🏓 *Pong\\!* v{VERSION}\n\n📡 Bot: `{bot_ms:.0f}ms`\n🤖 {_escape_md(ai_txt)}\n⏱ 运行: {uptime_str()}",
+                f"🏓 *Pong\\!* v{VERSION}\n\n📡 Bot: `{bot_ms:.0f}ms`\n🤖 引擎探测:\n{_escape_md(ai_txt)}\n⏱ 运行: {uptime_str()}",
                 parse_mode="Markdown")
         except Exception:
             pass
 
 
+# ═══════════════════════════════════════════
+#  /profile — 采样分析 · /trace — 导出追踪
+# ═══════════════════════════════════════════
+
+async def cmd_profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """按 CPU 时间对事件循环采样 N 秒，返回最热函数（后台执行，不阻塞其他更新）"""
+    if await _admin_only(update):
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else tracing.PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await _safe_reply(update.message, "用法: /profile `秒数`", parse_mode="Markdown")
+        return
+    seconds = max(1.0, min(seconds, tracing.PROFILE_MAX_SECONDS))
+    msg = await _safe_reply(update.message, f"🔬 采样分析中（{seconds:.0f}s）...")
+    context.application.create_task(_run_profile(update, msg, seconds), update=update)
+
+
+async def _run_profile(update: Update, msg, seconds: float):
+    try:
+        result = await tracing.profile(seconds)
+    except RuntimeError as e:
+        await _safe_reply(update.message, f"⚠️ {e}")
+        return
+
+    busy = result.samples - result.idle
+    lines = [f"CPU 样本 {result.samples} · 事件循环占 {busy / max(result.samples, 1):.0%}"]
+    if busy:
+        lines.append("\n自身耗时:")
+        lines += [f"{n / busy:>5.1%} {name}" for name, n in result.own]
+        lines.append("\n含子调用:")
+        lines += [f"{n / busy:>5.1%} {name}" for name, n in result.total[:8]]
+    text = "🔬 *采样分析*\n```\n" + "\n".join(lines)[:3800] + "\n```"
+    if msg:
+        await _safe_edit(msg, text, parse_mode="Markdown")
+    else:
+        await _safe_reply(update.message, text, parse_mode="Markdown")
+
+
+async def cmd_trace(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """导出最近的请求追踪（Chrome Trace JSON），附最慢一条的阶段耗时；/trace slow 只导出慢请求"""
+    if await _admin_only(update):
+        return
+    traces = tracing.get_traces(slow_only=bool(context.args) and context.args[0] == "slow")
+    if not traces:
+        await _safe_reply(update.message, "📭 暂无追踪记录")
+        return
+    slowest = max(traces, key=lambda t: t.duration)
+    summary = f"🧵 {len(traces)} 条追踪 · 最慢 #{slowest.id}\n```\n{tracing.format_trace(slowest)[:800]}\n```"
+    data = json.dumps(tracing.export_chrome(traces), ensure_ascii=False).encode()
+    try:
+        await update.message.reply_document(
+            document=io.BytesIO(data), filename=f"traces-{int(time.time())}.json",
+            caption=summary, parse_mode="Markdown")
+    except BadRequest:
+        await update.message.reply_document(document=io.BytesIO(data), filename=f"traces-{int(time.time())}.json")
+
+
 # ═══════════════════════════════════════════
 #  核心翻译（复用）
 # ═══════════════════════════════════════════
 
 async def _do_translate(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """翻译并回复；全程记录阶段耗时，超过 TRACE_SLOW_MS 写慢请求日志"""
+    with tracing.trace("message", chat=update.effective_chat.id, chars=len(text)):
+        await _translate_and_reply(update, context, text)
+
+
+async def _do_translate_delayed(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
+    """延迟队列补发：与该聊天的更新共用顺序锁和并发上限，后到的消息不会抢先回复"""
+    processor = context.application.update_processor
+    if isinstance(processor, ChatOrderedProcessor):
+        async with processor.ordered(update.effective_chat.id):
+            await _do_translate(update, context, text)
+    else:
+        await _do_translate(update, context, text)
+
+
+async def _translate_and_reply(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
     chat_id = update.effective_chat.id
-    cfg = get_chat_config(chat_id)
+    with tracing.span("get_chat_config"):
+        cfg = get_chat_config(chat_id)
     provider_name = cfg.get("provider", Config.DEFAULT_PROVIDER)
     target_lang = cfg.get("target_lang", Config.DEFAULT_TARGET_LANG)
-    is_private = update.effective_chat.type == "private"
+    model = cfg.get("model")
+    placeholder = None
 
-    cached = _get_cached(text, target_lang, provider_name)
+    with tracing.span("cache_lookup"):
+        cached = _get_cached(text, target_lang, provider_name, model)
+    metrics.CACHE_REQUESTS.inc("hit" if cached else "miss")
     if cached:
         translation, detected, target, engine = cached["translation"], cached["detected_lang"], cached["target_lang"], cached["engine"]
         elapsed, cache_hit = 0.0, True
     else:
         try:
-            await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-        except Exception:
-            pass
-
-        try:
-            r = await translate_text(text, target_lang=target_lang, provider_name=provider_name)
+            if Config.STREAM_TRANSLATION:
+                placeholder = await _safe_reply(update.message, "⏳ 翻译中...")
+                with tracing.span("stream_translate", engine=provider_name):
+                    r = await _stream_translate(update, placeholder, text, target_lang, provider_name, model)
+            else:
+                try:
+                    with tracing.span("send_chat_action"):
+                        await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+                except Exception:
+                    pass
+                r = await translate_text(text, target_lang=target_lang, provider_name=provider_name,
+                                         custom_model=model)
             elapsed = r.get("latency", 0.0)
             translation, detected, target, engine = r["translation"], r["detected_lang"], r["target_lang"], r["engine"]
+            tm_note = f" · 📚 记忆 {r['tm_hits']}/{r['segments']}" if r.get("tm_hits") else ""
             cache_hit = False
-            _set_cache(text, target_lang, provider_name, r)
+            _set_cache(text, target_lang, provider_name, r, model)
         except Exception as e:
             record_translation(chat_id, provider_name, len(text), success=False)
             logger.error(f"翻译失败: {e}")
-            await _safe_reply(update.message, f"❌ 翻译失败: {e}")
+            if placeholder:
+                await _safe_edit(placeholder, f"❌ 翻译失败: {e}")
+            else:
+                await _safe_reply(update.message, f"❌ 翻译失败: {e}")
             return
 
-    record_translation(chat_id, engine, len(text), success=True)
+    with tracing.span("record_translation"):
+        record_translation(chat_id, engine, len(text), success=True)
 
     display_engine = PROVIDER_DISPLAY.get(engine, engine)
     fallback = f"\n⚠️ _降级到 {display_engine}_" if provider_name and engine != provider_name else ""
-    speed = "⚡ 缓存" if cache_hit else f"⚡ {display_engine} · {elapsed:.1f}s"
+    speed = "⚡ 缓存" if cache_hit else f"⚡ {display_engine} · {elapsed:.1f}s{tm_note}"
 
     reply = (
         f"🔤 *{_escape_md(detected)}* → *{_escape_md(target)}*\n\n"
@@ -878,18 +1102,52 @@ async def _do_translate(update: Update, context: ContextTypes.DEFAULT_TYPE, text
         InlineKeyboardButton("📋 复制译文", copy_text=CopyTextButton(text=translation)),
     ]])
 
-    if is_private:
+    if placeholder:
+        await _safe_edit(placeholder, reply, parse_mode="Markdown", reply_markup=buttons)
+    elif update.effective_chat.type == "private":
         await _safe_reply(update.message, reply, parse_mode="Markdown", reply_markup=buttons)
     else:
+        with tracing.span("telegram_reply"):
+            try:
+                await update.message.reply_text(
+                    reply, parse_mode="Markdown",
+                    reply_to_message_id=update.message.message_id,
+                    reply_markup=buttons)
+            except BadRequest:
+                clean = reply.replace("\\", "")
+                await update.message.reply_text(
+                    clean, reply_to_message_id=update.message.message_id, reply_markup=buttons)
+
+
+async def _stream_translate(update: Update, placeholder, text: str, target_lang: str, provider_name: str,
+                            model: str | None = None) -> dict:
+    """流式翻译：随生成进度编辑占位消息（节流），返回完整结果"""
+    # Telegram 群组编辑限速更严格，群内至少间隔 3 秒
+    interval = Config.STREAM_EDIT_INTERVAL
+    if update.effective_chat.type != "private":
+        interval = max(interval, 3.0)
+    next_edit = time.monotonic() + interval
+    shown = ""
+
+    async for part in translate_text_stream(text, target_lang=target_lang, provider_name=provider_name,
+                                             custom_model=model):
+        if part["done"]:
+            return part
+        partial = part["translation"].strip()
+        now = time.monotonic()
+        if not placeholder or not partial or partial == shown or now < next_edit:
+            continue
+        next_edit = now + interval
         try:
-            await update.message.reply_text(
-                reply, parse_mode="Markdown",
-                reply_to_message_id=update.message.message_id,
-                reply_markup=buttons)
-        except BadRequest:
-            clean = reply.replace("\\", "")
-            await update.message.reply_text(
-                clean, reply_to_message_id=update.message.message_id, reply_markup=buttons)
+            # 中间态用纯文本，避免不完整的 Markdown 解析失败
+            await placeholder.edit_text(f"🌐 {_truncate(partial)} ▍")
+            shown = partial
+        except RetryAfter as e:
+            metrics.TELEGRAM_RETRY_AFTER.inc("stream_edit")
+            next_edit = now + e.retry_after
+        except (BadRequest, TimedOut, NetworkError):
+            pass
+    raise RuntimeError("流式翻译未返回结果")
 
 
 # ═══════════════════════════════════════════
@@ -915,6 +1173,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if re.fullmatch(r'[\d\s\W]+', text) and len(text) < 5:
         return
 
+    # 纯链接 / 代码 / @提及 / 数字 / 符号 / emoji，无需翻译
+    if not masking.has_translatable(masking.mask(text)):
+        return
+
     # 非管理员不可使用自动翻译
     if not _is_admin(update.effective_user.id):
         return
@@ -926,7 +1188,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not cfg.get("auto_translate", is_private):
         return
 
-    if not _check_rate_limit(update.effective_user.id):
+    # 同聊天已有排队消息时直接排在其后，保证译文顺序；超额时进入延迟队列而非丢弃
+    user_id = update.effective_user.id
+    if _delay_queue.has_pending(chat_id):
+        _delay_queue.submit(user_id, chat_id, lambda: _do_translate_delayed(update, context, text))
+        return
+    tier, wait = _check_rate_limit(user_id, chat_id)
+    if tier is not None:
+        _delay_queue.submit(user_id, chat_id, lambda: _do_translate_delayed(update, context, text), wait, tier)
         return
 
     await _do_translate(update, context, text)
@@ -982,6 +1251,8 @@ async def setup_commands(app):
         BotCommand("clear_stats", "🗑 清除统计"),
         BotCommand("id", "🆔 查看ID"),
         BotCommand("ping", "🏓 延迟"),
+        BotCommand("profile", "🔬 采样分析"),
+        BotCommand("trace", "🧵 导出追踪"),
         BotCommand("authorize", "🔐 授权用户"),
         BotCommand("unauthorize", "🔐 取消授权"),
         BotCommand("authorized", "📋 授权列表"),
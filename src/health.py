@@ -0,0 +1,106 @@
+"""引擎健康探测 — 后台定期向各已配置引擎发送极短的翻译请求
+
+探测结果只计入熔断器（不占引擎限流名额，延迟单独保存、不进入超时 / 对冲所用的延迟统计）：
+连续失败即提前打开熔断，用户消息直接走备选引擎；
+熔断中的引擎探测成功即转为半开（不必等满冷却时间），是否关闭仍由下一个真实请求决定。
+近期已有真实请求成功的引擎跳过本轮探测。/ping 与 /providers 读取缓存结果。
+"""
+
+import asyncio
+import logging
+import time
+from typing import NamedTuple
+
+from src import translator
+from src.config import Config
+from src.limiter import QueueTimeout
+from src.providers import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+PROBE_TEXT = "hello"
+PROBE_TARGET = "中文"
+PROBE_FAIL_THRESHOLD = 2  # 连续失败 N 次判定故障
+
+
+class ProbeResult(NamedTuple):
+    ok: bool
+    latency: float  # 秒
+    error: str
+    checked_at: float  # time.time()
+
+
+_results: dict[str, ProbeResult] = {}
+_fail_streak: dict[str, int] = {}
+_task: asyncio.Task | None = None
+
+
+async def probe(engine: str) -> ProbeResult:
+    """探测单个引擎并更新熔断状态"""
+    t0 = time.monotonic()
+    try:
+        await translator.probe_engine(engine, PROBE_TEXT, PROBE_TARGET)
+    except (RateLimitError, QueueTimeout) as e:
+        # 限流 / 排队满说明引擎在工作，不改变健康判定
+        result = ProbeResult(True, time.monotonic() - t0, f"限流: {e}"[:80], time.time())
+        _results[engine] = result
+        return result
+    except Exception as e:
+        streak = _fail_streak[engine] = _fail_streak.get(engine, 0) + 1
+        result = ProbeResult(False, time.monotonic() - t0, str(e)[:80], time.time())
+        _results[engine] = result
+        logger.warning("[%s] 🩺 探测失败（连续 %d 次）: %s", engine, streak, result.error)
+        if streak >= PROBE_FAIL_THRESHOLD:
+            translator.mark_engine_health(engine, False)
+        return result
+
+    _fail_streak[engine] = 0
+    result = ProbeResult(True, time.monotonic() - t0, "", time.time())
+    _results[engine] = result
+    translator.mark_engine_health(engine, True)
+    return result
+
+
+def _recently_ok(engine: str) -> bool:
+    last = translator.get_last_success(engine)
+    return last is not None and time.monotonic() - last < Config.HEALTH_PROBE_INTERVAL
+
+
+async def probe_all():
+    """并发探测所有已配置引擎（近期有成功请求的跳过）"""
+    engines = [e for e in Config.available_providers() if not _recently_ok(e)]
+    if engines:
+        await asyncio.gather(*(probe(e) for e in engines))
+
+
+async def _run():
+    while True:
+        try:
+            await probe_all()
+        except Exception as e:
+            logger.error("健康探测异常: %s", e)
+        await asyncio.sleep(Config.HEALTH_PROBE_INTERVAL)
+
+
+def start():
+    """启动后台探测（需在事件循环内调用）"""
+    global _task
+    if Config.HEALTH_PROBE_INTERVAL > 0 and _task is None:
+        _task = asyncio.create_task(_run())
+        logger.info("🩺 引擎健康探测已启动（每 %.0fs）", Config.HEALTH_PROBE_INTERVAL)
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
+
+def get_results() -> dict[str, ProbeResult]:
+    """各引擎最近一次探测结果"""
+    return dict(_results)
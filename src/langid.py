@@ -0,0 +1,283 @@
+"""本地语言识别 — 文字区块统计 + 字符 n-gram 打分，纯 CPU、无网络
+
+用于在调用引擎前确定实际目标语言（智能互翻），避免同语言时的二次往返。
+返回的语言名与 /lang 快捷语言一致。
+"""
+
+import re
+import unicodedata
+
+# 语言别名（小写），用于判断识别结果是否等于用户配置的目标语言
+LANG_ALIASES: dict[str, tuple[str, ...]] = {
+    "中文": ("中文", "chinese", "简体中文", "繁體中文", "繁体中文", "汉语", "zh"),
+    "English": ("english", "英文", "英语", "en"),
+    "日本語": ("日本語", "japanese", "日语", "日文", "ja"),
+    "한국어": ("한국어", "korean", "韩语", "韩文", "ko"),
+    "Русский": ("русский", "russian", "俄语", "ru"),
+    "Français": ("français", "francais", "french", "法语", "fr"),
+    "Español": ("español", "espanol", "spanish", "西班牙语", "es"),
+    "Deutsch": ("deutsch", "german", "德语", "de"),
+    "Português": ("português", "portugues", "portuguese", "葡萄牙语", "pt"),
+    "العربية": ("العربية", "arabic", "阿拉伯语", "ar"),
+    "ไทย": ("ไทย", "thai", "泰语", "th"),
+    "Tiếng Việt": ("tiếng việt", "vietnamese", "越南语", "vi"),
+    "Italiano": ("italiano", "italian", "意大利语", "it"),
+    "Bahasa Indonesia": ("bahasa indonesia", "bahasa", "indonesian", "印尼语", "id"),
+    "हिन्दी": ("हिन्दी", "hindi", "印地语", "hi"),
+}
+
+# 非拉丁文字：区块 → 语言（日文由假名判定，见 detect）
+_SCRIPT_RANGES: tuple[tuple[int, int, str], ...] = (
+    (0x3040, 0x30FF, "kana"),
+    (0x31F0, 0x31FF, "kana"),
+    (0xFF66, 0xFF9F, "kana"),
+    (0x3400, 0x4DBF, "han"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xF900, 0xFAFF, "han"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x3130, 0x318F, "hangul"),
+    (0xAC00, 0xD7AF, "hangul"),
+    (0x0400, 0x04FF, "cyrillic"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0xFB50, 0xFDFF, "arabic"),
+    (0xFE70, 0xFEFF, "arabic"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x0900, 0x097F, "devanagari"),
+)
+
+_SCRIPT_LANG = {
+    "han": "中文",
+    "hangul": "한국어",
+    "cyrillic": "Русский",
+    "arabic": "العربية",
+    "thai": "ไทย",
+    "devanagari": "हिन्दी",
+}
+
+# 拉丁语系：高频词（权重 3）+ 特征三元组（权重 1）+ 特征字母（权重 2）
+_LATIN_PROFILES: dict[str, dict[str, frozenset[str] | str]] = {
+    "English": {
+        "words": frozenset("the and is are was were of to in that it for you with on this have be not "
+                           "but what they his her from by at we can will would there their your about".split()),
+        "grams": frozenset(["the", "he ", " th", "ing", "ng ", "and", "nd ", " an", "ion", "tio", "ed ", "at "]),
+        "chars": "",
+    },
+    "Français": {
+        "words": frozenset("le la les des est et un une du que qui dans pour pas sur ce sont avec il elle "
+                           "nous vous je au aux mais ou très cette être avoir fait".split()),
+        "grams": frozenset(["es ", " le", "ent", " de", "les", "de ", "ion", " la", "que", "ou ", "eux", "ais"]),
+        "chars": "éèêàçùœ",
+    },
+    "Español": {
+        "words": frozenset("el la los las de que y en un una es por con para no se del al lo como más "
+                           "pero sus le ya está muy también hay son".split()),
+        "grams": frozenset([" de", "de ", "os ", " la", "la ", "ión", "ent", " el", "el ", "es ", "ado", "que"]),
+        "chars": "ñ¿¡áíóú",
+    },
+    "Deutsch": {
+        "words": frozenset("der die das und ist nicht ein eine ich du er sie es zu mit auf für den dem "
+                           "von sich auch wir wird sind haben kann noch".split()),
+        "grams": frozenset(["en ", "er ", "ch ", "sch", "ein", "ich", "die", "der", " un", "und", "nd ", "cht"]),
+        "chars": "äöüß",
+    },
+    "Português": {
+        "words": frozenset("o a os as de que e do da em um uma é não para com por se mais dos das mas "
+                           "como foi ao você está são também".split()),
+        "grams": frozenset([" de", "de ", "os ", "ão ", "ção", " qu", "que", "ent", "do ", "da ", "nte", "as "]),
+        "chars": "ãõçâêô",
+    },
+    "Italiano": {
+        "words": frozenset("il lo la i gli le di che e è un una per non in con del della sono questo "
+                           "anche come ma più ci si mi ho".split()),
+        "grams": frozenset([" di", "di ", "che", " ch", "to ", "la ", "ell", "lla", "zio", "ion", "re ", "ent"]),
+        "chars": "àèìòù",
+    },
+    "Bahasa Indonesia": {
+        "words": frozenset("yang dan di ini itu dengan untuk tidak dari dalam akan pada juga ke saya "
+                           "kami kita ada bisa atau sudah adalah mereka".split()),
+        "grams": frozenset(["an ", "ang", "ng ", " me", "kan", "yan", " ya", "ber", "men", "ada", "nya", "di "]),
+        "chars": "",
+    },
+}
+
+# 反向索引：词 / 三元组 / 字母 → 所属语言，打分时每个元素只查一次
+_WORD_INDEX: dict[str, tuple[str, ...]] = {}
+_GRAM_INDEX: dict[str, tuple[str, ...]] = {}
+_CHAR_INDEX: dict[str, tuple[str, ...]] = {}
+for _lang, _profile in _LATIN_PROFILES.items():
+    for _index, _items in ((_WORD_INDEX, _profile["words"]), (_GRAM_INDEX, _profile["grams"]),
+                           (_CHAR_INDEX, _profile["chars"])):
+        for _item in _items:
+            _index[_item] = _index.get(_item, ()) + (_lang,)
+
+# 越南语专有字母（含组合声调后的拉丁扩展附加区）
+_VIET_CHARS = frozenset("ăâđêôơưĂÂĐÊÔƠƯ")
+# 其中只有越南语使用的字母（ă / â / ê / ô 罗马尼亚语、法语等也用）
+_VIET_ONLY_CHARS = frozenset("đơưĐƠƯ")
+
+_WORD_RE = re.compile(r"[a-zA-Z\u00C0-\u024F\u1E00-\u1EFF]+")
+
+# 低于此置信度不做判断，交由引擎识别
+MIN_CONFIDENCE = 0.6
+
+# 只对应一种语言的文字：调用前可据此直接切换目标语言
+# （西里尔 / 阿拉伯字母 / 天城文由多种语言共用，不在此列）
+_SINGLE_LANG_SCRIPTS = {"japanese": "日本語", "hangul": "한국어", "thai": "ไทย"}
+# 不含假名的汉字文本达到此字数才判为中文（短的纯汉字词组可能是日文地名 / 人名）
+HAN_MIN_CHARS = 6
+# 拉丁文字：停用词命中数须达到下限，且为第二名的若干倍
+LATIN_MIN_STOPWORDS = 2
+LATIN_STOPWORD_RATIO = 2.0
+
+
+def _script_of(ch: str) -> str | None:
+    cp = ord(ch)
+    if cp < 0x0250:
+        return "latin" if ch.isalpha() else None
+    if 0x1E00 <= cp <= 0x1EFF:
+        return "latin"
+    for lo, hi, script in _SCRIPT_RANGES:
+        if lo <= cp <= hi:
+            return script
+    return None
+
+
+def _score_latin(text: str) -> tuple[str, float]:
+    """拉丁文字：按词表 + 三元组 + 特征字母打分，返回 (语言, 置信度)"""
+    lower = text.lower()
+    words = _WORD_RE.findall(lower)
+    if not words:
+        return "English", 0.0
+
+    viet = sum(1 for ch in lower if ch in _VIET_CHARS or 0x1EA0 <= ord(ch) <= 0x1EF9)
+    if viet and viet / max(1, len(words)) >= 0.3:
+        return "Tiếng Việt", min(1.0, 0.6 + viet / len(words))
+
+    scores = dict.fromkeys(_LATIN_PROFILES, 0.0)
+    for w in words:
+        for lang in _WORD_INDEX.get(w, ()):
+            scores[lang] += 3.0
+    padded = " " + " ".join(words) + " "
+    for i in range(len(padded) - 2):
+        for lang in _GRAM_INDEX.get(padded[i:i + 3], ()):
+            scores[lang] += 1.0
+    for ch in lower:
+        for lang in _CHAR_INDEX.get(ch, ()):
+            scores[lang] += 2.0
+
+    best = max(scores, key=scores.get)
+    top = scores[best]
+    if top <= 0:
+        return "English", 0.0
+    second = max((v for k, v in scores.items() if k != best), default=0.0)
+    # 置信度：领先幅度 + 样本量（词越多越可信）
+    margin = (top - second) / top
+    volume = min(1.0, len(words) / 4)
+    return best, margin * 0.6 + volume * 0.4 if margin > 0 else 0.0
+
+
+def _main_script(text: str) -> tuple[str | None, float]:
+    """主要文字及其占比；假名与汉字合并为 japanese"""
+    counts: dict[str, int] = {}
+    for ch in text:
+        script = _script_of(ch)
+        if script:
+            counts[script] = counts.get(script, 0) + 1
+    if not counts:
+        return None, 0.0
+
+    # 拉丁字母按词计数，与 CJK 等按字计数的文字大致对齐
+    latin_words = len(_WORD_RE.findall(text)) if counts.get("latin") else 0
+    weights = {s: (latin_words * 2 if s == "latin" else n) for s, n in counts.items()}
+
+    kana = weights.pop("kana", 0)
+    if kana:
+        # 含假名即日文；汉字并入日文权重
+        weights["japanese"] = kana + weights.pop("han", 0)
+
+    script = max(weights, key=weights.get)
+    return script, weights[script] / sum(weights.values())
+
+
+def detect(text: str) -> tuple[str | None, float]:
+    """
+    识别文本语言，返回 (语言名, 置信度 0~1)；无可识别文字返回 (None, 0.0)
+
+    语言名与 /lang 快捷语言一致（中文 / English / 日本語 ...）。
+    只按文字区块猜测：乌克兰语会识别为 Русский、纯汉字日文为 中文，
+    据此改变翻译行为前应改用 detect_unambiguous。
+    """
+    script, share = _main_script(text)
+    if script is None:
+        return None, 0.0
+
+    if script == "japanese":
+        return "日本語", share
+    if script == "latin":
+        lang, conf = _score_latin(text)
+        return lang, conf * share
+    return _SCRIPT_LANG[script], share
+
+
+def _latin_by_stopwords(text: str) -> str | None:
+    """拉丁文字：越南语专有字母，或某语言停用词明显领先时返回该语言"""
+    lower = text.lower()
+    if any(ch in _VIET_ONLY_CHARS or 0x1EA0 <= ord(ch) <= 0x1EF9 for ch in lower):
+        return "Tiếng Việt"
+    hits: dict[str, int] = {}
+    for w in _WORD_RE.findall(lower):
+        for lang in _WORD_INDEX.get(w, ()):
+            hits[lang] = hits.get(lang, 0) + 1
+    if not hits:
+        return None
+    ranked = sorted(hits.items(), key=lambda kv: kv[1], reverse=True)
+    best, top = ranked[0]
+    second = ranked[1][1] if len(ranked) > 1 else 0
+    if top >= LATIN_MIN_STOPWORDS and top >= second * LATIN_STOPWORD_RATIO:
+        return best
+    return None
+
+
+def detect_unambiguous(text: str) -> str | None:
+    """
+    只在不会认错时返回语言名，否则返回 None 交由引擎识别。
+
+    用于调用引擎前切换目标语言：谚文 / 假名 / 泰文只对应一种语言；不含假名的汉字
+    达到 HAN_MIN_CHARS 字判为中文；拉丁文字要求停用词明显领先（土耳其语、罗马尼亚语等
+    词表外语言不会被当成德语 / 葡萄牙语）。西里尔、阿拉伯字母、天城文由多种语言共用，一律不判断。
+    """
+    script, share = _main_script(text)
+    if script is None or share < MIN_CONFIDENCE:
+        return None
+    if script == "latin":
+        return _latin_by_stopwords(text)
+    if script == "han":
+        # 含假名时已并入 japanese，这里一定不含假名
+        han = sum(1 for ch in text if _script_of(ch) == "han")
+        return _SCRIPT_LANG["han"] if han >= HAN_MIN_CHARS else None
+    return _SINGLE_LANG_SCRIPTS.get(script)
+
+
+def has_linguistic_content(text: str) -> bool:
+    """
+    是否包含任何可翻译的文字（纯数字 / 符号 / emoji 返回 False）
+
+    按 Unicode 字母判断，不限于 _SCRIPT_RANGES：希腊文、希伯来文、亚美尼亚文等
+    本地不识别语言的文字同样需要翻译。
+    """
+    return any(ch.isalpha() for ch in text)
+
+
+def normalize_lang(name: str) -> str | None:
+    """将用户配置的语言名映射为标准语言名，未知返回 None"""
+    key = unicodedata.normalize("NFC", name).lower().strip()
+    for lang, aliases in LANG_ALIASES.items():
+        if key == lang.lower() or key in aliases:
+            return lang
+    return None
+
+
+def is_same_lang(detected: str, target: str) -> bool:
+    """识别出的语言是否就是目标语言"""
+    return normalize_lang(target) == detected
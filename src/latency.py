@@ -0,0 +1,188 @@
+"""引擎延迟统计 — 常量内存的流式对数分桶直方图（HDR 风格），按 引擎+模型 统计，可快照持久化"""
+
+import math
+import time
+import logging
+
+from src.store import load_latency_snapshot, save_latency_snapshot
+
+logger = logging.getLogger(__name__)
+
+# 分桶：10ms ~ 300s，相邻桶边界相差 10%（分位数相对误差 ≤ 10%）
+_MIN_VALUE = 0.01
+_MAX_VALUE = 300.0
+_GROWTH = 1.1
+_LOG_GROWTH = math.log(_GROWTH)
+_NUM_BUCKETS = int(math.log(_MAX_VALUE / _MIN_VALUE) / _LOG_GROWTH) + 2
+
+# 衰减：总权重超过阈值时全部减半，使统计偏向近期数据
+_DECAY_THRESHOLD = 1000.0
+
+_SNAPSHOT_INTERVAL = 30.0  # 快照最短间隔（秒）
+
+
+def _bucket_of(value: float) -> int:
+    if value <= _MIN_VALUE:
+        return 0
+    return min(_NUM_BUCKETS - 1, int(math.log(value / _MIN_VALUE) / _LOG_GROWTH) + 1)
+
+
+def _bucket_upper(index: int) -> float:
+    return _MIN_VALUE * _GROWTH ** index
+
+
+class LatencyHistogram:
+    """流式延迟直方图：O(1) 记录，固定 ~110 个桶"""
+
+    __slots__ = ("counts", "total", "sum", "errors")
+
+    def __init__(self):
+        self.counts = [0.0] * _NUM_BUCKETS
+        self.total = 0.0
+        self.sum = 0.0
+        self.errors = 0.0
+
+    def record(self, seconds: float):
+        self.counts[_bucket_of(seconds)] += 1
+        self.total += 1
+        self.sum += seconds
+        self._maybe_decay()
+
+    def record_error(self):
+        self.errors += 1
+        self._maybe_decay()
+
+    def _maybe_decay(self):
+        if self.total + self.errors < _DECAY_THRESHOLD:
+            return
+        self.counts = [c / 2 for c in self.counts]
+        self.total /= 2
+        self.sum /= 2
+        self.errors /= 2
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.total if self.total else None
+
+    @property
+    def error_rate(self) -> float:
+        n = self.total + self.errors
+        return self.errors / n if n else 0.0
+
+    def quantile(self, q: float) -> float | None:
+        """分位数（取桶上界，偏保守）"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0.0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return _bucket_upper(i)
+        return _bucket_upper(_NUM_BUCKETS - 1)
+
+    def stats(self) -> dict:
+        return {
+            "count": int(self.total),
+            "mean": self.mean,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "error_rate": self.error_rate,
+        }
+
+    def to_dict(self) -> dict:
+        # 稀疏存储非零桶
+        return {
+            "buckets": {str(i): round(c, 3) for i, c in enumerate(self.counts) if c},
+            "sum": self.sum,
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        h = cls()
+        for i, c in data.get("buckets", {}).items():
+            idx = int(i)
+            if 0 <= idx < _NUM_BUCKETS:
+                h.counts[idx] = float(c)
+        h.total = sum(h.counts)
+        h.sum = float(data.get("sum", 0.0))
+        h.errors = float(data.get("errors", 0.0))
+        return h
+
+
+_histograms: dict[str, LatencyHistogram] = {}
+_loaded = False
+_last_snapshot = 0.0
+
+
+def _key(engine: str, model: str) -> str:
+    return f"{engine}:{model}"
+
+
+def _ensure_loaded():
+    """首次使用时从 data/ 恢复快照，重启后路由即有热数据"""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    for key, data in load_latency_snapshot().items():
+        try:
+            _histograms[key] = LatencyHistogram.from_dict(data)
+        except (TypeError, ValueError, AttributeError):
+            logger.warning("延迟快照损坏，已忽略: %s", key)
+
+
+def get_histogram(engine: str, model: str) -> LatencyHistogram:
+    _ensure_loaded()
+    key = _key(engine, model)
+    h = _histograms.get(key)
+    if h is None:
+        h = _histograms[key] = LatencyHistogram()
+    return h
+
+
+def find_histogram(engine: str, model: str) -> LatencyHistogram | None:
+    """只读查询，不创建空直方图"""
+    _ensure_loaded()
+    return _histograms.get(_key(engine, model))
+
+
+def record(engine: str, model: str, seconds: float):
+    get_histogram(engine, model).record(seconds)
+    _maybe_snapshot()
+
+
+def record_error(engine: str, model: str):
+    get_histogram(engine, model).record_error()
+    _maybe_snapshot()
+
+
+def record_timeout(engine: str, model: str, seconds: float):
+    """超时：既计为错误，也以已等待时长计入延迟（删失样本）"""
+    h = get_histogram(engine, model)
+    h.record(seconds)
+    h.record_error()
+    _maybe_snapshot()
+
+
+def all_stats() -> dict[str, dict]:
+    """全部 引擎:模型 的统计"""
+    _ensure_loaded()
+    return {key: h.stats() for key, h in _histograms.items()}
+
+
+def _maybe_snapshot():
+    global _last_snapshot
+    now = time.monotonic()
+    if now - _last_snapshot >= _SNAPSHOT_INTERVAL:
+        _last_snapshot = now
+        save_snapshot()
+
+
+def save_snapshot(*, force: bool = False):
+    """写入快照（关停时 force=True 立即落盘）"""
+    if not _loaded:
+        return
+    save_latency_snapshot({key: h.to_dict() for key, h in _histograms.items()}, force=force)
@@ -0,0 +1,209 @@
+"""引擎限流 — 令牌桶 + AIMD 并发控制，按 429 / Retry-After / 限流响应头自适应
+
+每个引擎一个限流器：
+- 并发上限按 AIMD 调整：初始为 LIMITER_MAX（未被限流前等同不限），遇到 429 按当时在途数减半，
+  之后名额用满时成功一次 +1/limit（约每轮 +1）逐步恢复
+- 令牌桶与响应头同步（limit / remaining / reset），未知时不限速
+- 429 / 额度耗尽时暂停到 Retry-After / 重置时间
+请求在限流器内排队等待，而不是直接失败转而压垮其他引擎。
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from src.providers.base import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+LIMITER_MIN = 1
+LIMITER_MAX = 128  # 并发上限上界，也是初始值：只有 429 才收缩
+LIMITER_DECREASE_FACTOR = 0.5  # 429 时并发上限乘数
+LIMITER_DEFAULT_PAUSE = 1.0  # 429 未给出 Retry-After 时的暂停（秒）
+LIMITER_MAX_WAIT = 20.0  # 排队等待上限（秒），超过则视为限流交由降级
+
+# 限流响应头（OpenAI 兼容 / Anthropic）
+_LIMIT_HEADERS = ("x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit")
+_REMAINING_HEADERS = ("x-ratelimit-remaining-requests", "anthropic-ratelimit-requests-remaining")
+_RESET_HEADERS = ("x-ratelimit-reset-requests", "anthropic-ratelimit-requests-reset")
+
+class QueueTimeout(RateLimitError):
+    """排队等待超过 LIMITER_MAX_WAIT（或暂停时间更长）：应改用其他引擎"""
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: str | None) -> float | None:
+    """解析重置时间："6m0s" / "20ms" / "1.5" / RFC3339 时间戳 → 秒"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if parts and "".join(n + u for n, u in parts) == value:
+        return sum(float(n) * _DURATION_UNITS[u] for n, u in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    except ValueError:
+        return None
+
+
+class EngineLimiter:
+    """单引擎限流器：acquire() 排队获取名额，release() 归还"""
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.limit = float(LIMITER_MAX)
+        self.inflight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._rate: float | None = None  # 令牌/秒，None 为不限速
+        self._capacity = 1.0
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.throttled = 0  # 累计 429 次数
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def has_capacity(self) -> bool:
+        """当前可立即发送（对冲选备选引擎时使用）"""
+        return not self._waiters and self.inflight < int(self.limit) and self._wait_time(time.monotonic()) <= 0
+
+    def _wait_time(self, now: float) -> float:
+        """距离可发送还需等待的秒数（暂停 / 令牌不足），0 为可立即发送"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._rate is None:
+            return 0.0
+        self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self._rate)
+        self._refilled = now
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+
+    async def acquire(self):
+        """获取一个发送名额；排队超过 LIMITER_MAX_WAIT 抛出 QueueTimeout"""
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + LIMITER_MAX_WAIT
+        first = True
+        while True:
+            now = time.monotonic()
+            wait = self._wait_time(now)
+            # 新请求不插队：已有排队者时先入队
+            if wait <= 0 and self.inflight < int(self.limit) and not (first and self._waiters):
+                if self._rate is not None:
+                    self._tokens -= 1
+                self.inflight += 1
+                return
+            first = False
+            if now + wait > deadline:
+                raise QueueTimeout(f"[{self.engine}] 限流排队超时", wait)
+
+            fut = loop.create_future()
+            self._waiters.append(fut)
+            try:
+                # 有等待时间时定时醒来，否则等待名额释放
+                await asyncio.wait_for(fut, timeout=min(wait, deadline - now) if wait > 0 else deadline - now)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if fut in self._waiters:
+                    self._waiters.remove(fut)
+
+    def release(self):
+        self.inflight = max(0, self.inflight - 1)
+        self._wake()
+
+    def _wake(self):
+        slots = int(self.limit) - self.inflight
+        for fut in list(self._waiters):
+            if slots <= 0:
+                break
+            if not fut.done():
+                fut.set_result(None)
+                slots -= 1
+
+    def on_success(self):
+        """加性增：每完成约 limit 个请求上限 +1（仅在名额用满时增长）"""
+        if self.limit < LIMITER_MAX and self.inflight + 1 >= int(self.limit):
+            self.limit = min(LIMITER_MAX, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_rate_limited(self, retry_after: float | None = None, started: float = 0.0):
+        """
+        乘性减：并发上限减为当时在途数的一半（上限远高于实际并发时直接减半无效），暂停到 Retry-After。
+        started 为该请求发出时间，上次收缩之前发出的请求不再重复收缩（同一波 429 只减一次）
+        """
+        now = time.monotonic()
+        self.throttled += 1
+        pause = retry_after if retry_after is not None else LIMITER_DEFAULT_PAUSE
+        self._paused_until = max(self._paused_until, now + pause)
+        if started >= self._last_decrease:
+            self._last_decrease = now
+            # 调用方在释放名额前回调，在途数含本请求
+            self.limit = max(LIMITER_MIN, min(self.limit, max(self.inflight, 1)) * LIMITER_DECREASE_FACTOR)
+            logger.warning("[%s] 🚦 限流 429，并发上限 → %d，暂停 %.1fs", self.engine, int(self.limit), pause)
+
+    def observe(self, headers):
+        """
+        根据限流响应头同步令牌桶：容量 = limit，当前令牌 = remaining，
+        reset 为补满所需时间，故补充速率 = (limit - remaining) / reset
+        """
+        if not headers:
+            return
+        lower = {k.lower(): v for k, v in headers.items()}
+        try:
+            limit = float(next(lower[h] for h in _LIMIT_HEADERS if h in lower))
+            remaining = float(next(lower[h] for h in _REMAINING_HEADERS if h in lower))
+        except (StopIteration, ValueError):
+            return
+        reset = parse_duration(next((lower[h] for h in _RESET_HEADERS if h in lower), None))
+        if reset is None or limit <= 0:
+            return
+
+        now = time.monotonic()
+        if remaining <= 0:
+            self._paused_until = max(self._paused_until, now + reset)
+            logger.info("[%s] 🚦 请求额度耗尽，%.1fs 后恢复", self.engine, reset)
+        if remaining < limit and reset > 0:
+            self._rate = (limit - remaining) / reset
+        self._capacity = limit
+        # 其他在途请求已各占一个令牌，但尚未反映在 remaining 中
+        self._tokens = max(0.0, min(limit, remaining - (self.inflight - 1)))
+        self._refilled = now
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "rate": self._rate,
+            "paused": max(0.0, self._paused_until - now),
+            "throttled": self.throttled,
+        }
+
+
+_limiters: dict[str, EngineLimiter] = {}
+
+
+def get_limiter(engine: str) -> EngineLimiter:
+    lim = _limiters.get(engine)
+    if lim is None:
+        lim = _limiters[engine] = EngineLimiter(engine)
+    return lim
+
+
+def all_states() -> dict[str, dict]:
+    """各引擎限流状态 {engine: {"limit", "inflight", "queued", "rate", "paused", "throttled"}}"""
+    return {name: lim.snapshot() for name, lim in _limiters.items()}
@@ -17,11 +17,16 @@ from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, Cal
 
 from src.config import Config, VERSION
 from src.store import flush_all
+from src.latency import save_snapshot as save_latency_snapshot
+from src import cache, health, metrics, ratelimit, tm
+from src.dispatcher import ChatOrderedProcessor
+from src.providers import transport
+from src.translator import close_batcher, warm_up
 from src.handlers import (
     cmd_start, cmd_help, cmd_settings, cmd_lang, cmd_set_lang,
     cmd_set_provider, cmd_set_model, cmd_auto_on, cmd_auto_off,
     cmd_status, cmd_translate, cmd_providers, cmd_reset,
-    cmd_clear_stats, cmd_id, cmd_ping,
+    cmd_clear_stats, cmd_id, cmd_ping, cmd_profile, cmd_trace,
     cmd_authorize, cmd_unauthorize, cmd_authorized,
     callback_handler, handle_message, setup_commands, error_handler,
 )
@@ -44,39 +49,14 @@ _shutdown_event = asyncio.Event()
 def _handle_signal(sig, _frame):
     """收到终止信号 → 优雅关停"""
     logger.info("🛑 收到信号 %s，正在优雅关停...", signal.Signals(sig).name)
+    save_latency_snapshot(force=True)
     flush_all()
+    cache.flush()
     _shutdown_event.set()
 
 
-def main():
-    """启动机器人"""
-    if not Config.TELEGRAM_BOT_TOKEN:
-        logger.error("❌ 未设置 TELEGRAM_BOT_TOKEN")
-        sys.exit(1)
-
-    available = Config.available_providers()
-    if not available:
-        logger.error("❌ 未配置任何 AI API Key")
-        sys.exit(1)
-
-    # ── 启动信息 ──
-    logger.info("╔══════════════════════════════════════╗")
-    logger.info("║  🌐 AI Translator Bot v%s          ║", VERSION)
-    logger.info("╚══════════════════════════════════════╝")
-    logger.info("  🤖 引擎: %s", ", ".join(available))
-    logger.info("  🎯 默认: %s → %s", Config.DEFAULT_PROVIDER, Config.DEFAULT_TARGET_LANG)
-    logger.info("  👑 管理: %d 位授权用户", len(Config.ADMIN_USER_IDS))
-    logger.info("  📝 文本上限: %d 字符 | 频率限制: %d/分钟", Config.MAX_TEXT_LENGTH, Config.RATE_LIMIT_PER_MIN)
-
-    # ── 信号处理（优雅关停）──
-    for sig in (signal.SIGINT, signal.SIGTERM):
-        try:
-            signal.signal(sig, _handle_signal)
-        except (OSError, ValueError):
-            pass  # Windows 下 SIGTERM 可能不可用
-
-    app = ApplicationBuilder().token(Config.TELEGRAM_BOT_TOKEN).build()
-
+def register_handlers(app):
+    """注册命令 / 回调 / 消息 / 错误处理器"""
     # 命令处理器
     commands = {
         "start": cmd_start,
@@ -95,6 +75,8 @@ def main():
         "clear_stats": cmd_clear_stats,
         "id": cmd_id,
         "ping": cmd_ping,
+        "profile": cmd_profile,
+        "trace": cmd_trace,
         "authorize": cmd_authorize,
         "unauthorize": cmd_unauthorize,
         "authorized": cmd_authorized,
@@ -110,8 +92,65 @@ def main():
     ))
     app.add_error_handler(error_handler)
 
-    # 注册命令菜单
-    app.post_init = setup_commands
+
+async def _post_init(app):
+    """启动后：注册命令菜单 + 预热译文缓存 / 引擎连接 + 启动健康探测 + 指标端点"""
+    await setup_commands(app)
+    cache.warm()
+    await warm_up()
+    health.start()
+    if Config.METRICS_PORT > 0:
+        await metrics.start_server(Config.METRICS_PORT, Config.METRICS_HOST)
+
+
+async def _post_shutdown(_app):
+    await ratelimit.close()
+    await close_batcher()
+    await metrics.stop_server()
+    await health.stop()
+    await transport.close()
+
+
+def main():
+    """启动机器人"""
+    if not Config.TELEGRAM_BOT_TOKEN:
+        logger.error("❌ 未设置 TELEGRAM_BOT_TOKEN")
+        sys.exit(1)
+
+    available = Config.available_providers()
+    if not available:
+        logger.error("❌ 未配置任何 AI API Key")
+        sys.exit(1)
+
+    # ── 启动信息 ──
+    logger.info("╔══════════════════════════════════════╗")
+    logger.info("║  🌐 AI Translator Bot v%s          ║", VERSION)
+    logger.info("╚══════════════════════════════════════╝")
+    logger.info("  🤖 引擎: %s", ", ".join(available))
+    logger.info("  🎯 默认: %s → %s", Config.DEFAULT_PROVIDER, Config.DEFAULT_TARGET_LANG)
+    logger.info("  👑 管理: %d 位授权用户", len(Config.ADMIN_USER_IDS))
+    logger.info("  📝 文本上限: %d 字符 | 频率限制: 用户 %d / 聊天 %d / 全局 %d 每分钟",
+                Config.MAX_TEXT_LENGTH, Config.RATE_LIMIT_PER_MIN,
+                Config.RATE_LIMIT_CHAT_PER_MIN, Config.RATE_LIMIT_GLOBAL_PER_MIN)
+
+    # ── 信号处理（优雅关停）──
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, _handle_signal)
+        except (OSError, ValueError):
+            pass  # Windows 下 SIGTERM 可能不可用
+
+    builder = ApplicationBuilder().token(Config.TELEGRAM_BOT_TOKEN)
+    if Config.UPDATE_CONCURRENCY > 1:
+        # 不同聊天并发处理，同一聊天按到达顺序
+        builder.concurrent_updates(ChatOrderedProcessor(Config.UPDATE_CONCURRENCY))
+    app = builder.build()
+
+    register_handlers(app)
+
+    # 注册命令菜单 + 连接预热 + 健康探测 / 关闭连接池
+    app.post_init = _post_init
+    app.post_shutdown = _post_shutdown
 
     # 启动（兼容 Python 3.14+）
     logger.info("✅ 机器人已启动，等待消息...")
@@ -122,7 +161,10 @@ def main():
     except (KeyboardInterrupt, SystemExit):
         logger.info("🛑 机器人关停中...")
     finally:
+        save_latency_snapshot(force=True)
         flush_all()
+        tm.close()
+        cache.close()
         logger.info("👋 数据已保存，再见！")
 
 
@@ -0,0 +1,93 @@
+"""占位符遮蔽 — 调用引擎前把链接 / 代码 / @提及 / #话题 / emoji 等替换为 ⟦n⟧，译后还原
+
+这些内容无需翻译，原样发送既浪费输入输出 token，模型也偶尔会改坏链接。
+还原时校验每个占位符恰好出现一次，任何缺失 / 重复 / 多出都视为失败，
+由调用方改用原文重新翻译。
+"""
+
+import re
+from typing import NamedTuple
+
+from src.langid import has_linguistic_content
+
+PLACEHOLDER_OPEN, PLACEHOLDER_CLOSE = "⟦", "⟧"
+
+_EMOJI = r"\U0001F000-\U0001FAFF\u2300-\u23FF\u2600-\u27BF\u2B00-\u2BFF"
+_EMOJI_EXT = r"\uFE0F\u200D\U0001F3FB-\U0001F3FF\U000E0020-\U000E007F"
+
+# 按优先级排列：先匹配的片段不会再被后面的模式拆开
+_SPAN_RE = re.compile(
+    "|".join((
+        r"```.*?```",  # 代码块
+        r"`[^`\n]+`",  # 行内代码
+        r"(?P<url>(?:https?://|www\.)[^\s<>\"'`]+)",  # 链接
+        r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+",  # 邮箱
+        r"(?<![\w@])@[A-Za-z0-9_]{3,32}",  # @提及
+        r"(?<![\w#])#[^\W\d]\w*",  # #话题
+        r"\b0x[0-9a-fA-F]{40}\b",  # 以太坊地址
+        r"\b(?=[A-Za-z]*\d)[1-9A-HJ-NP-Za-km-z]{32,44}\b",  # Base58 地址 / 交易哈希
+        rf"[{_EMOJI}][{_EMOJI}{_EMOJI_EXT}]*",  # emoji（含肤色 / ZWJ 组合）
+    )),
+    re.DOTALL,
+)
+# 链接末尾的标点归还给正文
+_URL_TRAILING = ".,;:!?)]}'\"。，！？；：）】」』"
+_PLACEHOLDER_RE = re.compile(r"⟦\s*(\d+)\s*⟧")
+
+
+class Masked(NamedTuple):
+    text: str  # 含占位符的文本
+    spans: list[str]  # 占位符 n 对应的原文片段
+
+
+def mask(text: str) -> Masked:
+    """替换不可翻译片段为 ⟦n⟧；原文已含占位符括号时不做处理"""
+    if PLACEHOLDER_OPEN in text or PLACEHOLDER_CLOSE in text:
+        return Masked(text, [])
+    spans: list[str] = []
+
+    def repl(m: re.Match) -> str:
+        span, tail = m.group(0), ""
+        if m.group("url"):
+            stripped = span.rstrip(_URL_TRAILING)
+            span, tail = stripped, span[len(stripped):]
+        spans.append(span)
+        return f"{PLACEHOLDER_OPEN}{len(spans) - 1}{PLACEHOLDER_CLOSE}{tail}"
+
+    masked = _SPAN_RE.sub(repl, text)
+    return Masked(masked, spans) if spans else Masked(text, [])
+
+
+def unmask(text: str, spans: list[str]) -> str | None:
+    """还原占位符；任一占位符缺失、重复或越界返回 None"""
+    found = [int(n) for n in _PLACEHOLDER_RE.findall(text)]
+    if sorted(found) != list(range(len(spans))):
+        return None
+    return _PLACEHOLDER_RE.sub(lambda m: spans[int(m.group(1))], text)
+
+
+_PARTIAL_TAIL_RE = re.compile(r"⟦\s*\d*\s*$")
+
+
+def unmask_partial(text: str, spans: list[str]) -> str:
+    """流式中间态：还原已完整出现的占位符，去掉末尾未写完的占位符（不校验完整性）"""
+    if not spans:
+        return text
+    text = _PARTIAL_TAIL_RE.sub("", text)
+    return _PLACEHOLDER_RE.sub(lambda m: spans[int(m.group(1))] if int(m.group(1)) < len(spans) else "", text)
+
+
+def placeholders_match(source: str, translation: str) -> bool:
+    """译文是否恰好保留了原文中的占位符（用于句段级校验）"""
+    return sorted(_PLACEHOLDER_RE.findall(source)) == sorted(_PLACEHOLDER_RE.findall(translation))
+
+
+def has_translatable(masked: Masked) -> bool:
+    """去掉占位符后是否还有需要翻译的文字"""
+    rest = _PLACEHOLDER_RE.sub(" ", masked.text) if masked.spans else masked.text
+    return has_linguistic_content(rest)
+
+
+def saved_chars(masked: Masked) -> int:
+    """遮蔽省下的字符数（片段长度 - 占位符长度）"""
+    return sum(len(s) - len(str(i)) - 2 for i, s in enumerate(masked.spans))
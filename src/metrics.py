@@ -0,0 +1,187 @@
+"""运行指标 — Prometheus 文本格式，内置 HTTP 端点（METRICS_PORT > 0 时启用）
+
+记录点只做字典累加（直方图多一次二分查找），可在生产环境常开；
+缓存条目、脏文件数等状态量由 collect 回调在抓取时计算，热路径零开销。
+本模块不依赖其他业务模块，store / translator / handlers 均可直接引用。
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = (), collect=None):
+        """collect: 抓取时调用，返回 {标签值元组: 数值}（无标签时可直接返回数值）"""
+        self.name, self.doc, self.labels, self.collect = name, doc, tuple(labels), collect
+        self._values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def _labelset(self, values: tuple, extra: str = "") -> str:
+        parts = [f'{k}="{_escape(v)}"' for k, v in zip(self.labels, values)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _current(self) -> dict[tuple, float]:
+        if self.collect is None:
+            return self._values
+        try:
+            data = self.collect()
+        except Exception as e:
+            logger.warning("指标采集失败 %s: %s", self.name, e)
+            return {}
+        return data if isinstance(data, dict) else {(): data}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{self.name}{self._labelset(k)} {_fmt(v)}" for k, v in self._current().items()]
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数"""
+    kind = "counter"
+
+    def inc(self, *labels, value: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def get(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+
+class Gauge(_Metric):
+    """瞬时值"""
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+    def inc(self, *labels, value: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def dec(self, *labels, value: float = 1.0):
+        self.inc(*labels, value=-value)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(_Metric):
+    """固定分桶直方图（累计计数，与 Prometheus 语义一致，不衰减）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list[float]] = {}  # 各桶计数 + [溢出, 总和]
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for le, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                le_label = 'le="%s"' % _fmt(le)
+                lines.append(f"{self.name}_bucket{self._labelset(labels, le_label)} {_fmt(cumulative)}")
+            lines.append(f"{self.name}_sum{self._labelset(labels)} {_fmt(series[-1])}")
+            lines.append(f"{self.name}_count{self._labelset(labels)} {_fmt(cumulative)}")
+        return lines
+
+
+def render() -> str:
+    """全部指标的 Prometheus 文本格式"""
+    return "\n".join(line for m in _registry for line in m.render()) + "\n"
+
+
+# ═══════════════════════════════════════════
+#  指标定义（状态量回调由所属模块注册）
+# ═══════════════════════════════════════════
+
+PROVIDER_LATENCY = Histogram("tgbot_provider_request_seconds", "引擎单次调用耗时", ("engine", "model"))
+PROVIDER_FAILURES = Counter("tgbot_provider_failures_total", "引擎调用失败（error / timeout / rate_limited）",
+                            ("engine", "model", "kind"))
+TRANSLATE_LATENCY = Histogram("tgbot_translate_seconds", "translate_text 端到端耗时（含重试 / 降级）",
+                              ("engine",))
+TRANSLATE_FALLBACKS = Counter("tgbot_translate_fallbacks_total", "由备选引擎完成的翻译", ("primary", "engine"))
+TRANSLATE_INFLIGHT = Gauge("tgbot_translate_inflight", "进行中的翻译请求（含合并等待者）")
+CACHE_REQUESTS = Counter("tgbot_translate_cache_requests_total", "译文缓存查询", ("result",))
+RATE_LIMITED = Counter("tgbot_rate_limited_total", "超出频率限制的请求（按受限级别 user / chat / global）", ("tier",))
+RATE_LIMIT_DELAYED = Counter("tgbot_rate_limit_delayed_total", "进入延迟队列的自动翻译（ordered=同聊天已有排队）", ("tier",))
+RATE_LIMIT_DROPPED = Counter("tgbot_rate_limit_dropped_total", "被丢弃的自动翻译（queue_full / too_long / expired）",
+                             ("reason",))
+RATE_LIMIT_DELAY = Histogram("tgbot_rate_limit_delay_seconds", "延迟队列中的实际等待时间",
+                             buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+LIMITER_REJECTED = Counter("tgbot_engine_queue_rejected_total", "引擎限流排队超时（改用备选引擎）", ("engine",))
+STORE_FLUSH = Histogram("tgbot_store_flush_seconds", "存储落盘耗时", ("file",),
+                        buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+TELEGRAM_SEND = Histogram("tgbot_telegram_send_seconds", "Telegram 发送 / 编辑消息耗时", ("method",))
+TELEGRAM_RETRY_AFTER = Counter("tgbot_telegram_retry_after_total", "Telegram RetryAfter 限流次数", ("method",))
+
+
+# ═══════════════════════════════════════════
+#  HTTP 端点
+# ═══════════════════════════════════════════
+
+_server: asyncio.AbstractServer | None = None
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            status, body = "200 OK", render().encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(port: int, host: str = "127.0.0.1"):
+    """启动指标端点 http://host:port/metrics"""
+    global _server
+    if _server is None:
+        _server = await asyncio.start_server(_serve, host, port)
+        logger.info("📈 指标端点: http://%s:%d/metrics", host, port)
+
+
+async def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
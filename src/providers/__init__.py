@@ -1,6 +1,6 @@
 """AI 提供商工厂"""
 
-from .base import BaseProvider
+from .base import BaseProvider, RateLimitError, get_usage_stats
 from .openai_compatible import OpenAICompatibleProvider, PROVIDER_CONFIGS
 from .claude import ClaudeProvider
 from .gemini import GeminiProvider
@@ -9,15 +9,17 @@ from .gemini import GeminiProvider
 ALL_PROVIDERS = ("deepseek", "openai", "claude", "gemini", "groq", "mistral")
 
 
-def create_provider(provider_name: str, api_key: str, model: str | None = None) -> BaseProvider:
-    """根据名称创建 AI 提供商实例"""
+def create_provider(
+    provider_name: str, api_key: str, model: str | None = None, client=None, base_url: str | None = None,
+) -> BaseProvider:
+    """根据名称创建 AI 提供商实例（传入 client 可复用同引擎已有的 SDK 客户端及其连接池；base_url 覆盖官方地址）"""
     name = provider_name.lower().strip()
     if name in PROVIDER_CONFIGS:
-        return OpenAICompatibleProvider(name, api_key, model)
+        return OpenAICompatibleProvider(name, api_key, model, client, base_url)
     elif name == "claude":
-        return ClaudeProvider(api_key, model)
+        return ClaudeProvider(api_key, model, client, base_url)
     elif name == "gemini":
-        return GeminiProvider(api_key, model)
+        return GeminiProvider(api_key, model, client, base_url)
     else:
         raise ValueError(f"不支持: {name}  可选: {', '.join(ALL_PROVIDERS)}")
 
@@ -41,4 +43,4 @@ PROVIDER_DISPLAY = {
     "mistral": "🌬️ Mistral",
 }
 
-__all__ = ["create_provider", "BaseProvider", "PROVIDER_MODELS", "PROVIDER_DISPLAY", "ALL_PROVIDERS"]
+__all__ = ["create_provider", "BaseProvider", "RateLimitError", "get_usage_stats", "PROVIDER_MODELS", "PROVIDER_DISPLAY", "ALL_PROVIDERS"]
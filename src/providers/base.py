@@ -3,93 +3,263 @@
 import json
 import re
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Callable, Mapping
+
+from src import tracing
+
+from .prompts import STREAM_DELIMITER, STREAM_LANG_PREFIX, SystemPrompt, system_prompt
+
+# 各引擎提示词 token 用量 {engine: {"calls", "prompt_tokens", "cached_tokens"}}
+_usage: dict[str, dict[str, int]] = {}
+
+
+def record_usage(engine: str, prompt_tokens: int, cached_tokens: int):
+    """记录一次调用的提示词 token 数及其中命中提示缓存的部分"""
+    u = _usage.setdefault(engine, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+    u["calls"] += 1
+    u["prompt_tokens"] += prompt_tokens or 0
+    u["cached_tokens"] += cached_tokens or 0
+
+
+def get_usage_stats() -> dict[str, dict[str, int]]:
+    return {k: dict(v) for k, v in _usage.items()}
+
 
 # 默认 API 超时（秒）
 DEFAULT_API_TIMEOUT = 30
 DEFAULT_MAX_TOKENS = 4096
 
 
+class RateLimitError(RuntimeError):
+    """引擎限流（HTTP 429）：retry_after 为建议等待秒数，未知为 None"""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(exc: Exception) -> float | None:
+    """从 SDK 异常中取 Retry-After：响应头（秒 / 毫秒）或 Gemini RetryInfo.retryDelay"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    details = getattr(exc, "details", None)
+    error = details.get("error", details) if isinstance(details, dict) else {}
+    for item in error.get("details", []) if isinstance(error, dict) else []:
+        delay = item.get("retryDelay") if isinstance(item, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                pass
+    return None
+
+
+# strict=False：模型偶尔在 JSON 字符串中直接输出换行
+_decoder = json.JSONDecoder(strict=False)
+_OBJECT_START_RE = re.compile(r'\{\s*"')
+_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+_PARTIAL_RE = re.compile(r'"translation"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+_LANG_FIELD_RE = re.compile(r'"detected_lang"\s*:\s*"([^"\\]*)"')
+
+
+def _as_result(data) -> dict | None:
+    if isinstance(data, dict) and isinstance(data.get("translation"), str):
+        return {"detected_lang": data.get("detected_lang") or "未知", "translation": data["translation"]}
+    return None
+
+
+class StreamParser:
+    """流式输出增量解析：先解析语言头，分隔符之后的内容即译文"""
+
+    def __init__(self):
+        self._buf = ""
+        self._body_start = -1
+        self.detected_lang = "未知"
+
+    def feed(self, delta: str) -> bool:
+        """追加增量，返回译文部分是否有更新"""
+        self._buf += delta
+        if self._body_start < 0:
+            self._parse_header()
+        return self._body_start >= 0 and len(self._buf) > self._body_start
+
+    def _parse_header(self):
+        marker = f"\n{STREAM_DELIMITER}\n"
+        idx = self._buf.find(marker)
+        if idx < 0:
+            return
+        header = self._buf[:idx].strip()
+        if header.upper().startswith(STREAM_LANG_PREFIX):
+            header = header[len(STREAM_LANG_PREFIX):]
+        self.detected_lang = header.strip() or "未知"
+        self._body_start = idx + len(marker)
+
+    def result(self) -> dict:
+        body = self._buf[self._body_start:] if self._body_start >= 0 else ""
+        return {"detected_lang": self.detected_lang, "translation": body}
+
+    def finish(self) -> dict:
+        """流结束：未按格式输出时退回 JSON / 纯文本解析"""
+        if self._body_start < 0:
+            return BaseProvider.parse_response(self._buf)
+        result = self.result()
+        result["translation"] = result["translation"].strip()
+        return result
+
+
 class BaseProvider(ABC):
     """所有 AI 翻译提供商的基类"""
 
     name: str = "base"
     model: str = ""
+    base_url: str = ""  # API 地址（用于连接预热）
+
+    # 限流响应头回调（由 translator 注入引擎限流器）
+    on_headers: Callable[[Mapping[str, str]], None] | None = None
+
+    def _observe_headers(self, headers: Mapping[str, str] | None):
+        if headers and self.on_headers is not None:
+            self.on_headers(headers)
+
+    @staticmethod
+    def _error(message: str, exc: Exception) -> RuntimeError:
+        """包装 SDK 异常；HTTP 429 转为 RateLimitError 并携带 Retry-After"""
+        status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+        if status == 429:
+            return RateLimitError(f"{message}: {exc}", _retry_after(exc))
+        return RuntimeError(f"{message}: {exc}")
 
     @abstractmethod
+    async def _complete(self, system: SystemPrompt, user: str) -> str:
+        """调用模型，返回原始文本输出（子类实现，失败抛 RuntimeError）"""
+        ...
+
     async def translate(self, text: str, target_lang: str, source_lang: str = "auto") -> dict:
         """翻译文本，返回 {"detected_lang": "...", "translation": "..."}"""
-        ...
+        with tracing.span("complete", engine=self.name, model=self.model):
+            raw = await self._complete(
+                self._build_system_prompt(target_lang, source_lang),
+                self._build_user_prompt(text),
+            )
+        with tracing.span("parse_response", chars=len(raw)):
+            return self.parse_response(raw)
+
+    async def _stream(self, system: SystemPrompt, user: str) -> AsyncIterator[str]:
+        """流式调用模型，逐段产出文本增量（子类实现，默认退化为一次性输出）"""
+        yield await self._complete(system, user)
+
+    async def translate_stream(self, text: str, target_lang: str, source_lang: str = "auto") -> AsyncIterator[dict]:
+        """流式翻译，逐次产出 {"detected_lang": "...", "translation": "<已生成部分>"}，最后一次为完整结果"""
+        parser = StreamParser()
+        async for delta in self._stream(
+            self._build_stream_system_prompt(target_lang, source_lang),
+            self._build_user_prompt(text),
+        ):
+            if parser.feed(delta):
+                yield parser.result()
+        yield parser.finish()
+
+    async def translate_batch(self, texts: list[str], target_lang: str, source_lang: str = "auto") -> list[dict]:
+        """一次请求翻译多条文本，按顺序返回结果；输出条数不符时抛 ValueError"""
+        raw = await self._complete(
+            self._build_batch_system_prompt(target_lang, source_lang),
+            self._build_batch_user_prompt(texts),
+        )
+        return self.parse_batch_response(raw, len(texts))
 
     def info(self) -> dict:
         """返回提供商信息"""
         return {"name": self.name, "model": self.model}
 
-    def _build_system_prompt(self, target_lang: str, source_lang: str) -> str:
-        """构建高精度翻译系统提示词"""
-        source_instruction = (
-            f"The source language is {source_lang}."
-            if source_lang and source_lang != "auto"
-            else "Auto-detect the source language."
-        )
-        return (
-            "You are a world-class professional translator.\n\n"
-            "## Task:\n"
-            f"{source_instruction}\n"
-            f"Translate the given text into **{target_lang}**.\n\n"
-            "## Output format (STRICTLY FOLLOW):\n"
-            "You MUST respond with a valid JSON object and NOTHING else:\n"
-            '{"detected_lang": "<source language name>", "translation": "<translated text>"}\n\n'
-            "## Translation rules:\n"
-            "1. Translate accurately and naturally, matching target language conventions\n"
-            "2. Preserve formatting: line breaks, punctuation, spacing, paragraphs\n"
-            "3. Translate idioms/slang into natural equivalents\n"
-            "4. Maintain original tone (formal/informal/technical/casual)\n"
-            "5. Keep proper nouns in original or widely accepted translation\n"
-            "6. Use standard terminology for technical terms\n"
-            "7. If text is ALREADY in the target language, set translation to the original text\n"
-            "8. For mixed-language text, translate only the non-target-language parts\n"
-            "9. detected_lang: readable name (English, 中文, 日本語, etc.)\n"
-            "10. Do NOT wrap JSON in markdown code blocks\n"
-        )
+    def _build_system_prompt(self, target_lang: str, source_lang: str) -> SystemPrompt:
+        """高精度翻译系统提示词（JSON 输出）"""
+        return system_prompt("json", target_lang, source_lang)
 
     def _build_user_prompt(self, text: str) -> str:
         return f"<text_to_translate>\n{text}\n</text_to_translate>"
 
+    def _build_stream_system_prompt(self, target_lang: str, source_lang: str) -> SystemPrompt:
+        """流式提示词：首行语言名 + 分隔行 + 纯文本译文，便于增量解析"""
+        return system_prompt("stream", target_lang, source_lang)
+
+    def _build_batch_system_prompt(self, target_lang: str, source_lang: str) -> SystemPrompt:
+        """批量翻译提示词：输入 JSON 字符串数组，逐条独立翻译"""
+        return system_prompt("batch", target_lang, source_lang)
+
+    def _build_batch_user_prompt(self, texts: list[str]) -> str:
+        return f"<texts_to_translate>\n{json.dumps(texts, ensure_ascii=False)}\n</texts_to_translate>"
+
     @staticmethod
     def parse_response(raw: str) -> dict:
-        """解析 AI 返回的 JSON"""
-        raw = raw.strip()
-        raw = re.sub(r'^```(?:json)?\s*', '', raw)
-        raw = re.sub(r'\s*```$', '', raw)
+        """
+        解析 AI 返回的 JSON（单遍）：
+        结构化输出直接解码；否则从每个 {" 处尝试解码（兼容代码块、前后说明文字）；
+        再尝试截断 JSON 中的 translation 字段；最后按纯文本处理
+        """
         raw = raw.strip()
+        # 快速路径：结构化输出 / 规范 JSON
+        if raw.startswith("{"):
+            try:
+                result = _as_result(_decoder.decode(raw))
+            except ValueError:
+                result = None
+            if result:
+                return result
 
-        # 尝试直接 JSON
-        try:
-            data = json.loads(raw)
-            if isinstance(data, dict) and "translation" in data:
-                return {
-                    "detected_lang": data.get("detected_lang", "未知"),
-                    "translation": data["translation"],
-                }
-        except json.JSONDecodeError:
-            pass
-
-        # 回退：提取 JSON 子串
-        match = re.search(r'\{[^{}]*"translation"\s*:\s*"((?:[^"\\]|\\.)*)"[^{}]*\}', raw, re.DOTALL)
-        if match:
+        for m in _OBJECT_START_RE.finditer(raw):
             try:
-                data = json.loads(match.group(0))
-                return {
-                    "detected_lang": data.get("detected_lang", "未知"),
-                    "translation": data["translation"],
-                }
-            except json.JSONDecodeError:
-                pass
+                result = _as_result(_decoder.raw_decode(raw, m.start())[0])
+            except ValueError:
+                continue
+            if result:
+                return result
+
+        # 输出被截断（如达到 max_tokens）：取出已生成的 translation 字段
+        m = _PARTIAL_RE.search(raw)
+        if m:
+            body = m.group(1).rstrip("\\")  # 去掉被截断的转义符
+            try:
+                translation = _decoder.decode(f'"{body}"')
+            except ValueError:
+                translation = None
+            if translation:
+                lang = _LANG_FIELD_RE.search(raw)
+                return {"detected_lang": lang.group(1) if lang else "未知", "translation": translation}
 
-        # 最终回退
-        cleaned = raw
+        # 最终回退：纯文本
+        cleaned = _FENCE_RE.sub("", raw).strip()
         for prefix in ['翻译：', '翻译:', 'Translation:', 'Translation：']:
             if cleaned.startswith(prefix):
                 cleaned = cleaned[len(prefix):].strip()
         cleaned = re.sub(r'</?text_to_translate>', '', cleaned).strip()
         return {"detected_lang": "未知", "translation": cleaned}
+
+    @staticmethod
+    def parse_batch_response(raw: str, expected: int) -> list[dict]:
+        """解析批量翻译返回的 JSON，条数或格式不符抛 ValueError"""
+        raw = raw.strip()
+        if raw.startswith("```"):
+            raw = _FENCE_RE.sub("", raw).strip()
+        try:
+            data = _decoder.decode(raw)
+        except ValueError as e:
+            raise ValueError(f"批量结果不是合法 JSON: {e}") from e
+
+        items = data.get("translations") if isinstance(data, dict) else data
+        if not isinstance(items, list) or len(items) != expected:
+            got = len(items) if isinstance(items, list) else "?"
+            raise ValueError(f"批量结果条数不符: 期望 {expected}，实际 {got}")
+
+        results = []
+        for item in items:
+            result = _as_result(item)
+            if result is None:
+                raise ValueError("批量结果缺少 translation 字段")
+            results.append(result)
+        return results
@@ -1,31 +1,90 @@
 """Anthropic Claude 提供商"""
 
+import json
+from functools import lru_cache
+
 import httpx
 from anthropic import AsyncAnthropic
-from .base import BaseProvider, DEFAULT_API_TIMEOUT, DEFAULT_MAX_TOKENS
+from .base import BaseProvider, DEFAULT_API_TIMEOUT, DEFAULT_MAX_TOKENS, record_usage
+from .prompts import RESPONSE_SCHEMAS, SystemPrompt
+from . import transport
+
+# 结构化输出：强制调用工具，工具参数即结果 JSON
+_TOOL_NAME = "submit_translation"
 
 
 class ClaudeProvider(BaseProvider):
     name = "claude"
+    base_url = "https://api.anthropic.com"
 
-    def __init__(self, api_key: str, model: str | None = None):
+    def __init__(self, api_key: str, model: str | None = None, client: AsyncAnthropic | None = None,
+                 base_url: str | None = None):
         self.model = model or "claude-sonnet-4-20250514"
-        self.client = AsyncAnthropic(
+        self.base_url = base_url or self.base_url
+        self.client = client or transport.sdk_client(
+            AsyncAnthropic,
             api_key=api_key,
+            base_url=base_url,
             timeout=httpx.Timeout(DEFAULT_API_TIMEOUT, connect=10.0),
             max_retries=0,
         )
 
-    async def translate(self, text: str, target_lang: str, source_lang: str = "auto") -> dict:
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _system_blocks(system: SystemPrompt) -> list[dict]:
+        """固定规则单独成块并打 cache_control 断点，语言对部分放在断点之后"""
+        return [
+            {"type": "text", "text": system.rules, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": system.task},
+        ]
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def _tool_args(kind: str) -> dict:
+        """JSON / 批量提示词：定义唯一工具并强制调用（工具定义固定，位于缓存前缀内）"""
+        schema = RESPONSE_SCHEMAS.get(kind)
+        if schema is None:
+            return {}
+        return {
+            "tools": [{"name": _TOOL_NAME, "description": "Submit the translation result.", "input_schema": schema}],
+            "tool_choice": {"type": "tool", "name": _TOOL_NAME},
+        }
+
+    async def _complete(self, system: SystemPrompt, user: str) -> str:
         try:
-            response = await self.client.messages.create(
+            raw = await self.client.messages.with_raw_response.create(
                 model=self.model,
                 max_tokens=DEFAULT_MAX_TOKENS,
-                system=self._build_system_prompt(target_lang, source_lang),
-                messages=[{"role": "user", "content": self._build_user_prompt(text)}],
+                system=self._system_blocks(system),
+                messages=[{"role": "user", "content": user}],
                 temperature=0.1,
                 top_p=0.95,
+                **self._tool_args(system.kind),
             )
-            return self.parse_response(response.content[0].text.strip())
+            self._observe_headers(raw.headers)
+            response = raw.parse()
+            usage = response.usage
+            cached = usage.cache_read_input_tokens or 0
+            record_usage(self.name, usage.input_tokens + cached + (usage.cache_creation_input_tokens or 0), cached)
+            for block in response.content:
+                if block.type == "tool_use":
+                    return json.dumps(block.input, ensure_ascii=False)
+            return "".join(b.text for b in response.content if b.type == "text").strip()
+        except Exception as e:
+            raise self._error("[Claude] 翻译失败", e) from e
+
+    async def _stream(self, system: SystemPrompt, user: str):
+        try:
+            async with self.client.messages.stream(
+                model=self.model,
+                max_tokens=DEFAULT_MAX_TOKENS,
+                system=self._system_blocks(system),
+                messages=[{"role": "user", "content": user}],
+                temperature=0.1,
+                top_p=0.95,
+            ) as stream:
+                self._observe_headers(stream.response.headers)
+                async for text in stream.text_stream:
+                    yield text
         except Exception as e:
-            raise RuntimeError(f"[Claude] 翻译失败: {e}") from e
+            raise self._error("[Claude] 流式翻译失败", e) from e
@@ -1,32 +1,74 @@
 """Google Gemini 提供商"""
 
+from functools import lru_cache
+
 from google import genai
 from google.genai import types
-from .base import BaseProvider, DEFAULT_MAX_TOKENS
+from .base import BaseProvider, DEFAULT_MAX_TOKENS, record_usage
+from .prompts import SystemPrompt, response_schema
+from . import transport
+
+
+# 较新的 SDK 支持注入 httpx.AsyncClient，旧版本仍使用自带连接池
+_SHARED_CLIENT_SUPPORTED = "httpx_async_client" in types.HttpOptions.model_fields
 
 
 class GeminiProvider(BaseProvider):
     name = "gemini"
+    base_url = "https://generativelanguage.googleapis.com"
 
-    def __init__(self, api_key: str, model: str | None = None):
+    def __init__(self, api_key: str, model: str | None = None, client: genai.Client | None = None,
+                 base_url: str | None = None):
         self.model = model or "gemini-2.0-flash"
-        self.client = genai.Client(
+        self.base_url = base_url or self.base_url
+        self.client = client or genai.Client(
             api_key=api_key,
-            http_options=types.HttpOptions(timeout=30_000),  # 毫秒
+            http_options=types.HttpOptions(
+                base_url=base_url,
+                timeout=30_000,  # 毫秒
+                **({"httpx_async_client": transport.get_client()} if _SHARED_CLIENT_SUPPORTED else {}),
+            ),
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _config(system: SystemPrompt) -> types.GenerateContentConfig:
+        # 固定规则在前：支持隐式缓存的模型对相同前缀自动计费优惠
+        # JSON / 批量提示词启用结构化输出，流式仍为纯文本
+        schema = response_schema(system)
+        return types.GenerateContentConfig(
+            system_instruction=system.text,
+            temperature=0.1,
+            top_p=0.95,
+            max_output_tokens=DEFAULT_MAX_TOKENS,
+            response_mime_type="application/json" if schema else None,
+            response_schema=schema,
         )
 
-    async def translate(self, text: str, target_lang: str, source_lang: str = "auto") -> dict:
+    async def _complete(self, system: SystemPrompt, user: str) -> str:
         try:
             response = await self.client.aio.models.generate_content(
                 model=self.model,
-                contents=self._build_user_prompt(text),
-                config=types.GenerateContentConfig(
-                    system_instruction=self._build_system_prompt(target_lang, source_lang),
-                    temperature=0.1,
-                    top_p=0.95,
-                    max_output_tokens=DEFAULT_MAX_TOKENS,
-                ),
+                contents=user,
+                config=self._config(system),
             )
-            return self.parse_response(response.text.strip())
+            # 较新的 SDK 在 sdk_http_response 中附带响应头
+            self._observe_headers(getattr(getattr(response, "sdk_http_response", None), "headers", None))
+            usage = response.usage_metadata
+            if usage:
+                record_usage(self.name, usage.prompt_token_count or 0, usage.cached_content_token_count or 0)
+            return response.text.strip()
+        except Exception as e:
+            raise self._error("[Gemini] 翻译失败", e) from e
+
+    async def _stream(self, system: SystemPrompt, user: str):
+        try:
+            async for chunk in await self.client.aio.models.generate_content_stream(
+                model=self.model,
+                contents=user,
+                config=self._config(system),
+            ):
+                if chunk.text:
+                    yield chunk.text
         except Exception as e:
-            raise RuntimeError(f"[Gemini] 翻译失败: {e}") from e
+            raise self._error("[Gemini] 流式翻译失败", e) from e
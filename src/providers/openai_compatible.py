@@ -1,8 +1,14 @@
 """OpenAI 兼容提供商（DeepSeek / OpenAI / Groq / Mistral）"""
 
+import logging
+
 import httpx
-from openai import AsyncOpenAI
-from .base import BaseProvider, DEFAULT_API_TIMEOUT, DEFAULT_MAX_TOKENS
+from openai import AsyncOpenAI, BadRequestError
+from .base import BaseProvider, DEFAULT_API_TIMEOUT, DEFAULT_MAX_TOKENS, record_usage
+from .prompts import SystemPrompt, response_schema
+from . import transport
+
+logger = logging.getLogger(__name__)
 
 PROVIDER_CONFIGS = {
     "openai": {"base_url": "https://api.openai.com/v1", "model": "gpt-4o-mini"},
@@ -14,31 +20,77 @@ PROVIDER_CONFIGS = {
 
 class OpenAICompatibleProvider(BaseProvider):
 
-    def __init__(self, provider_name: str, api_key: str, model: str | None = None):
+    def __init__(self, provider_name: str, api_key: str, model: str | None = None, client: AsyncOpenAI | None = None,
+                 base_url: str | None = None):
         if provider_name not in PROVIDER_CONFIGS:
             raise ValueError(f"不支持的提供商: {provider_name}")
         cfg = PROVIDER_CONFIGS[provider_name]
         self.name = provider_name
         self.model = model or cfg["model"]
-        self.client = AsyncOpenAI(
+        self.base_url = base_url or cfg["base_url"]
+        self.client = client or transport.sdk_client(
+            AsyncOpenAI,
             api_key=api_key,
-            base_url=cfg["base_url"],
+            base_url=self.base_url,
             timeout=httpx.Timeout(DEFAULT_API_TIMEOUT, connect=10.0),
             max_retries=0,  # 重试由 translator.py 统一管理
         )
+        # JSON 模式：模型不支持 response_format 时（HTTP 400）自动关闭
+        self.json_mode = True
+
+    @staticmethod
+    def _messages(system: SystemPrompt, user: str) -> list[dict]:
+        # 固定规则在最前、待译文本在最后，语言对相同的请求共享最长前缀，自动前缀缓存可命中
+        return [
+            {"role": "system", "content": system.text},
+            {"role": "user", "content": user},
+        ]
+
+    async def _complete(self, system: SystemPrompt, user: str) -> str:
+        json_mode = self.json_mode and response_schema(system) is not None
+        try:
+            raw = await self.client.chat.completions.with_raw_response.create(
+                model=self.model,
+                messages=self._messages(system, user),
+                temperature=0.1,
+                max_tokens=DEFAULT_MAX_TOKENS,
+                top_p=0.95,
+                **({"response_format": {"type": "json_object"}} if json_mode else {}),
+            )
+            self._observe_headers(raw.headers)
+            response = raw.parse()
+            self._record_usage(response.usage)
+            return response.choices[0].message.content.strip()
+        except BadRequestError as e:
+            if json_mode and "response_format" in str(e):
+                logger.warning("[%s] %s 不支持 JSON 模式，改用普通输出", self.name, self.model)
+                self.json_mode = False
+                return await self._complete(system, user)
+            raise self._error(f"[{self.name}] 翻译失败", e) from e
+        except Exception as e:
+            raise self._error(f"[{self.name}] 翻译失败", e) from e
 
-    async def translate(self, text: str, target_lang: str, source_lang: str = "auto") -> dict:
+    async def _stream(self, system: SystemPrompt, user: str):
         try:
-            response = await self.client.chat.completions.create(
+            stream = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": self._build_system_prompt(target_lang, source_lang)},
-                    {"role": "user", "content": self._build_user_prompt(text)},
-                ],
+                messages=self._messages(system, user),
                 temperature=0.1,
                 max_tokens=DEFAULT_MAX_TOKENS,
                 top_p=0.95,
+                stream=True,
             )
-            return self.parse_response(response.choices[0].message.content.strip())
+            self._observe_headers(stream.response.headers)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         except Exception as e:
-            raise RuntimeError(f"[{self.name}] 翻译失败: {e}") from e
+            raise self._error(f"[{self.name}] 流式翻译失败", e) from e
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        # OpenAI: prompt_tokens_details.cached_tokens；DeepSeek: prompt_cache_hit_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or getattr(usage, "prompt_cache_hit_tokens", None) or 0
+        record_usage(self.name, usage.prompt_tokens, cached)
@@ -0,0 +1,119 @@
+"""翻译提示词注册表 — 按 (类型, 目标语言, 源语言) 预构建并复用
+
+提示词分两段：与语言对无关的规则在前（所有请求共享的固定前缀），语言对相关
+的任务说明在后。固定前缀让各引擎的提示缓存得以命中：OpenAI 兼容引擎的自动
+前缀缓存、Claude 的 cache_control、Gemini 的隐式缓存。
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+
+# 流式输出格式：首行 "LANG: <语言>"，次行分隔符，其后为译文
+STREAM_LANG_PREFIX = "LANG:"
+STREAM_DELIMITER = "---"
+
+_INTRO = "You are a world-class professional translator.\n\n"
+
+_COMMON_RULES = (
+    "1. Translate accurately and naturally, matching target language conventions\n"
+    "2. Preserve formatting: line breaks, punctuation, spacing, paragraphs\n"
+    "3. Translate idioms/slang into natural equivalents\n"
+    "4. Maintain original tone (formal/informal/technical/casual)\n"
+    "5. Keep proper nouns in original or widely accepted translation\n"
+    "6. Placeholders like ⟦0⟧ stand for links/code/mentions: keep every one exactly as is, in place\n"
+)
+
+_RULES = {
+    "json": (
+        _INTRO
+        + "## Output format (STRICTLY FOLLOW):\n"
+        "You MUST respond with a valid JSON object and NOTHING else:\n"
+        '{"detected_lang": "<source language name>", "translation": "<translated text>"}\n\n'
+        "## Translation rules:\n"
+        + _COMMON_RULES
+        + "7. Use standard terminology for technical terms\n"
+        "8. If text is ALREADY in the target language, set translation to the original text\n"
+        "9. For mixed-language text, translate only the non-target-language parts\n"
+        "10. detected_lang: readable name (English, 中文, 日本語, etc.)\n"
+        "11. Do NOT wrap JSON in markdown code blocks\n\n"
+    ),
+    "stream": (
+        _INTRO
+        + "## Output format (STRICTLY FOLLOW):\n"
+        f"First line: {STREAM_LANG_PREFIX} <source language name>\n"
+        f"Second line: {STREAM_DELIMITER}\n"
+        "Then the translated text only, as plain text (no JSON, no code blocks, no notes).\n\n"
+        "## Translation rules:\n"
+        + _COMMON_RULES
+        + "7. Use standard terminology for technical terms\n"
+        "8. If text is ALREADY in the target language, output the original text\n"
+        "9. For mixed-language text, translate only the non-target-language parts\n"
+        "10. Source language name: readable name (English, 中文, 日本語, etc.)\n\n"
+    ),
+    "batch": (
+        _INTRO
+        + "You receive a JSON array of independent messages.\n\n"
+        "## Output format (STRICTLY FOLLOW):\n"
+        "You MUST respond with a valid JSON object and NOTHING else:\n"
+        '{"translations": [{"detected_lang": "<source language name>", "translation": "<translated text>"}, ...]}\n'
+        "The array MUST have exactly one entry per input message, in the same order.\n\n"
+        "## Translation rules:\n"
+        + _COMMON_RULES
+        + "7. Never merge, split, skip or reorder messages\n"
+        "8. If a message is ALREADY in the target language, set its translation to the original text\n"
+        "9. detected_lang: readable name (English, 中文, 日本語, etc.)\n"
+        "10. Do NOT wrap JSON in markdown code blocks\n\n"
+    ),
+}
+
+# 结构化输出的 JSON Schema（OpenAI json_object / Gemini response_schema / Claude 强制工具）
+_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "detected_lang": {"type": "string"},
+        "translation": {"type": "string"},
+    },
+    "required": ["detected_lang", "translation"],
+}
+RESPONSE_SCHEMAS = {
+    "json": _ITEM_SCHEMA,
+    "batch": {
+        "type": "object",
+        "properties": {"translations": {"type": "array", "items": _ITEM_SCHEMA}},
+        "required": ["translations"],
+    },
+}
+
+_AUTO_DETECT = {
+    "json": "Auto-detect the source language.",
+    "stream": "Auto-detect the source language.",
+    "batch": "Auto-detect the source language of each item independently.",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SystemPrompt:
+    """系统提示词：rules 为固定前缀（可缓存），task 为语言对相关部分，text 为完整内容"""
+    kind: str
+    rules: str
+    task: str
+    text: str
+
+
+@lru_cache(maxsize=1024)
+def system_prompt(kind: str, target_lang: str, source_lang: str = "auto") -> SystemPrompt:
+    """获取系统提示词（kind: json / stream / batch），同一语言对只构建一次"""
+    rules = _RULES[kind]
+    source_instruction = (
+        f"The source language is {source_lang}."
+        if source_lang and source_lang != "auto"
+        else _AUTO_DETECT[kind]
+    )
+    verb = "Translate every message" if kind == "batch" else "Translate the given text"
+    task = f"## Task:\n{source_instruction}\n{verb} into **{target_lang}**.\n"
+    return SystemPrompt(kind, rules, task, rules + task)
+
+
+def response_schema(system: SystemPrompt) -> dict | None:
+    """该提示词要求的输出结构，流式纯文本输出返回 None"""
+    return RESPONSE_SCHEMAS.get(system.kind)
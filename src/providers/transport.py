@@ -0,0 +1,76 @@
+"""共享 HTTP 连接池 — 所有引擎的 SDK 客户端复用同一个 httpx.AsyncClient
+
+HTTP/2（需安装 h2，即 httpx[http2]）下同一引擎的并发请求复用一条连接；
+长连接保活，启动时预热，首条消息不再付出 DNS / TLS 握手开销。
+"""
+
+import asyncio
+import logging
+
+import httpx
+
+from .base import DEFAULT_API_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+POOL_MAX_CONNECTIONS = 100
+POOL_MAX_KEEPALIVE = 20
+POOL_KEEPALIVE_EXPIRY = 300.0  # 空闲连接保留（秒）
+WARM_TIMEOUT = 5.0
+
+_client: httpx.AsyncClient | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """共享客户端（惰性创建）；超时仍由各 SDK 按请求设置"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=httpx.Timeout(DEFAULT_API_TIMEOUT, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+def sdk_client(factory, **kwargs):
+    """以共享连接池构造 SDK 客户端；SDK 不接受 httpx.AsyncClient（如基于 httpx2 的版本）时退回其自带连接池"""
+    try:
+        return factory(**kwargs, http_client=get_client())
+    except TypeError as e:
+        logger.warning("%s 无法使用共享连接池，改用 SDK 自带连接池: %s", factory.__name__, e)
+        return factory(**kwargs)
+
+
+async def _warm_one(client: httpx.AsyncClient, url: str) -> bool:
+    try:
+        # 任何 HTTP 响应（含 404 / 405）都说明连接已建立并留在池中
+        await client.head(url, timeout=WARM_TIMEOUT)
+        return True
+    except httpx.HTTPError as e:
+        logger.warning("连接预热失败 %s: %s", url, e)
+        return False
+
+
+async def warm(urls: list[str]) -> int:
+    """并发预热各引擎域名的连接，返回成功数"""
+    client = get_client()
+    results = await asyncio.gather(*(_warm_one(client, url) for url in dict.fromkeys(urls)))
+    return sum(results)
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
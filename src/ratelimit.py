@@ -0,0 +1,263 @@
+"""用户频率限制 — 滑动窗口计数（用户 / 聊天 / 全局三级），超额自动翻译进入延迟队列
+
+滑动窗口计数：每个键只存上一窗口与当前窗口的计数，估算值 = 上窗口 × 剩余占比 + 当前窗口，
+检查与记录均为 O(1)；键按最近访问排序，过期键在记录时从队首顺带淘汰，无需整表扫描。
+超额的自动翻译进入有界延迟队列，额度恢复后按聊天内顺序补发；队列满或等待超过上限才丢弃。
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+
+from src import metrics
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+RATE_WINDOW = 60.0  # 窗口长度（秒），各级上限均为「每窗口次数」
+QUEUE_MIN_SLEEP = 0.05  # 队列调度最短休眠（秒），避免估算误差导致空转
+
+
+class SlidingWindow:
+    """滑动窗口计数器：limit <= 0 表示不限"""
+
+    __slots__ = ("limit", "window", "_slots")
+
+    def __init__(self, limit: int, window: float = RATE_WINDOW):
+        self.limit, self.window = limit, window
+        self._slots: OrderedDict[object, list] = OrderedDict()  # 键 → [窗口序号, 上窗口计数, 当前计数]
+
+    def _counts(self, key, epoch: int) -> tuple[int, int]:
+        slot = self._slots.get(key)
+        if slot is None or slot[0] < epoch - 1:
+            return 0, 0
+        if slot[0] == epoch - 1:
+            return slot[2], 0
+        return slot[1], slot[2]
+
+    def retry_after(self, key, now: float) -> float:
+        """再记录一次需要等待的秒数，0 = 可立即记录"""
+        if self.limit <= 0:
+            return 0.0
+        epoch, offset = divmod(now, self.window)
+        frac = offset / self.window
+        prev, cur = self._counts(key, int(epoch))
+        if prev * (1 - frac) + cur + 1 <= self.limit:
+            return 0.0
+        if cur + 1 <= self.limit:
+            # 本窗口内等上一窗口权重衰减到足够小
+            need = 1 - (self.limit - cur - 1) / prev
+            return max(0.0, (need - frac) * self.window)
+        # 本窗口已满：等到下一窗口，当前计数成为上一窗口
+        return self.window - offset + (1 - (self.limit - 1) / cur) * self.window
+
+    def hit(self, key, now: float):
+        if self.limit <= 0:
+            return
+        epoch = int(now // self.window)
+        slot = self._slots.get(key)
+        if slot is None:
+            self._slots[key] = [epoch, 0, 1]
+        else:
+            if slot[0] != epoch:
+                slot[1] = slot[2] if slot[0] == epoch - 1 else 0
+                slot[0], slot[2] = epoch, 0
+            slot[2] += 1
+            self._slots.move_to_end(key)
+        # 队首是最久未记录的键，两个窗口前的计数已全部失效
+        while self._slots:
+            first = next(iter(self._slots.values()))
+            if first[0] >= epoch - 1:
+                break
+            self._slots.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+class RateLimiter:
+    """用户 / 聊天 / 全局三级限制，三级都有额度时才记录（被拒的请求不占用任何一级额度）"""
+
+    def __init__(self, per_user: int, per_chat: int = 0, per_global: int = 0, window: float = RATE_WINDOW):
+        self.tiers = {
+            "user": SlidingWindow(per_user, window),
+            "chat": SlidingWindow(per_chat, window),
+            "global": SlidingWindow(per_global, window),
+        }
+
+    def check(self, user_id: int, chat_id: int, now: float | None = None) -> tuple[str | None, float]:
+        """(受限级别, 需等待秒数)；(None, 0) = 未超限"""
+        now = time.time() if now is None else now
+        tier, wait = None, 0.0
+        for name, key in (("user", user_id), ("chat", chat_id), ("global", None)):
+            w = self.tiers[name].retry_after(key, now)
+            if w > wait:
+                tier, wait = name, w
+        return tier, wait
+
+    def hit(self, user_id: int, chat_id: int, now: float | None = None):
+        now = time.time() if now is None else now
+        self.tiers["user"].hit(user_id, now)
+        self.tiers["chat"].hit(chat_id, now)
+        self.tiers["global"].hit(None, now)
+
+    def acquire(self, user_id: int, chat_id: int, now: float | None = None) -> tuple[str | None, float]:
+        """未超限则记录并返回 (None, 0)，否则不记录，返回受限级别与等待秒数"""
+        now = time.time() if now is None else now
+        tier, wait = self.check(user_id, chat_id, now)
+        if tier is None:
+            self.hit(user_id, chat_id, now)
+        return tier, wait
+
+
+@dataclass(slots=True)
+class _Pending:
+    user_id: int
+    chat_id: int
+    factory: object  # 无参可调用，返回协程
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class DelayQueue:
+    """
+    有界延迟队列：超额请求排队，额度恢复后按入队顺序执行（同一聊天内严格保序）。
+    单个调度任务按需启动、队列清空即退出；执行时另起任务，不阻塞调度。
+    """
+
+    def __init__(self, limiter: RateLimiter, maxsize: int, max_delay: float):
+        self.limiter, self.maxsize, self.max_delay = limiter, maxsize, max_delay
+        self._items: deque[_Pending] = deque()
+        self._chats: Counter[int] = Counter()  # 各聊天排队数（有排队时新消息也须排队，保证顺序）
+        self._wake = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+        self.stats = {"delayed": 0, "dropped": 0, "expired": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def has_pending(self, chat_id: int) -> bool:
+        return self._chats[chat_id] > 0
+
+    def submit(self, user_id: int, chat_id: int, factory, wait: float = 0.0, tier: str | None = None) -> bool:
+        """入队；队列已满或预计等待超过上限时丢弃并返回 False。tier 为空表示因同聊天已有排队而顺延"""
+        if self.maxsize <= 0 or len(self._items) >= self.maxsize:
+            self._drop("queue_full", chat_id)
+            return False
+        if wait > self.max_delay:
+            self._drop("too_long", chat_id)
+            return False
+        self._items.append(_Pending(user_id, chat_id, factory))
+        self._chats[chat_id] += 1
+        self.stats["delayed"] += 1
+        metrics.RATE_LIMIT_DELAYED.inc(tier or "ordered")
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        self._wake.set()
+        return True
+
+    def _drop(self, reason: str, chat_id: int):
+        self.stats["expired" if reason == "expired" else "dropped"] += 1
+        metrics.RATE_LIMIT_DROPPED.inc(reason)
+        logger.info("🚦 频率限制丢弃 chat=%s (%s)", chat_id, reason)
+
+    def _dispatch(self, item: _Pending):
+        metrics.RATE_LIMIT_DELAY.observe(time.monotonic() - item.queued_at)
+        task = asyncio.get_running_loop().create_task(self._execute(item))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    @staticmethod
+    async def _execute(item: _Pending):
+        try:
+            await item.factory()
+        except Exception:
+            logger.exception("延迟执行失败 chat=%s", item.chat_id)
+
+    def _step(self) -> float | None:
+        """执行所有已恢复额度的请求，返回下次调度前的等待秒数（队列空返回 None）"""
+        now, mono = time.time(), time.monotonic()
+        blocked: set[int] = set()
+        remaining: deque[_Pending] = deque()
+        sleep = None
+        for item in self._items:
+            if item.chat_id in blocked:
+                remaining.append(item)
+                continue
+            if mono - item.queued_at > self.max_delay:
+                self._chats[item.chat_id] -= 1
+                self._drop("expired", item.chat_id)
+                continue
+            tier, wait = self.limiter.acquire(item.user_id, item.chat_id, now)
+            if tier is None:
+                self._chats[item.chat_id] -= 1
+                self._dispatch(item)
+                continue
+            blocked.add(item.chat_id)
+            remaining.append(item)
+            sleep = wait if sleep is None else min(sleep, wait)
+        self._items = remaining
+        for chat_id in [c for c, n in self._chats.items() if n <= 0]:
+            del self._chats[chat_id]
+        return None if sleep is None else max(QUEUE_MIN_SLEEP, sleep)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            sleep = self._step()
+            if sleep is None:
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=sleep)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        """停止调度；丢弃仍在排队的请求，等待已开始的执行结束"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._items:
+            logger.info("🚦 关停时丢弃 %d 条排队消息", len(self._items))
+            self._items.clear()
+            self._chats.clear()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {"queued": len(self._items), **self.stats}
+
+
+# ═══════════════════════════════════════════
+#  全局实例
+# ═══════════════════════════════════════════
+
+_limiter: RateLimiter | None = None
+_queue: DelayQueue | None = None
+
+
+def get_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(Config.RATE_LIMIT_PER_MIN, Config.RATE_LIMIT_CHAT_PER_MIN,
+                               Config.RATE_LIMIT_GLOBAL_PER_MIN)
+    return _limiter
+
+
+def get_queue() -> DelayQueue:
+    global _queue
+    if _queue is None:
+        _queue = DelayQueue(get_limiter(), Config.RATE_LIMIT_QUEUE_SIZE, Config.RATE_LIMIT_MAX_DELAY)
+        metrics.Gauge("tgbot_rate_limit_queue_size", "频率限制延迟队列长度", collect=lambda: len(_queue))
+    return _queue
+
+
+async def close():
+    if _queue is not None:
+        await _queue.close()
@@ -0,0 +1,103 @@
+"""文本切分 — 按段落 / 句子边界切分，保证切分结果可原样拼回"""
+
+import re
+from typing import NamedTuple
+
+# 段落分隔：空行（保留分隔符本身）
+_PARAGRAPH_RE = re.compile(r"(\n[ \t]*\n\s*)")
+# 句末：中英日标点 + 可选的右引号/右括号 + 后续空白
+_SENTENCE_RE = re.compile(r"(?<=[.!?。！？；;…])[\"'”’）)」』]*\s+|(?<=[。！？；…])")
+
+
+class Piece(NamedTuple):
+    """切分片段：lead + body + trail 拼接即原文，只有 body 需要翻译"""
+    lead: str
+    body: str
+    trail: str
+
+
+def _split_keep(text: str, pattern: re.Pattern) -> list[str]:
+    """按正则切分，分隔符并入前一段，保证 "".join(结果) == text"""
+    parts, last = [], 0
+    for m in pattern.finditer(text):
+        if m.end() > last:
+            parts.append(text[last:m.end()])
+            last = m.end()
+    if last < len(text):
+        parts.append(text[last:])
+    return [p for p in parts if p]
+
+
+def _hard_split(text: str, max_chars: int) -> list[str]:
+    """超长无标点文本：尽量在空白处截断"""
+    parts = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", max_chars // 2, max_chars)
+        cut = cut + 1 if cut > 0 else max_chars
+        parts.append(text[:cut])
+        text = text[cut:]
+    if text:
+        parts.append(text)
+    return parts
+
+
+def split_sentences(text: str) -> list[str]:
+    """切分句子（每句保留其后的空白/换行）"""
+    out = []
+    for para in _split_keep(text, _PARAGRAPH_RE):
+        for line in _split_keep(para, re.compile(r"\n")):
+            out.extend(_split_keep(line, _SENTENCE_RE))
+    return out
+
+
+def _to_piece(raw: str) -> Piece:
+    body = raw.strip()
+    if not body:
+        return Piece(raw, "", "")
+    start = raw.index(body)
+    return Piece(raw[:start], body, raw[start + len(body):])
+
+
+def split_chunks(text: str, max_chars: int) -> list[Piece]:
+    """
+    将长文本切为不超过 max_chars 的分块：优先段落边界，其次句子边界，
+    最后在空白处硬切。"".join(lead + body + trail) == text
+    """
+    units: list[str] = []
+    for para in _split_keep(text, _PARAGRAPH_RE):
+        if len(para) <= max_chars:
+            units.append(para)
+            continue
+        for sentence in split_sentences(para):
+            units.extend(_hard_split(sentence, max_chars) if len(sentence) > max_chars else [sentence])
+
+    chunks: list[str] = []
+    current = ""
+    for unit in units:
+        if current and len(current) + len(unit) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += unit
+    if current:
+        chunks.append(current)
+
+    # 纯空白块并入前一块的 trail，避免空请求
+    pieces: list[Piece] = []
+    for raw in chunks:
+        piece = _to_piece(raw)
+        if not piece.body and pieces:
+            prev = pieces[-1]
+            pieces[-1] = Piece(prev.lead, prev.body, prev.trail + piece.lead)
+        else:
+            pieces.append(piece)
+    return pieces
+
+
+def split_segments(text: str) -> list[Piece]:
+    """按句切分为 Piece（翻译记忆的复用单位），纯空白片段 body 为空"""
+    return [_to_piece(s) for s in split_sentences(text)]
+
+
+def join_pieces(pieces: list[Piece], bodies: list[str]) -> str:
+    """用翻译后的 body 按原顺序拼回，保留原有空白与换行"""
+    return "".join(p.lead + b + p.trail for p, b in zip(pieces, bodies))
@@ -8,14 +8,20 @@ import logging
 from pathlib import Path
 from copy import deepcopy
 
+from src import metrics
+
 logger = logging.getLogger(__name__)
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 SETTINGS_FILE = DATA_DIR / "settings.json"
 STATS_FILE = DATA_DIR / "stats.json"
+LATENCY_FILE = DATA_DIR / "latency.json"
+TM_FILE = DATA_DIR / "tm.sqlite3"
+CACHE_FILE = DATA_DIR / "cache.sqlite3"
 BACKUP_SUFFIX = ".bak"
 
-_lock = threading.Lock()
+_lock = threading.Lock()  # 文件读写
+_rw_lock = threading.RLock()  # 内存数据读-改-写（并发处理更新 / 信号处理落盘）
 
 # 内存缓存，避免每次读盘
 _cache: dict[str, dict] = {}
@@ -23,6 +29,8 @@ _dirty: set[str] = set()  # 标记需要落盘的文件
 _DEBOUNCE_INTERVAL = 5.0  # 攒 5 秒再写盘
 _last_flush: dict[str, float] = {}
 
+metrics.Gauge("tgbot_store_dirty_files", "待落盘的存储文件数", collect=lambda: len(_dirty))
+
 
 def _ensure_data_dir():
     DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -49,20 +57,36 @@ def _load_json(path: Path) -> dict:
 def _save_json(path: Path, data: dict, *, force: bool = False):
     """原子写入 JSON（先写临时文件再 rename），支持防抖"""
     key = str(path)
-    _cache[key] = deepcopy(data)
-    _dirty.add(key)
+    with _rw_lock:
+        _cache[key] = deepcopy(data)
+        _dirty.add(key)
+
+        now = time.time()
+        if not force and (now - _last_flush.get(key, 0)) < _DEBOUNCE_INTERVAL:
+            return  # 防抖，不立即落盘
+
+        _flush(path, data)
 
-    now = time.time()
-    if not force and (now - _last_flush.get(key, 0)) < _DEBOUNCE_INTERVAL:
-        return  # 防抖，不立即落盘
 
-    _flush(path, data)
+def _update_json(path: Path, mutate, *, force: bool = False):
+    """在锁内原地修改缓存数据并标记落盘（免去整表深拷贝）；返回 mutate 的返回值"""
+    key = str(path)
+    with _rw_lock:
+        if key not in _cache:
+            _load_json(path)
+        data = _cache[key]
+        result = mutate(data)
+        _dirty.add(key)
+        if force or (time.time() - _last_flush.get(key, 0)) >= _DEBOUNCE_INTERVAL:
+            _flush(path, data)
+    return result
 
 
 def _flush(path: Path, data: dict):
     """实际落盘：备份 → 原子写入"""
     key = str(path)
     _ensure_data_dir()
+    start = time.monotonic()
     with _lock:
         try:
             # 备份旧文件
@@ -87,17 +111,19 @@ def _flush(path: Path, data: dict):
 
             _dirty.discard(key)
             _last_flush[key] = time.time()
+            metrics.STORE_FLUSH.observe(time.monotonic() - start, path.name)
         except Exception as e:
             logger.error("store flush error for %s: %s", path, e)
 
 
 def flush_all():
     """强制落盘所有脏数据（关停时调用）"""
-    for key in list(_dirty):
-        path = Path(key)
-        data = _cache.get(key)
-        if data is not None:
-            _flush(path, data)
+    with _rw_lock:
+        for key in list(_dirty):
+            path = Path(key)
+            data = _cache.get(key)
+            if data is not None:
+                _flush(path, data)
 
 
 # ═══════════════════════════════════════════
@@ -110,18 +136,17 @@ def get_chat_config(chat_id: int | str) -> dict:
 
 
 def set_chat_config(chat_id: int | str, config: dict):
-    """更新聊天配置（合并）"""
-    settings = _load_json(SETTINGS_FILE)
-    key = str(chat_id)
-    settings[key] = {**settings.get(key, {}), **config}
-    _save_json(SETTINGS_FILE, settings, force=True)
+    """更新聊天配置（合并，值为 None 的键会被删除）"""
+    def mutate(settings: dict):
+        key = str(chat_id)
+        merged = {**settings.get(key, {}), **config}
+        settings[key] = {k: v for k, v in merged.items() if v is not None}
+    _update_json(SETTINGS_FILE, mutate, force=True)
 
 
 def reset_chat_config(chat_id: int | str):
     """重置聊天配置为默认"""
-    settings = _load_json(SETTINGS_FILE)
-    settings.pop(str(chat_id), None)
-    _save_json(SETTINGS_FILE, settings, force=True)
+    _update_json(SETTINGS_FILE, lambda settings: settings.pop(str(chat_id), None), force=True)
 
 
 # ═══════════════════════════════════════════
@@ -130,20 +155,20 @@ def reset_chat_config(chat_id: int | str):
 
 def record_translation(chat_id: int | str, provider: str, chars: int, success: bool = True):
     """记录一次翻译（攒 5 秒再写盘，减少 IO）"""
-    stats = _load_json(STATS_FILE)
-    key = str(chat_id)
-    if key not in stats:
-        stats[key] = {
-            "total": 0, "success": 0, "fail": 0, "chars": 0,
-            "providers": {}, "first_use": time.time(),
-        }
-    s = stats[key]
-    s["total"] += 1
-    s["success" if success else "fail"] += 1
-    s["chars"] += chars
-    s["providers"][provider] = s["providers"].get(provider, 0) + 1
-    s["last_use"] = time.time()
-    _save_json(STATS_FILE, stats)
+    def mutate(stats: dict):
+        key = str(chat_id)
+        if key not in stats:
+            stats[key] = {
+                "total": 0, "success": 0, "fail": 0, "chars": 0,
+                "providers": {}, "first_use": time.time(),
+            }
+        s = stats[key]
+        s["total"] += 1
+        s["success" if success else "fail"] += 1
+        s["chars"] += chars
+        s["providers"][provider] = s["providers"].get(provider, 0) + 1
+        s["last_use"] = time.time()
+    _update_json(STATS_FILE, mutate)
 
 
 def get_stats(chat_id: int | str) -> dict:
@@ -173,11 +198,25 @@ def get_global_stats() -> dict:
 
 def clear_chat_stats(chat_id: int | str):
     """清除聊天统计"""
-    stats = _load_json(STATS_FILE)
-    stats.pop(str(chat_id), None)
-    _save_json(STATS_FILE, stats, force=True)
+    _update_json(STATS_FILE, lambda stats: stats.pop(str(chat_id), None), force=True)
 
 
 def export_all_stats() -> dict:
     """导出全部统计原始数据"""
     return _load_json(STATS_FILE)
+
+
+# ═══════════════════════════════════════════
+#  引擎延迟快照
+# ═══════════════════════════════════════════
+
+def load_latency_snapshot() -> dict:
+    """读取引擎延迟直方图快照"""
+    if not LATENCY_FILE.exists():
+        return {}
+    return _load_json(LATENCY_FILE)
+
+
+def save_latency_snapshot(data: dict, *, force: bool = False):
+    """保存引擎延迟直方图快照（默认防抖）"""
+    _save_json(LATENCY_FILE, data, force=force)
@@ -0,0 +1,237 @@
+"""翻译记忆 — 句段级译文持久化（SQLite），精确 + 宽松匹配复用
+
+消息按句切分后逐句查找：先按规范化原文精确匹配，未命中再按宽松形式匹配
+（去掉空白、标点并忽略大小写后完全相同，且数字 / 链接 / @提及一致）。
+不做相似度近似复用：一词之差（如 allowed / not allowed）就可能意思相反，
+而复用的是另一句的整句译文。只有未命中的句段才发送给引擎，译文回写记忆。
+群规、签名、机器人模板等反复出现的内容可直接在本地拼出译文。
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import NamedTuple
+
+from src import masking, store
+
+logger = logging.getLogger(__name__)
+
+TM_MAX_SEGMENTS = 200_000  # 超过后按最近使用时间淘汰
+TM_PRUNE_EVERY = 1000  # 每写入 N 条检查一次容量
+TM_MAX_SEGMENT_CHARS = 1000  # 超长句段不入库
+TM_LOOSE_CANDIDATES = 8  # 同一宽松形式最多比对的句段数
+TM_TOUCH_BATCH = 256  # 命中计数攒够 N 条（或随下次写入 / 关闭）批量提交
+
+_WS_RE = re.compile(r"\s+")
+# 宽松匹配时必须完全一致的内容：数字、链接、@提及（去标点会把 1.5 和 15 变成同一形式）
+_ANCHOR_RE = re.compile(r"https?://\S+|@\w+|\d+(?:[.,:]\d+)*")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    key BLOB UNIQUE NOT NULL,
+    target TEXT NOT NULL,
+    source TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    detected TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    used REAL NOT NULL,
+    loose BLOB
+);
+CREATE INDEX IF NOT EXISTS segments_used ON segments(used);
+"""
+
+
+class Match(NamedTuple):
+    translation: str
+    detected_lang: str
+    exact: bool  # False 为宽松匹配
+
+
+def normalize(text: str) -> str:
+    """规范化：NFC + 合并空白 + 去首尾空白"""
+    return _WS_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def loosen(norm: str) -> str:
+    """宽松形式：去掉空白和标点，忽略大小写"""
+    return "".join(ch for ch in norm.casefold() if unicodedata.category(ch)[0] not in "PZ" and not ch.isspace())
+
+
+def _key(norm: str, target: str) -> bytes:
+    return hashlib.blake2b(f"{target}\x00{norm}".encode(), digest_size=16).digest()
+
+
+def _anchors(norm: str) -> list[str]:
+    return _ANCHOR_RE.findall(norm)
+
+
+class TranslationMemory:
+    """句段译文库：lookup() 查找，store() 回写"""
+
+    def __init__(self, path):
+        self.path = path
+        self._db: sqlite3.Connection | None = None
+        self._writes = 0
+        self._touched: dict[int, int] = {}  # 待提交的命中计数 id → 次数
+        self.stats = {"exact": 0, "fuzzy": 0, "miss": 0, "stored": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            db.executescript(_SCHEMA)
+            self._migrate(db)
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _migrate(db: sqlite3.Connection):
+        """旧库（MinHash 近似索引）：补 loose 列并回填，删除 lsh 表"""
+        columns = {row[1] for row in db.execute("PRAGMA table_info(segments)")}
+        if "loose" not in columns:
+            db.execute("ALTER TABLE segments ADD COLUMN loose BLOB")
+        rows = db.execute("SELECT id, target, source FROM segments WHERE loose IS NULL").fetchall()
+        if rows:
+            db.execute("BEGIN")
+            db.executemany("UPDATE segments SET loose = ? WHERE id = ?",
+                           [(_key(loosen(source), target), seg_id) for seg_id, target, source in rows])
+            db.execute("COMMIT")
+            logger.info("📚 翻译记忆迁移：回填 %d 条宽松匹配键", len(rows))
+        db.execute("DROP TABLE IF EXISTS lsh")
+        # 早期版本会把原样回显的译文写入记忆
+        removed = db.execute("DELETE FROM segments WHERE translation = source").rowcount
+        if removed:
+            logger.info("📚 翻译记忆清理 %d 条原样回显的句段", removed)
+        db.execute("CREATE INDEX IF NOT EXISTS segments_loose ON segments(loose)")
+
+    def lookup(self, text: str, target: str) -> Match | None:
+        """查找句段译文：精确匹配优先，其次宽松匹配"""
+        norm = normalize(text)
+        db = self._conn()
+        row = db.execute(
+            "SELECT id, translation, detected FROM segments WHERE key = ?", (_key(norm, target),)
+        ).fetchone()
+        if row:
+            self._touch(row[0])
+            self.stats["exact"] += 1
+            return Match(row[1], row[2], True)
+
+        match = self._loose(norm, target)
+        self.stats["fuzzy" if match else "miss"] += 1
+        return match
+
+    def _loose(self, norm: str, target: str) -> Match | None:
+        """去掉空白 / 标点、忽略大小写后完全相同，且数字 / 链接 / @提及一致"""
+        loose = loosen(norm)
+        if not loose:
+            return None
+        rows = self._conn().execute(
+            "SELECT id, source, translation, detected FROM segments WHERE loose = ? AND target = ? "
+            "ORDER BY hits DESC LIMIT ?",
+            (_key(loose, target), target, TM_LOOSE_CANDIDATES),
+        ).fetchall()
+        anchors = _anchors(norm)
+        for seg_id, source, translation, detected in rows:
+            if _anchors(source) == anchors:
+                self._touch(seg_id)
+                return Match(translation, detected, False)
+        return None
+
+    def _touch(self, seg_id: int):
+        """命中计数先记在内存，攒够一批再提交，避免每次命中一条同步 UPDATE"""
+        self._touched[seg_id] = self._touched.get(seg_id, 0) + 1
+        if len(self._touched) >= TM_TOUCH_BATCH:
+            db = self._conn()
+            db.execute("BEGIN")
+            try:
+                self._write_touched(db)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    def _write_touched(self, db: sqlite3.Connection):
+        if self._touched:
+            touched, self._touched = self._touched, {}
+            now = time.time()
+            db.executemany("UPDATE segments SET hits = hits + ?, used = ? WHERE id = ?",
+                           [(n, now, seg_id) for seg_id, n in touched.items()])
+
+    def store(self, items: list[tuple[str, str, str, str]], target: str):
+        """回写句段译文 [(原文, 译文, 识别语言, 引擎)]；译文与原文相同（引擎原样回显）的不入库"""
+        db = self._conn()
+        now = time.time()
+        db.execute("BEGIN")
+        try:
+            self._write_touched(db)
+            for text, translation, detected, engine in items:
+                norm = normalize(text)
+                if not norm or not translation.strip() or len(norm) > TM_MAX_SEGMENT_CHARS:
+                    continue
+                if normalize(translation) == norm:
+                    continue
+                # 占位符丢失 / 重复的译文不入库，否则每次复用都会还原失败
+                if not masking.placeholders_match(norm, translation):
+                    continue
+                cur = db.execute(
+                    "INSERT OR IGNORE INTO segments (key, target, source, translation, detected, engine, used, loose) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (_key(norm, target), target, norm, translation.strip(), detected, engine, now,
+                     _key(loosen(norm), target)),
+                )
+                if cur.rowcount != 1:
+                    continue
+                self.stats["stored"] += 1
+                self._writes += 1
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        if self._writes >= TM_PRUNE_EVERY:
+            self._writes = 0
+            self._prune()
+
+    def _prune(self):
+        db = self._conn()
+        (count,) = db.execute("SELECT COUNT(*) FROM segments").fetchone()
+        if count > TM_MAX_SEGMENTS:
+            db.execute(
+                "DELETE FROM segments WHERE id IN (SELECT id FROM segments ORDER BY used LIMIT ?)",
+                (count - TM_MAX_SEGMENTS,),
+            )
+            logger.info("📚 翻译记忆淘汰 %d 条", count - TM_MAX_SEGMENTS)
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self):
+        if self._db is not None:
+            try:
+                self._write_touched(self._db)
+            except sqlite3.Error as e:
+                logger.warning("翻译记忆命中计数写入失败: %s", e)
+            self._db.close()
+            self._db = None
+
+
+_memory: TranslationMemory | None = None
+
+
+def get_memory() -> TranslationMemory:
+    global _memory
+    if _memory is None:
+        _memory = TranslationMemory(store.TM_FILE)
+    return _memory
+
+
+def close():
+    if _memory is not None:
+        _memory.close()
@@ -0,0 +1,225 @@
+"""请求追踪 + 按需采样分析 — 每条消息记录各阶段耗时，慢请求写日志，可导出 Chrome Trace
+
+trace() 无活动追踪时开启新追踪，否则记为子阶段；span() 只在追踪内记录，追踪外为空操作。
+上下文经 contextvars 传递，分块 / 对冲等并发子任务自动归属同一追踪（各占一条泳道）。
+导出文件可在 chrome://tracing 或 https://ui.perfetto.dev 打开。
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import signal
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+TRACE_BUFFER = 200  # 保留最近 N 条追踪
+SLOW_BUFFER = 50  # 另保留最近 N 条慢请求（不被普通追踪挤出）
+
+PROFILE_INTERVAL = 0.005  # 采样间隔（CPU 秒）
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 60
+PROFILE_TOP = 15
+
+
+@dataclass(slots=True)
+class Span:
+    name: str
+    start: float
+    end: float = 0.0
+    depth: int = 0
+    lane: int = 0
+    attrs: dict = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class Trace:
+    id: int
+    root: Span
+    wall: float  # 开始时的 time.time()，导出时换算绝对时间
+    spans: list[Span] = field(default_factory=list)
+    lanes: dict[int, int] = field(default_factory=dict)  # 任务 id → 泳道
+
+    @property
+    def duration(self) -> float:
+        return self.root.end - self.root.start
+
+    def lane(self) -> int:
+        try:
+            task = id(asyncio.current_task())
+        except RuntimeError:
+            task = 0
+        return self.lanes.setdefault(task, len(self.lanes))
+
+
+_current: contextvars.ContextVar[tuple[Trace, int] | None] = contextvars.ContextVar("trace", default=None)
+_ids = itertools.count(1)
+_recent: deque[Trace] = deque(maxlen=TRACE_BUFFER)
+_slow: deque[Trace] = deque(maxlen=SLOW_BUFFER)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """记录一个阶段；不在追踪内时不记录"""
+    cur = _current.get()
+    if cur is None:
+        yield None
+        return
+    trace, depth = cur
+    s = Span(name, time.perf_counter(), depth=depth + 1, lane=trace.lane(), attrs=attrs)
+    trace.spans.append(s)
+    token = _current.set((trace, depth + 1))
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.end = time.perf_counter()
+        _current.reset(token)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """开启追踪（已在追踪内时等同 span）；结束后入缓冲区，超过 TRACE_SLOW_MS 写慢请求日志"""
+    if _current.get() is not None:
+        with span(name, **attrs) as s:
+            yield s
+        return
+    root = Span(name, time.perf_counter(), attrs=attrs)
+    t = Trace(next(_ids), root, time.time())
+    t.lane()
+    token = _current.set((t, 0))
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        _finish(t)
+
+
+def _finish(t: Trace):
+    _recent.append(t)
+    if Config.TRACE_SLOW_MS > 0 and t.duration * 1000 >= Config.TRACE_SLOW_MS:
+        _slow.append(t)
+        logger.warning("🐢 慢请求 #%d %s %.0fms\n%s", t.id, t.root.name, t.duration * 1000, format_trace(t))
+
+
+def _attrs_str(attrs: dict) -> str:
+    return " ".join(f"{k}={v}" for k, v in attrs.items())
+
+
+def format_trace(t: Trace) -> str:
+    """阶段耗时树：缩进表示嵌套，+偏移 / 耗时（毫秒）"""
+    lines = [f"{t.root.name} {t.duration * 1000:.0f}ms {_attrs_str(t.root.attrs)}".rstrip()]
+    for s in sorted(t.spans, key=lambda s: s.start):
+        end = s.end or time.perf_counter()
+        lines.append(f"{'  ' * s.depth}{s.name} +{(s.start - t.root.start) * 1000:.0f}ms "
+                     f"{(end - s.start) * 1000:.1f}ms {_attrs_str(s.attrs)}".rstrip())
+    return "\n".join(lines)
+
+
+def get_traces(slow_only: bool = False) -> list[Trace]:
+    """最近的追踪（按开始时间）"""
+    if slow_only:
+        return list(_slow)
+    merged = {t.id: t for t in itertools.chain(_slow, _recent)}
+    return [merged[k] for k in sorted(merged)]
+
+
+def export_chrome(traces: list[Trace]) -> dict:
+    """Chrome Trace Event 格式（完整事件 ph=X，微秒）；每条追踪一个 pid，并发子任务各占一个 tid"""
+    events = []
+    for t in traces:
+        events.append({"name": "process_name", "ph": "M", "pid": t.id, "args": {"name": f"#{t.id} {t.root.name}"}})
+        for s in (t.root, *t.spans):
+            end = s.end or s.start
+            events.append({
+                "name": s.name, "ph": "X", "pid": t.id, "tid": s.lane,
+                "ts": round((t.wall + s.start - t.root.start) * 1e6),
+                "dur": round((end - s.start) * 1e6),
+                "args": {k: str(v) for k, v in s.attrs.items()},
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+# ═══════════════════════════════════════════
+#  采样分析
+# ═══════════════════════════════════════════
+
+_profiling = False
+
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    samples: int
+    idle: int  # 事件循环空闲（CPU 花在其他线程）的样本数
+    own: list[tuple[str, int]]  # 栈顶函数（自身耗时）
+    total: list[tuple[str, int]]  # 出现在栈中的函数（含子调用）
+
+
+def _label(code) -> str:
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{'/'.join(path[-2:])}:{code.co_firstlineno} {getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_name in ("select", "poll") and frame.f_code.co_filename.endswith("selectors.py")
+
+
+async def profile(seconds: float) -> ProfileResult:
+    """
+    按 CPU 时间（SIGPROF）对事件循环线程采样 seconds 秒，期间事件循环照常运行。
+    信号处理在主线程执行，须在主线程的事件循环中调用；同一时间只允许一个分析。
+    （独立采样线程须等 GIL，只会在事件循环阻塞于 select 时取到样本，结果严重偏向空闲）
+    """
+    global _profiling
+    if not hasattr(signal, "setitimer"):
+        raise RuntimeError("当前平台不支持采样分析（需要 setitimer）")
+    if threading.current_thread() is not threading.main_thread():
+        raise RuntimeError("采样分析须在主线程的事件循环中调用")
+    if _profiling:
+        raise RuntimeError("已有采样分析在进行中")
+
+    own: Counter[str] = Counter()
+    total: Counter[str] = Counter()
+    counts = {"samples": 0, "idle": 0}
+
+    def on_sample(_signum, frame):
+        if frame is None:
+            return
+        counts["samples"] += 1
+        if _is_idle(frame):
+            counts["idle"] += 1
+            return
+        own[_label(frame.f_code)] += 1
+        seen = set()
+        while frame is not None:
+            label = _label(frame.f_code)
+            if label not in seen:
+                seen.add(label)
+                total[label] += 1
+            frame = frame.f_back
+
+    _profiling = True
+    previous = signal.signal(signal.SIGPROF, on_sample)
+    signal.setitimer(signal.ITIMER_PROF, PROFILE_INTERVAL, PROFILE_INTERVAL)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+        _profiling = False
+    return ProfileResult(seconds, counts["samples"], counts["idle"],
+                         own.most_common(PROFILE_TOP), total.most_common(PROFILE_TOP))
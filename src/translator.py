@@ -1,22 +1,62 @@
-"""翻译核心逻辑 — 智能互翻 + 自动降级 + 重试 + 超时控制"""
+"""翻译核心逻辑 — 智能互翻 + 自动降级 + 重试 + 超时控制 + 请求合并 + 熔断"""
 
 import asyncio
 import logging
 import time
+from collections import Counter, deque
+from collections.abc import AsyncIterator
+from src import latency, langid, limiter, masking, metrics, segmenter, tm, tracing
+from src.batcher import MicroBatcher
 from src.config import Config
-from src.providers import create_provider, BaseProvider
+from src.providers import create_provider, transport, BaseProvider, RateLimitError, PROVIDER_MODELS
 
 logger = logging.getLogger(__name__)
 
-_provider_cache: dict[str, BaseProvider] = {}
+# 提供商池：(引擎, 模型) → 实例；同引擎不同模型共享 SDK 客户端（连接池）
+_provider_cache: dict[tuple[str, str], BaseProvider] = {}
+_provider_last_used: dict[tuple[str, str], float] = {}
+_sdk_clients: dict[str, object] = {}
+PROVIDER_IDLE_TTL = 1800.0  # 自定义模型实例闲置淘汰（秒）
 
 MAX_RETRIES = 2
 RETRY_DELAY = 1.0
-TRANSLATE_TIMEOUT = 30.0  # 单次翻译超时（秒）
-
-# 引擎延迟统计
-_engine_latency: dict[str, list[float]] = {}
-_MAX_LATENCY_SAMPLES = 20
+TRANSLATE_TIMEOUT = 30.0  # 单次翻译超时上限（秒），样本不足时使用
+
+# 自适应超时：P99 × 倍数 + 按文本长度追加，限制在 [下限, 上限]
+TIMEOUT_P99_MULTIPLIER = 2.0
+TIMEOUT_PER_KCHAR = 5.0  # 每 1000 字符追加（秒）
+TIMEOUT_FLOOR = 2.0
+TIMEOUT_MIN_SAMPLES = 20
+
+# 对冲请求：主引擎超过自身 P95 延迟仍未返回时，并发请求最快的备选引擎
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 5  # 该引擎至少 N 个延迟样本才启用对冲
+HEDGE_MIN_DELAY = 1.0  # 对冲触发下限（秒），避免快引擎频繁双发
+_hedge_stats = {"fired": 0, "won": 0}
+
+# 长文本分块：超过 CHUNK_SIZE 按段落/句子切分并发翻译
+CHUNK_SIZE = 1500
+CHUNK_CONCURRENCY = 4
+
+# 熔断器：失败率超过阈值即打开，冷却后放行单个探测请求
+BREAKER_WINDOW = 20  # 统计最近 N 次调用
+BREAKER_MIN_CALLS = 5  # 至少 N 次调用才判定
+BREAKER_FAILURE_RATE = 0.5  # 失败率阈值
+BREAKER_COOLDOWN = 30.0  # 打开后冷却（秒）
+
+# 微批处理（BATCH_WINDOW_MS > 0 时启用）
+_batcher = (
+    MicroBatcher(Config.BATCH_WINDOW_MS / 1000, Config.BATCH_MAX_ITEMS)
+    if Config.BATCH_WINDOW_MS > 0 else None
+)
+
+# 请求合并（single-flight）：相同请求在途时共享一次引擎调用
+_inflight: dict[tuple, asyncio.Future] = {}  # 任务，或流式调用登记的 Future
+_coalesce_stats = {"leaders": 0, "coalesced": 0}
+
+# 占位符遮蔽统计：masked=遮蔽的请求数，chars_saved=少发送的字符数，
+# skipped=无需翻译直接返回，restore_failed=占位符还原失败后改用原文重译
+_mask_stats = {"masked": 0, "spans": 0, "chars_saved": 0, "skipped": 0, "restore_failed": 0}
 
 # 智能互翻映射：源语言==目标语言时自动切换
 SMART_FALLBACK_LANG = {
@@ -39,68 +79,442 @@ SMART_FALLBACK_LANG = {
 }
 
 
-def _record_latency(engine: str, elapsed: float):
-    """记录引擎延迟"""
-    samples = _engine_latency.setdefault(engine, [])
-    samples.append(elapsed)
-    if len(samples) > _MAX_LATENCY_SAMPLES:
-        samples.pop(0)
+class CircuitBreaker:
+    """单引擎熔断器：closed → open → half_open → closed"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self._state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= BREAKER_COOLDOWN:
+            return self.HALF_OPEN
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def allow(self) -> bool:
+        """是否放行请求；半开状态只放行一个探测请求"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._state = self.HALF_OPEN
+            self._probing = True
+            logger.info("[%s] 🟡 熔断半开，发送探测请求", self.engine)
+            return True
+        return False
+
+    def record(self, success: bool):
+        self._outcomes.append(success)
+        if self._state == self.HALF_OPEN:
+            self._probing = False
+            if success:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                logger.info("[%s] 🟢 探测成功，熔断关闭", self.engine)
+            else:
+                self._trip()
+        elif (
+            self._state == self.CLOSED
+            and len(self._outcomes) >= BREAKER_MIN_CALLS
+            and self.failure_rate >= BREAKER_FAILURE_RATE
+        ):
+            self._trip()
+
+    def mark(self, up: bool):
+        """
+        后台健康探测结论：可用则提前结束冷却（打开 → 半开，由下一个真实请求决定是否关闭），
+        故障则打开（已打开时顺延冷却）。极短的探测请求成功不代表真实请求可用，不直接关闭熔断
+        """
+        if up:
+            if self.state == self.OPEN:
+                self._opened_at = time.monotonic() - BREAKER_COOLDOWN
+                logger.info("[%s] 🟡 健康探测成功，熔断转半开", self.engine)
+        elif self._state == self.OPEN:
+            self._opened_at = time.monotonic()
+        else:
+            self._probing = False
+            self._trip()
+
+    def release(self):
+        """调用被取消（无结果）：释放探测名额"""
+        self._probing = False
+
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        logger.warning("[%s] 🔴 熔断打开（失败率 %.0f%%），%.0fs 后探测",
+                       self.engine, self.failure_rate * 100, BREAKER_COOLDOWN)
+
+    def snapshot(self) -> dict:
+        state = self.state
+        retry_in = max(0.0, BREAKER_COOLDOWN - (time.monotonic() - self._opened_at)) if state == self.OPEN else 0.0
+        return {"state": state, "failure_rate": self.failure_rate, "retry_in": retry_in}
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_last_success: dict[str, float] = {}
+
+
+def _breaker(engine: str) -> CircuitBreaker:
+    br = _breakers.get(engine)
+    if br is None:
+        br = _breakers[engine] = CircuitBreaker(engine)
+    return br
+
+
+def get_limiter_states() -> dict[str, dict]:
+    """各引擎限流状态 {engine: {"limit", "inflight", "queued", ...}}"""
+    return limiter.all_states()
+
+
+metrics.Gauge("tgbot_engine_concurrency_limit", "引擎限流器当前并发上限（AIMD）", ("engine",),
+              collect=lambda: {(e,): st["limit"] for e, st in limiter.all_states().items()})
+metrics.Gauge("tgbot_engine_queued", "引擎限流器排队中的请求", ("engine",),
+              collect=lambda: {(e,): st["queued"] for e, st in limiter.all_states().items()})
+metrics.Counter("tgbot_engine_throttled_total", "引擎返回 429 的次数", ("engine",),
+                collect=lambda: {(e,): st["throttled"] for e, st in limiter.all_states().items()})
+metrics.Gauge("tgbot_engine_breaker_open", "熔断器是否打开（1=打开）", ("engine",),
+              collect=lambda: {(e,): float(b.state != b.CLOSED) for e, b in _breakers.items()})
+
+
+def mark_engine_health(engine: str, up: bool):
+    """健康探测结果写入熔断器"""
+    _breaker(engine).mark(up)
+
+
+def get_last_success(engine: str) -> float | None:
+    """引擎最近一次调用成功的时间（monotonic），无记录返回 None"""
+    return _last_success.get(engine)
+
+
+def get_breaker_states() -> dict[str, dict]:
+    """各引擎熔断状态 {engine: {"state", "failure_rate", "retry_in"}}"""
+    return {name: br.snapshot() for name, br in _breakers.items()}
+
+
+def _model_of(engine: str, model: str | None = None) -> str:
+    return model or PROVIDER_MODELS.get(engine, "")
+
+
+def get_engine_latency_stats(engine: str, model: str | None = None) -> dict | None:
+    """引擎延迟统计 {count, mean, p50, p95, p99, error_rate}，无数据返回 None"""
+    h = latency.find_histogram(engine, _model_of(engine, model))
+    return h.stats() if h and (h.total or h.errors) else None
 
 
-def get_engine_avg_latency(engine: str) -> float | None:
+def get_engine_avg_latency(engine: str, model: str | None = None) -> float | None:
     """获取引擎平均延迟（秒），无数据返回 None"""
-    samples = _engine_latency.get(engine)
-    return sum(samples) / len(samples) if samples else None
+    h = latency.find_histogram(engine, _model_of(engine, model))
+    return h.mean if h else None
+
+
+def get_engine_latency_quantile(engine: str, q: float, model: str | None = None) -> float | None:
+    """获取引擎延迟分位数（秒），样本不足返回 None"""
+    h = latency.find_histogram(engine, _model_of(engine, model))
+    if not h or h.total < HEDGE_MIN_SAMPLES:
+        return None
+    return h.quantile(q)
+
+
+def get_engine_timeout(engine: str, model: str | None = None, text_len: int = 0) -> float:
+    """按引擎近期延迟分布和文本长度计算超时（秒）"""
+    h = latency.find_histogram(engine, _model_of(engine, model))
+    if not h or h.total < TIMEOUT_MIN_SAMPLES:
+        return TRANSLATE_TIMEOUT
+    timeout = h.quantile(0.99) * TIMEOUT_P99_MULTIPLIER + text_len / 1000 * TIMEOUT_PER_KCHAR
+    return min(TRANSLATE_TIMEOUT, max(TIMEOUT_FLOOR, timeout))
+
+
+def get_batch_stats() -> dict | None:
+    """微批处理统计，未启用返回 None"""
+    return dict(_batcher.stats) if _batcher else None
+
+
+async def close_batcher():
+    """关停时取消未完成的微批"""
+    if _batcher:
+        await _batcher.close()
+
+
+def get_memory_stats() -> dict | None:
+    """翻译记忆统计，未启用返回 None"""
+    if not Config.TM_ENABLED:
+        return None
+    memory = tm.get_memory()
+    return {**memory.stats, "size": memory.size()}
+
+
+def get_mask_stats() -> dict:
+    """占位符遮蔽统计"""
+    return dict(_mask_stats)
 
 
-def get_provider(provider_name: str | None = None) -> BaseProvider:
-    """获取或创建 AI 提供商实例"""
+def get_hedge_stats() -> dict:
+    """对冲统计：fired=触发次数，won=备选引擎先返回的次数"""
+    return dict(_hedge_stats)
+
+
+def get_provider(provider_name: str | None = None, model: str | None = None) -> BaseProvider:
+    """获取或创建 AI 提供商实例（按 引擎+模型 缓存，同引擎复用 SDK 客户端）"""
     name = (provider_name or Config.DEFAULT_PROVIDER).lower().strip()
-    if name in _provider_cache:
-        return _provider_cache[name]
+    key = (name, _model_of(name, model))
+    provider = _provider_cache.get(key)
+    if provider is not None:
+        _provider_last_used[key] = time.monotonic()
+        return provider
 
     api_key = Config.PROVIDER_KEYS.get(name)
     if not api_key:
         raise ValueError(f"未配置 {name} 的 API Key")
 
-    provider = create_provider(name, api_key)
-    _provider_cache[name] = provider
-    logger.info("已创建提供商: %s", name)
+    _evict_idle_providers()
+    provider = create_provider(name, api_key, model, client=_sdk_clients.get(name),
+                               base_url=Config.PROVIDER_BASE_URLS.get(name))
+    _sdk_clients.setdefault(name, provider.client)
+    provider.on_headers = limiter.get_limiter(name).observe
+    _provider_cache[key] = provider
+    _provider_last_used[key] = time.monotonic()
+    logger.info("已创建提供商: %s (%s)", name, provider.model)
     return provider
 
 
+async def warm_up():
+    """启动预热：创建各已配置引擎的默认实例，并预先建立到其 API 的连接"""
+    t0 = time.monotonic()
+    urls = []
+    for name in Config.available_providers():
+        try:
+            urls.append(get_provider(name).base_url)
+        except ValueError as e:
+            logger.warning("预热跳过 %s: %s", name, e)
+    ok = await transport.warm([u for u in urls if u])
+    logger.info("🔥 连接预热完成 %d/%d（HTTP/2: %s）%.2fs", ok, len(urls), transport.HTTP2, time.monotonic() - t0)
+
+
+def _evict_idle_providers():
+    """淘汰长时间未使用的自定义模型实例（默认模型常驻）"""
+    now = time.monotonic()
+    for key, last in list(_provider_last_used.items()):
+        name, model = key
+        if model != PROVIDER_MODELS.get(name) and now - last > PROVIDER_IDLE_TTL:
+            _provider_cache.pop(key, None)
+            _provider_last_used.pop(key, None)
+            logger.info("淘汰闲置提供商: %s (%s)", name, model)
+
+
 def clear_provider_cache():
     """清空提供商缓存（热重载时使用）"""
     _provider_cache.clear()
+    _provider_last_used.clear()
+    _sdk_clients.clear()
 
 
 def _get_fallback_providers(primary: str) -> list[str]:
-    """获取降级备选列表（按平均延迟排序）"""
+    """获取降级备选列表（按 P50 延迟排序）"""
     others = [p for p in Config.available_providers() if p != primary]
-    others.sort(key=lambda p: get_engine_avg_latency(p) or 999)
+    others.sort(key=lambda p: get_engine_latency_quantile(p, 0.5) or 999)
     return others
 
 
+def _smart_alt(target: str) -> str:
+    """智能互翻的备选目标语言"""
+    return SMART_FALLBACK_LANG.get(target.lower().strip(), "English" if "中" in target else "中文")
+
+
 def _is_same_lang(detected: str, target: str) -> bool:
     """判断源语言和目标语言是否相同"""
     d, t = detected.lower().strip(), target.lower().strip()
     return d == t or d in t or t in d
 
 
+def _resolve_detected(detected: str, text: str) -> str:
+    """引擎未给出源语言（输出格式异常）时以本地识别补全，保证智能互翻判断可用"""
+    if detected and detected != "未知":
+        return detected
+    return langid.detect_unambiguous(text) or "未知"
+
+
+async def _acquire(provider: BaseProvider, breaker: CircuitBreaker) -> limiter.EngineLimiter:
+    """在引擎限流器排队获取名额（不计入超时）；失败时释放熔断探测名额"""
+    lim = limiter.get_limiter(provider.name)
+    try:
+        await lim.acquire()
+    except (RateLimitError, asyncio.CancelledError) as e:
+        breaker.release()
+        if isinstance(e, limiter.QueueTimeout):
+            metrics.LIMITER_REJECTED.inc(provider.name)
+        raise
+    return lim
+
+
 async def _call_with_timeout(provider: BaseProvider, text: str, target: str, source: str) -> dict:
-    """带超时的翻译调用"""
+    """带自适应超时的翻译调用（先经引擎限流排队，结果计入熔断器和延迟统计）"""
+    if _batcher and len(text) < _batcher.max_chars:
+        # 批处理时由 batcher 按批次排队；不入批的长文本走普通排队（排队时间不计入超时）
+        return await _call_guarded(provider, lambda: _batcher.submit(provider, text, target, source),
+                                   len(text), queue=False)
+    return await _call_guarded(provider, lambda: provider.translate(text, target, source), len(text))
+
+
+async def _call_guarded(provider: BaseProvider, make_call, size: int, *, queue: bool = True, probe: bool = False):
+    """
+    引擎调用公共流程：限流排队（不计入超时）→ 自适应超时 → 记录熔断 / 延迟 / 限流反馈
+    make_call 返回待执行的协程，size 为文本长度（用于计算超时）
+    probe=True 为健康探测：不占限流名额、不占半开探测名额，只有失败计入熔断（成功由调用方
+    经 mark_engine_health 转半开）；延迟不进入驱动超时 / 对冲的直方图，
+    成功也不放大并发上限、不算作近期真实请求成功
+    """
+    breaker = _breaker(provider.name)
+    queue = queue and not probe
+    if queue:
+        with tracing.span("limiter_wait", engine=provider.name):
+            lim = await _acquire(provider, breaker)
+    else:
+        lim = limiter.get_limiter(provider.name)
+    timeout = get_engine_timeout(provider.name, provider.model, size)
     start = time.monotonic()
     try:
-        result = await asyncio.wait_for(
-            provider.translate(text, target, source),
-            timeout=TRANSLATE_TIMEOUT,
-        )
-        elapsed = time.monotonic() - start
-        _record_latency(provider.__class__.__name__, elapsed)
-        return result
+        with tracing.span("provider_call", engine=provider.name, timeout=round(timeout, 1)):
+            result = await asyncio.wait_for(make_call(), timeout=timeout)
     except asyncio.TimeoutError:
+        breaker.record(False)
         elapsed = time.monotonic() - start
-        raise TimeoutError(f"翻译超时 ({elapsed:.1f}s > {TRANSLATE_TIMEOUT}s)")
+        if not probe:
+            # 超时也计入延迟样本，持续超时时 P99 随之抬升，超时自动放宽
+            latency.record_timeout(provider.name, provider.model, elapsed)
+            metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "timeout")
+        raise TimeoutError(f"翻译超时 ({elapsed:.1f}s > {timeout:.1f}s)")
+    except asyncio.CancelledError:
+        if not probe:
+            breaker.release()
+            # 对冲落败被取消：已等待时长作为下界样本计入，否则直方图只剩胜出的快样本，
+            # P95 持续偏低、对冲越来越频繁
+            latency.record(provider.name, provider.model, time.monotonic() - start)
+        raise
+    except limiter.QueueTimeout:
+        if not probe:
+            breaker.release()
+        raise
+    except RateLimitError as e:
+        # 限流不代表引擎故障：不计入熔断，收缩并发并暂停到 Retry-After
+        if not probe:
+            breaker.release()
+        lim.on_rate_limited(e.retry_after, start)
+        if not probe:
+            metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "rate_limited")
+        raise
+    except Exception:
+        breaker.record(False)
+        if not probe:
+            latency.record_error(provider.name, provider.model)
+            metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "error")
+        raise
+    finally:
+        if queue:
+            lim.release()
+    if probe:
+        return result
+    breaker.record(True)
+    lim.on_success()
+    _last_success[provider.name] = time.monotonic()
+    elapsed = time.monotonic() - start
+    latency.record(provider.name, provider.model, elapsed)
+    metrics.PROVIDER_LATENCY.observe(elapsed, provider.name, provider.model)
+    return result
+
+
+async def probe_engine(engine: str, text: str, target: str) -> dict:
+    """健康探测：以默认模型直接调用（不经批处理 / 对冲 / 降级 / 限流排队），结果只计入熔断"""
+    provider = get_provider(engine)
+    return await _call_guarded(provider, lambda: provider.translate(text, target), len(text), probe=True)
+
+
+def _usable(result) -> bool:
+    translation = result.get("translation", "") if isinstance(result, dict) else str(result)
+    return bool(translation and translation.strip())
+
+
+async def _call_hedged(
+    provider: BaseProvider, text: str, target: str, source: str, fallbacks: list[str],
+) -> tuple[dict, BaseProvider]:
+    """
+    对冲调用：主引擎在 P95 延迟内未返回，则并发请求最快的可用备选引擎，
+    取先返回的有效结果并取消另一个。返回 (结果, 实际提供商)
+    """
+    primary = provider.name
+    delay = get_engine_latency_quantile(primary, HEDGE_QUANTILE, provider.model)
+    if not Config.HEDGE_ENABLED or delay is None or not fallbacks:
+        return await _call_with_timeout(provider, text, target, source), provider
+
+    tasks: dict[asyncio.Future, BaseProvider] = {
+        asyncio.ensure_future(_call_with_timeout(provider, text, target, source)): provider,
+    }
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=max(delay, HEDGE_MIN_DELAY))
+        if not done:
+            backup = None
+            for name in fallbacks:
+                # 只对冲到健康且有空闲名额的引擎，避免把过载扩散出去
+                if _breaker(name).state != CircuitBreaker.CLOSED or not limiter.get_limiter(name).has_capacity():
+                    continue
+                try:
+                    backup = get_provider(name)
+                    break
+                except ValueError:
+                    continue
+            if backup:
+                _hedge_stats["fired"] += 1
+                logger.info("[%s] ⏳ 超过 P95 (%.1fs)，对冲到 %s", primary, delay, backup.name)
+                tasks[asyncio.ensure_future(_call_with_timeout(backup, text, target, source))] = backup
+
+        pending = set(tasks)
+        first_error: BaseException | None = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None and _usable(t.result()):
+                    if tasks[t] is not provider:
+                        _hedge_stats["won"] += 1
+                    return t.result(), tasks[t]
+                if tasks[t] is provider or first_error is None:
+                    first_error = t.exception() or first_error
+        if first_error:
+            raise first_error
+        # 均返回空结果：交由上层按空结果处理
+        return next(iter(tasks)).result(), provider
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+def get_coalesce_stats() -> dict:
+    """请求合并统计：leaders=实际发起的调用数，coalesced=被合并的请求数"""
+    return {**_coalesce_stats, "inflight": len(_inflight)}
+
+
+def _coalesce_key(text: str, target: str, source: str, engine: str, model: str | None) -> tuple:
+    return (text.strip(), target.lower().strip(), source.lower().strip(), engine, model or "")
+
+
+def _finish_inflight(key: tuple, task: asyncio.Future):
+    """在途请求结束：移出合并表（已被同键新请求取代时保留），并取走异常避免所有等待者都已取消时告警"""
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()
 
 
 async def translate_text(
@@ -111,7 +525,10 @@ async def translate_text(
     custom_model: str | None = None,
 ) -> dict:
     """
-    翻译文本（智能互翻 + 超时 + 重试 + 降级）
+    翻译文本（请求合并 + 智能互翻 + 超时 + 重试 + 降级）
+
+    并发的相同请求（文本/目标语言/引擎/模型一致）只调用一次引擎，
+    所有等待者共享同一结果或同一异常。
 
     Returns:
         {"translation": str, "detected_lang": str, "target_lang": str,
@@ -126,21 +543,413 @@ async def translate_text(
 
     target = target_lang or Config.DEFAULT_TARGET_LANG
     primary = (provider_name or Config.DEFAULT_PROVIDER).lower().strip()
+
+    # 先进入追踪再创建任务：引擎调用的各阶段随上下文归属本次追踪
+    with tracing.trace("translate_text", engine=primary, chars=len(text)) as sp:
+        key = _coalesce_key(text, target, source_lang, primary, custom_model)
+        task = _inflight.get(key)
+        if task is None:
+            _coalesce_stats["leaders"] += 1
+            task = asyncio.ensure_future(_translate(text, target, source_lang, primary, custom_model))
+            _inflight[key] = task
+            task.add_done_callback(lambda t: _finish_inflight(key, t))
+        else:
+            _coalesce_stats["coalesced"] += 1
+            sp.attrs["coalesced"] = True
+            logger.info("[%s] 合并在途请求: %s...", primary, text[:60])
+
+        # shield：单个等待者被取消（如 Telegram 超时）不影响其他等待者
+        start = time.monotonic()
+        metrics.TRANSLATE_INFLIGHT.inc()
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            metrics.TRANSLATE_INFLIGHT.dec()
+    metrics.TRANSLATE_LATENCY.observe(time.monotonic() - start, primary)
+    if result["engine"] != primary:
+        metrics.TRANSLATE_FALLBACKS.inc(primary, result["engine"])
+    return dict(result)
+
+
+def _effective_target(text: str, target: str, source_lang: str) -> str:
+    """本地语言识别：原文确定已是目标语言时，调用前直接切换到互翻语言，省去一次往返
+
+    只采用不会认错的识别结果（见 langid.detect_unambiguous），其余交由引擎返回的源语言判断。
+    """
+    if source_lang == "auto":
+        local_lang = langid.detect_unambiguous(text)
+        if local_lang and langid.is_same_lang(local_lang, target):
+            alt = _smart_alt(target)
+            logger.info("🔄 本地识别 %s=%s，直接翻译到 %s", local_lang, target, alt)
+            return alt
+    return target
+
+
+async def _translate(text: str, target: str, source_lang: str, primary: str, custom_model: str | None) -> dict:
+    """实际翻译流程：遮蔽不可翻译片段 → 确定目标语言 → 翻译 → 还原占位符"""
+    masked = masking.mask(text)
+    if not masked.spans:
+        return await _dispatch(text, _effective_target(text, target, source_lang), source_lang, primary, custom_model)
+
+    if not masking.has_translatable(masked):
+        _mask_stats["skipped"] += 1
+        return {"translation": text, "detected_lang": "未知", "target_lang": target,
+                "engine": primary, "latency": 0.0, "skipped": True}
+
+    _mask_stats["masked"] += 1
+    _mask_stats["spans"] += len(masked.spans)
+    _mask_stats["chars_saved"] += masking.saved_chars(masked)
+    target = _effective_target(masked.text, target, source_lang)
+    result = await _dispatch(masked.text, target, source_lang, primary, custom_model)
+    restored = masking.unmask(result["translation"], masked.spans)
+    if restored is not None:
+        return {**result, "translation": restored}
+
+    _mask_stats["restore_failed"] += 1
+    logger.warning("[%s] 占位符还原失败，改用原文重译: %s...", result["engine"], text[:60])
+    return await _dispatch(text, target, source_lang, primary, custom_model)
+
+
+async def _dispatch(text: str, target: str, source_lang: str, primary: str, custom_model: str | None) -> dict:
+    """翻译记忆 / 长文本分块 / 单次翻译"""
+    if Config.TM_ENABLED:
+        return await _translate_with_memory(text, target, source_lang, primary, custom_model)
+    if len(text) > CHUNK_SIZE:
+        return await _translate_chunked(text, target, source_lang, primary, custom_model)
+    return await _translate_once(text, target, source_lang, primary, custom_model)
+
+
+async def translate_text_stream(
+    text: str,
+    target_lang: str | None = None,
+    source_lang: str = "auto",
+    provider_name: str | None = None,
+    custom_model: str | None = None,
+) -> AsyncIterator[dict]:
+    """
+    流式翻译：逐次产出 {"translation": <已生成部分>, "detected_lang": str, "done": False}，
+    最后产出与 translate_text 相同的完整结果并带 "done": True。
+
+    与 translate_text 共用占位符遮蔽、请求合并和指标：发送遮蔽后的文本，中间态只还原已完整
+    出现的占位符；相同请求在途时直接等待其结果，流式调用本身也登记为在途请求供后来者合并。
+    长文本、启用翻译记忆、主引擎熔断 / 流式失败、占位符还原失败或需要智能互翻时，
+    退回 translate_text（完整降级流程，含对冲）。
+    """
+    if not text or not text.strip():
+        yield {"translation": "", "detected_lang": "", "target_lang": "", "engine": "", "latency": 0, "done": True}
+        return
+
+    if len(text) > Config.MAX_TEXT_LENGTH:
+        raise ValueError(f"文本过长：{len(text)} 字符（最大 {Config.MAX_TEXT_LENGTH}）")
+
+    target = target_lang or Config.DEFAULT_TARGET_LANG
+    primary = (provider_name or Config.DEFAULT_PROVIDER).lower().strip()
+    key = _coalesce_key(text, target, source_lang, primary, custom_model)
+    masked = masking.mask(text)
+
+    provider = None
+    if (len(text) <= CHUNK_SIZE and not Config.TM_ENABLED and key not in _inflight
+            and (not masked.spans or masking.has_translatable(masked))):
+        try:
+            provider = get_provider(primary, custom_model)
+        except ValueError:
+            provider = None
+    if provider is None or not _breaker(primary).allow():
+        result = await translate_text(text, target, source_lang, provider_name, custom_model)
+        yield {**result, "done": True}
+        return
+
+    # 登记为在途请求：流式期间到达的相同请求等待本次结果
+    leader = asyncio.get_running_loop().create_future()
+    _inflight[key] = leader
+    leader.add_done_callback(lambda f: _finish_inflight(key, f))
+    _coalesce_stats["leaders"] += 1
+    try:
+        result = None
+        effective = _effective_target(masked.text, target, source_lang)
+        start = time.monotonic()
+        metrics.TRANSLATE_INFLIGHT.inc()
+        try:
+            with tracing.trace("translate_text", engine=primary, chars=len(text), stream=True):
+                final = None
+                async for partial in _stream_with_timeout(provider, masked.text, effective, source_lang):
+                    final = partial
+                    yield {**partial, "translation": masking.unmask_partial(partial["translation"], masked.spans),
+                           "done": False}
+                result = _stream_result(text, masked, final, effective, primary, time.monotonic() - start)
+        except Exception as e:
+            logger.warning("[%s] 流式翻译失败，退回普通翻译: %s", primary, e)
+        finally:
+            metrics.TRANSLATE_INFLIGHT.dec()
+        if result is not None:
+            metrics.TRANSLATE_LATENCY.observe(time.monotonic() - start, primary)
+        else:
+            # 退回完整流程前让出在途登记，否则 translate_text 会等待自己
+            if _inflight.get(key) is leader:
+                del _inflight[key]
+            result = await translate_text(text, target, source_lang, provider_name, custom_model)
+        leader.set_result(result)
+    except BaseException as e:
+        if not leader.done():
+            leader.set_exception(e if isinstance(e, Exception) else RuntimeError("流式翻译已中止"))
+        raise
+    yield {**result, "done": True}
+
+
+def _stream_result(text: str, masked: masking.Masked, final: dict | None, target: str, engine: str,
+                   elapsed: float) -> dict | None:
+    """流式最终结果：还原占位符并校验；译文为空、原样回显（需智能互翻）或还原失败返回 None"""
+    translation = (final or {}).get("translation", "")
+    if masked.spans and translation.strip():
+        restored = masking.unmask(translation, masked.spans)
+        if restored is None:
+            _mask_stats["restore_failed"] += 1
+            logger.warning("[%s] 流式占位符还原失败，退回普通翻译: %s...", engine, text[:60])
+            return None
+        translation = restored
+    detected = _resolve_detected((final or {}).get("detected_lang", "未知"), masked.text)
+    echoed = _is_same_lang(detected, target) and translation.strip() == text.strip()
+    if not translation.strip() or echoed:
+        return None
+    if masked.spans:
+        _mask_stats["masked"] += 1
+        _mask_stats["spans"] += len(masked.spans)
+        _mask_stats["chars_saved"] += masking.saved_chars(masked)
+    logger.info("[%s] ✅ 流式 %s → %s: %s...", engine, detected, target, translation[:60])
+    return {"translation": translation, "detected_lang": detected, "target_lang": target,
+            "engine": engine, "latency": elapsed}
+
+
+async def _stream_with_timeout(provider: BaseProvider, text: str, target: str, source: str) -> AsyncIterator[dict]:
+    """带空闲超时的流式调用（两次增量间隔超过自适应超时即失败），结果计入熔断器和延迟统计"""
+    breaker = _breaker(provider.name)
+    lim = await _acquire(provider, breaker)
+    timeout = get_engine_timeout(provider.name, provider.model, len(text))
+    start = time.monotonic()
+    stream = provider.translate_stream(text, target, source)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                break
+            yield item
+    except asyncio.TimeoutError:
+        breaker.record(False)
+        elapsed = time.monotonic() - start
+        latency.record_timeout(provider.name, provider.model, elapsed)
+        metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "timeout")
+        raise TimeoutError(f"流式翻译超时 ({elapsed:.1f}s，空闲 > {timeout:.1f}s)")
+    except (asyncio.CancelledError, GeneratorExit):
+        breaker.release()
+        raise
+    except RateLimitError as e:
+        breaker.release()
+        lim.on_rate_limited(e.retry_after, start)
+        metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "rate_limited")
+        raise
+    except Exception:
+        breaker.record(False)
+        latency.record_error(provider.name, provider.model)
+        metrics.PROVIDER_FAILURES.inc(provider.name, provider.model, "error")
+        raise
+    finally:
+        lim.release()
+        await stream.aclose()
+    breaker.record(True)
+    lim.on_success()
+    elapsed = time.monotonic() - start
+    latency.record(provider.name, provider.model, elapsed)
+    metrics.PROVIDER_LATENCY.observe(elapsed, provider.name, provider.model)
+
+
+async def _translate_chunked(
+    text: str, target: str, source_lang: str, primary: str, custom_model: str | None, *, smart: bool = True,
+) -> dict:
+    """长文本：按段落/句子分块并发翻译，失败分块逐个重试，按原顺序拼回"""
+    t0 = time.monotonic()
+    pieces = segmenter.split_chunks(text, CHUNK_SIZE)
+    logger.info("✂️ 长文本 %d 字符，分 %d 块并发翻译", len(text), len(pieces))
+    results = await _translate_bodies([p.body for p in pieces if p.body], target, source_lang, primary, custom_model,
+                                      smart=smart)
+
+    it = iter(results)
+    bodies = [next(it)["translation"] if p.body else "" for p in pieces]
+    return {
+        "translation": segmenter.join_pieces(pieces, bodies),
+        "detected_lang": _most_common(r["detected_lang"] for r in results),
+        "target_lang": results[0]["target_lang"],
+        "engine": _most_common(r["engine"] for r in results),
+        "latency": time.monotonic() - t0,
+    }
+
+
+def _most_common(values) -> str:
+    return Counter(values).most_common(1)[0][0]
+
+
+def _mostly_same_lang(bodies: list[str], results: list[dict], target: str) -> bool:
+    """多数分块识别为目标语言：整段原文已是目标语言，应与单次翻译一样切换到互翻语言"""
+    same = sum(_is_same_lang(_resolve_detected(r.get("detected_lang", ""), b), target) for b, r in zip(bodies, results))
+    return same * 2 > len(bodies)
+
+
+async def _translate_bodies(
+    bodies: list[str], target: str, source_lang: str, primary: str, custom_model: str | None, *, smart: bool = True,
+) -> list[dict]:
+    """
+    多段文本并发翻译（各自重试 + 降级），失败段逐个重试，按顺序返回。
+    各段单独翻译时不做智能互翻（一段引文不应改变整条消息的目标语言）；
+    smart=True 时多数分块识别为目标语言则全部改译为互翻语言
+    """
+    sem = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def run(body: str) -> dict:
+        async with sem:
+            return await _translate_once(body, target, source_lang, primary, custom_model, smart=False)
+
+    results = await asyncio.gather(*(run(b) for b in bodies), return_exceptions=True)
+    for i, r in enumerate(results):
+        if isinstance(r, Exception):
+            logger.warning("分块 %d/%d 失败，单独重试: %s", i + 1, len(results), r)
+            results[i] = await _translate_once(bodies[i], target, source_lang, primary, custom_model, smart=False)
+    if smart and _mostly_same_lang(bodies, results, target):
+        alt = _smart_alt(target)
+        logger.info("🔄 %d 块多数已是 %s，改译到 %s", len(bodies), target, alt)
+        return await _translate_bodies(bodies, alt, source_lang, primary, custom_model, smart=False)
+    return results
+
+
+async def _translate_with_memory(
+    text: str, target: str, source_lang: str, primary: str, custom_model: str | None, *, smart: bool = True,
+) -> dict:
+    """
+    翻译记忆：逐句查找译文，只翻译未命中的句段，译文按实际目标语言回写记忆。
+    多数句段识别为目标语言时整条改译为互翻语言（smart=True，与单次翻译一致）
+    """
+    t0 = time.monotonic()
+    memory = tm.get_memory()
+    pieces = segmenter.split_segments(text)
+    idx = [i for i, p in enumerate(pieces) if p.body]
+    matches = {i: memory.lookup(pieces[i].body, target) for i in idx}
+    misses = [i for i in idx if matches[i] is None]
+
+    if len(idx) == 1 and misses:
+        # 单句未命中：走完整流程（含智能互翻，超长时分块），按实际目标语言回写
+        if len(text) > CHUNK_SIZE:
+            result = await _translate_chunked(text, target, source_lang, primary, custom_model, smart=smart)
+        else:
+            result = await _translate_once(text, target, source_lang, primary, custom_model, smart=smart)
+        memory.store([(text, result["translation"], result["detected_lang"], result["engine"])],
+                     result["target_lang"])
+        return {**result, "tm_hits": 0, "segments": 1}
+
+    results = {}
+    if misses:
+        translated = await _translate_segments([pieces[i].body for i in misses], target, source_lang,
+                                               primary, custom_model)
+        # 命中记忆的句段必不是目标语言，按全部句段计多数
+        same = sum(_is_same_lang(r["detected_lang"], target) for r in translated)
+        if smart and same * 2 > len(idx):
+            alt = _smart_alt(target)
+            logger.info("🔄 %d/%d 句已是 %s，整条改译到 %s", same, len(idx), target, alt)
+            return await _translate_with_memory(text, alt, source_lang, primary, custom_model, smart=False)
+        results = dict(zip(misses, translated))
+        memory.store([
+            (pieces[i].body, r["translation"], r["detected_lang"], r["engine"]) for i, r in results.items()
+        ], target)
+
+    hits = len(idx) - len(misses)
+    logger.info("📚 翻译记忆命中 %d/%d 句", hits, len(idx))
+    bodies = [
+        (results[i]["translation"] if i in results else matches[i].translation) if p.body else ""
+        for i, p in enumerate(pieces)
+    ]
+    detected = [results[i]["detected_lang"] if i in results else matches[i].detected_lang for i in idx]
+    return {
+        "translation": segmenter.join_pieces(pieces, bodies),
+        "detected_lang": _most_common(detected) if detected else "未知",
+        "target_lang": target,
+        "engine": _most_common(r["engine"] for r in results.values()) if results else primary,
+        "latency": time.monotonic() - t0,
+        "tm_hits": hits,
+        "segments": len(idx),
+    }
+
+
+async def _translate_segments(
+    bodies: list[str], target: str, source_lang: str, primary: str, custom_model: str | None,
+) -> list[dict]:
+    """
+    翻译未命中的句段：按 CHUNK_SIZE 分组，每组一次批量请求（结果按句对齐）；
+    批量失败或条数不符时退回逐句翻译（含降级），超过 CHUNK_SIZE 的单句分块翻译。
+    不做智能互翻，由调用方按整条消息判断
+    """
+    groups: list[list[int]] = [[]]
+    size = 0
+    for i, body in enumerate(bodies):
+        if groups[-1] and size + len(body) > CHUNK_SIZE:
+            groups.append([])
+            size = 0
+        groups[-1].append(i)
+        size += len(body)
+
+    sem = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def run(group: list[int]) -> list[dict]:
+        texts = [bodies[i] for i in group]
+        if len(texts[0]) > CHUNK_SIZE:
+            # 超长句单独成组
+            return [await _translate_chunked(texts[0], target, source_lang, primary, custom_model, smart=False)]
+        if len(texts) > 1:
+            try:
+                provider = get_provider(primary, custom_model)
+                if _breaker(primary).allow():
+                    async with sem:
+                        items = await _call_guarded(
+                            provider, lambda: provider.translate_batch(texts, target, source_lang),
+                            sum(map(len, texts)),
+                        )
+                    return [{**r, "detected_lang": _resolve_detected(r.get("detected_lang", ""), t),
+                             "target_lang": target, "engine": primary} for r, t in zip(items, texts)]
+            except Exception as e:
+                logger.warning("[%s] 句段批量翻译失败，逐句翻译: %s", primary, e)
+        return await _translate_bodies(texts, target, source_lang, primary, custom_model, smart=False)
+
+    out = await asyncio.gather(*(run(g) for g in groups))
+    return [r for group in out for r in group]
+
+
+async def _translate_once(
+    text: str, target: str, source_lang: str, primary: str, custom_model: str | None, *, smart: bool = True,
+) -> dict:
+    """单次翻译（重试 + 降级 + 智能互翻）"""
     try_list = [primary] + _get_fallback_providers(primary)
 
     all_errors = []
 
     for engine in try_list:
         try:
-            provider = get_provider(engine)
+            # 自定义模型只对主引擎生效，降级引擎使用各自默认模型
+            provider = get_provider(engine, custom_model if engine == primary else None)
         except ValueError:
             continue
 
+        breaker = _breaker(engine)
         for attempt in range(1, MAX_RETRIES + 1):
+            # 熔断打开的引擎直接跳过，不再付出重试等待
+            if not breaker.allow():
+                all_errors.append(f"[{engine}] 🔴 熔断中")
+                logger.info("[%s] 熔断中，跳过", engine)
+                break
             t0 = time.monotonic()
             try:
                 logger.info("[%s] 翻译(第%d次): %s... → %s", engine, attempt, text[:60], target)
-                result = await _call_with_timeout(provider, text, target, source_lang)
+                if engine == primary and attempt == 1:
+                    result, served_provider = await _call_hedged(provider, text, target, source_lang, try_list[1:])
+                else:
+                    result, served_provider = await _call_with_timeout(provider, text, target, source_lang), provider
+                served = served_provider.name
 
                 translation = result.get("translation", "") if isinstance(result, dict) else str(result)
                 if not translation or not translation.strip():
@@ -148,42 +957,50 @@ async def translate_text(
                     continue
 
                 detected = result.get("detected_lang", "未知") if isinstance(result, dict) else "未知"
-                latency = time.monotonic() - t0
+                detected = _resolve_detected(detected, text)
+                elapsed = time.monotonic() - t0
 
                 # 智能互翻：源语言==目标语言 且 翻译结果==原文 → 切换目标语言
-                if _is_same_lang(detected, target) and translation.strip() == text.strip():
-                    alt = SMART_FALLBACK_LANG.get(
-                        target.lower().strip(),
-                        "English" if "中" in target else "中文"
-                    )
-                    logger.info("[%s] 🔄 %s=%s，切换到 %s", engine, detected, target, alt)
+                if smart and _is_same_lang(detected, target) and translation.strip() == text.strip():
+                    alt = _smart_alt(target)
+                    logger.info("[%s] 🔄 %s=%s，切换到 %s", served, detected, target, alt)
                     try:
-                        r2 = await _call_with_timeout(provider, text, alt, source_lang)
+                        with tracing.span("smart_fallback", engine=served, target=alt):
+                            r2 = await _call_with_timeout(served_provider, text, alt, source_lang)
                         t2 = r2.get("translation", "") if isinstance(r2, dict) else str(r2)
                         if t2 and t2.strip() and t2.strip() != text.strip():
-                            logger.info("[%s] ✅ %s → %s: %s...", engine, detected, alt, t2[:60])
+                            logger.info("[%s] ✅ %s → %s: %s...", served, detected, alt, t2[:60])
                             return {
                                 "translation": t2,
                                 "detected_lang": detected,
                                 "target_lang": alt,
-                                "engine": engine,
+                                "engine": served,
                                 "latency": time.monotonic() - t0,
                             }
                     except Exception as e2:
-                        logger.warning("[%s] 互翻失败: %s", engine, e2)
+                        logger.warning("[%s] 互翻失败: %s", served, e2)
 
-                logger.info("[%s] ✅ %s → %s: %s...", engine, detected, target, translation[:60])
+                logger.info("[%s] ✅ %s → %s: %s...", served, detected, target, translation[:60])
                 return {
                     "translation": translation,
                     "detected_lang": detected,
                     "target_lang": target,
-                    "engine": engine,
-                    "latency": latency,
+                    "engine": served,
+                    "latency": elapsed,
                 }
 
             except TimeoutError as e:
                 all_errors.append(f"[{engine}] ⏱️ {e}")
                 logger.warning("[%s] 第%d次超时: %s", engine, attempt, e)
+            except limiter.QueueTimeout as e:
+                all_errors.append(f"[{engine}] 🚦 {e}")
+                logger.warning("[%s] 限流排队超时，降级", engine)
+                break
+            except RateLimitError as e:
+                # 重试时由限流器按 Retry-After 排队，无需额外等待
+                all_errors.append(f"[{engine}] 🚦 {e}")
+                logger.warning("[%s] 第%d次被限流: %s", engine, attempt, e)
+                continue
             except Exception as e:
                 all_errors.append(f"[{engine}] {e}")
                 logger.warning("[%s] 第%d次出错: %s", engine, attempt, e)
@@ -0,0 +1,117 @@
+"""更新分发单元测试 — 同一聊天按顺序、每个聊天最多占一个并发名额，使用合成 Update，不联网"""
+
+import asyncio
+
+from telegram import Update
+
+from src import metrics
+from src.dispatcher import ChatOrderedProcessor, chat_key
+
+_update_id = 0
+
+
+def make_update(chat_id: int, text: str = "hi") -> Update:
+    global _update_id
+    _update_id += 1
+    chat_type = "private" if chat_id > 0 else "supergroup"
+    return Update.de_json({
+        "update_id": _update_id,
+        "message": {
+            "message_id": _update_id, "date": 0, "text": text,
+            "chat": {"id": chat_id, "type": chat_type},
+            "from": {"id": abs(chat_id), "is_bot": False, "first_name": "t"},
+        },
+    }, None)
+
+
+def test_chat_key():
+    assert chat_key(make_update(-100)) == -100
+    assert chat_key(Update.de_json({"update_id": 1}, None)) is None
+    assert chat_key(object()) is None
+
+
+def test_busy_chat_uses_one_slot_and_keeps_order():
+    async def main():
+        processor = ChatOrderedProcessor(concurrency=2)
+        gate = asyncio.Event()
+        log: list[str] = []
+
+        async def handle(name: str, block: bool = False):
+            log.append(f"start {name}")
+            if block:
+                await gate.wait()
+            log.append(f"end {name}")
+
+        tasks = [asyncio.create_task(processor.process_update(make_update(-100), handle(f"a{i}", block=True)))
+                 for i in range(3)]
+        await asyncio.sleep(0.01)
+        # 同一聊天：只有第一条在执行，其余排队且不占并发名额
+        assert log == ["start a0"]
+        assert processor.snapshot() == {"running": 1, "pending": 3, "chats": 1, "limit": 2}
+
+        # 另一聊天不被阻塞
+        await asyncio.wait_for(processor.process_update(make_update(-200), handle("b0")), timeout=1)
+        assert log == ["start a0", "start b0", "end b0"]
+
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert log[3:] == ["end a0", "start a1", "end a1", "start a2", "end a2"]
+        assert processor.snapshot() == {"running": 0, "pending": 0, "chats": 0, "limit": 2}
+
+    asyncio.run(main())
+
+
+def test_concurrency_limit_across_chats():
+    async def main():
+        processor = ChatOrderedProcessor(concurrency=2)
+        gate = asyncio.Event()
+        peak = 0
+
+        async def handle():
+            nonlocal peak
+            peak = max(peak, processor.snapshot()["running"])
+            await gate.wait()
+
+        tasks = [asyncio.create_task(processor.process_update(make_update(-100 - i), handle())) for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert processor.snapshot()["running"] == 2
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert peak == 2
+
+    asyncio.run(main())
+
+
+def test_ordered_shared_with_delayed_work():
+    """延迟队列补发的翻译与该聊天的新更新共用同一把锁"""
+    async def main():
+        processor = ChatOrderedProcessor(concurrency=4)
+        log: list[str] = []
+
+        async def delayed():
+            async with processor.ordered(-100):
+                log.append("delayed")
+                await asyncio.sleep(0.01)
+
+        async def handle():
+            log.append("update")
+
+        first = asyncio.create_task(delayed())
+        await asyncio.sleep(0)
+        await processor.process_update(make_update(-100), handle())
+        await first
+        assert log == ["delayed", "update"]
+
+        async with processor.ordered(None):
+            assert processor.snapshot()["chats"] == 0
+
+    asyncio.run(main())
+
+
+def test_gauges_registered_once():
+    ChatOrderedProcessor(concurrency=2)
+    latest = ChatOrderedProcessor(concurrency=3)
+    latest._running = 5
+    gauges = [m for m in metrics._registry if m.name == "tgbot_updates_running"]
+    assert len(gauges) == 1
+    assert gauges[0].render()[-1] == "tgbot_updates_running 5"
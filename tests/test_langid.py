@@ -0,0 +1,34 @@
+"""本地语言识别单元测试 — 调用前预判（detect_unambiguous）与目标语言切换"""
+
+import pytest
+
+from src import translator
+from src.langid import detect_unambiguous
+
+
+@pytest.mark.parametrize("text, lang", [
+    ("今天天气很好，我们去公园散步吧。", "中文"),
+    ("我用 Python 写了一个小工具", "中文"),
+    ("明日の会議は午後三時からです。", "日本語"),
+    ("오늘 회의는 오후 세 시에 시작합니다.", "한국어"),
+    ("The meeting has been moved to Thursday afternoon.", "English"),
+])
+def test_detect_unambiguous(text, lang):
+    assert detect_unambiguous(text) == lang
+
+
+@pytest.mark.parametrize("text", [
+    "東京駅",  # 短的纯汉字词组可能是日文
+    "好的",
+    "Привіт усім, як справи?",  # 西里尔文字多种语言共用
+    "Merhaba herkese, nasılsınız? Bugün hava çok güzel.",  # 词表外拉丁语言
+])
+def test_detect_unambiguous_gives_up(text):
+    assert detect_unambiguous(text) is None
+
+
+def test_chinese_to_chinese_target_pre_switches():
+    text = "今天天气很好，我们去公园散步吧。"
+    assert translator._effective_target(text, "中文", "auto") == translator._smart_alt("中文")
+    assert translator._effective_target(text, "中文", "中文") == "中文"
+    assert translator._effective_target("Good morning, how are you today?", "中文", "auto") == "中文"
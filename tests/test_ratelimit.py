@@ -0,0 +1,147 @@
+"""频率限制单元测试 — 滑动窗口等待时间、延迟队列调度（同聊天顺序 / 过期），不联网"""
+
+import asyncio
+
+import pytest
+
+from src.ratelimit import DelayQueue, RateLimiter, SlidingWindow
+
+WINDOW = 60.0
+
+
+def _allowed(sw: SlidingWindow, key, now: float) -> bool:
+    return sw.retry_after(key, now) == 0.0
+
+
+@pytest.mark.parametrize("hits, now", [
+    ((1.0, 2.0), 10.0),  # 本窗口已满：等到下一窗口上一窗口权重衰减
+    ((30.0, 50.0), 70.0),  # 上一窗口满、本窗口为空：本窗口内等权重衰减
+    ((10.0, 65.0), 70.0),  # 上一窗口 1 次 + 本窗口 1 次
+    ((0.0, 59.9), 59.95),  # 紧贴窗口边界
+])
+def test_retry_after_is_exact_wait(hits, now):
+    sw = SlidingWindow(2, WINDOW)
+    for t in hits:
+        sw.hit("k", t)
+    wait = sw.retry_after("k", now)
+    assert wait > 0
+    assert _allowed(sw, "k", now + wait + 1e-6)
+    assert not _allowed(sw, "k", now + wait - 0.01)
+
+
+def test_retry_after_known_values():
+    sw = SlidingWindow(2, WINDOW)
+    sw.hit("k", 1.0)
+    sw.hit("k", 2.0)
+    # 下一窗口起点 60 秒，再过半个窗口上一窗口权重降到 0.5：2 × 0.5 + 1 ≤ 2
+    assert sw.retry_after("k", 10.0) == pytest.approx(80.0)
+    # 两个窗口之后计数全部失效
+    assert sw.retry_after("k", 2 * WINDOW + 1) == 0.0
+
+
+def test_retry_after_under_limit_and_unlimited():
+    sw = SlidingWindow(3, WINDOW)
+    sw.hit("k", 0.0)
+    assert sw.retry_after("k", 1.0) == 0.0
+    assert sw.retry_after("other", 1.0) == 0.0
+    unlimited = SlidingWindow(0, WINDOW)
+    for t in range(100):
+        unlimited.hit("k", float(t))
+    assert unlimited.retry_after("k", 100.0) == 0.0
+    assert len(unlimited) == 0
+
+
+def test_stale_keys_are_evicted():
+    sw = SlidingWindow(5, WINDOW)
+    for key in range(10):
+        sw.hit(key, 0.0)
+    sw.hit("new", 2 * WINDOW + 1)
+    assert len(sw) == 1
+
+
+def test_rejected_acquire_consumes_no_quota():
+    limiter = RateLimiter(per_user=1, per_chat=5, per_global=5, window=WINDOW)
+    assert limiter.acquire(1, 10, 0.0) == (None, 0.0)
+    tier, wait = limiter.acquire(1, 10, 1.0)
+    assert tier == "user" and wait > 0
+    # 被拒的请求不计入聊天 / 全局额度
+    assert limiter.tiers["chat"].retry_after(10, 1.0) == 0.0
+    assert limiter.acquire(2, 10, 1.0) == (None, 0.0)
+
+
+async def _drain(queue: DelayQueue):
+    await asyncio.sleep(0)
+    if queue._running:
+        await asyncio.gather(*queue._running)
+
+
+def _recorder(log: list, name: str):
+    async def run():
+        log.append(name)
+    return lambda: run()
+
+
+def test_step_keeps_per_chat_fifo_when_blocked():
+    async def main():
+        limiter = RateLimiter(per_user=1, window=WINDOW)
+        limiter.hit(1, 0)  # 用户 1 本窗口额度已用完
+        queue = DelayQueue(limiter, maxsize=10, max_delay=600)
+        log: list[str] = []
+        queue.submit(1, -100, _recorder(log, "a1"), tier="user")
+        queue.submit(2, -100, _recorder(log, "a2"))  # 用户 2 有额度，但同聊天前一条仍在排队
+        queue.submit(3, -200, _recorder(log, "b1"))
+        queue._worker.cancel()
+
+        sleep = queue._step()
+        await _drain(queue)
+        assert log == ["b1"]
+        assert sleep is not None and sleep > 0
+        assert [item.chat_id for item in queue._items] == [-100, -100]
+        assert queue.has_pending(-100) and not queue.has_pending(-200)
+
+        limiter.tiers["user"]._slots.clear()  # 额度恢复
+        assert queue._step() is None
+        await _drain(queue)
+        assert log == ["b1", "a1", "a2"]
+        assert len(queue) == 0 and not queue.has_pending(-100)
+
+    asyncio.run(main())
+
+
+def test_step_drops_expired_items():
+    async def main():
+        limiter = RateLimiter(per_user=1, window=WINDOW)
+        limiter.hit(1, 0)
+        queue = DelayQueue(limiter, maxsize=10, max_delay=5)
+        log: list[str] = []
+        queue.submit(1, -100, _recorder(log, "old"), tier="user")
+        queue.submit(1, -100, _recorder(log, "new"), tier="user")
+        queue._worker.cancel()
+        queue._items[0].queued_at -= 10
+
+        queue._step()
+        await _drain(queue)
+        assert log == []
+        assert len(queue) == 1
+        assert queue.stats["expired"] == 1 and queue.stats["dropped"] == 0
+        assert queue.has_pending(-100)
+
+        queue._items[0].queued_at -= 10
+        assert queue._step() is None
+        assert queue.stats["expired"] == 2 and not queue.has_pending(-100)
+
+    asyncio.run(main())
+
+
+def test_submit_rejects_full_queue_and_long_wait():
+    async def main():
+        queue = DelayQueue(RateLimiter(per_user=1, window=WINDOW), maxsize=1, max_delay=30)
+        noop = _recorder([], "x")
+        assert not queue.submit(1, -100, noop, wait=31, tier="user")
+        assert queue.submit(1, -100, noop, wait=5, tier="user")
+        assert not queue.submit(2, -200, noop, wait=5, tier="user")
+        assert queue.stats == {"delayed": 1, "dropped": 2, "expired": 0}
+        await queue.close()
+        assert len(queue) == 0 and not queue.has_pending(-100)
+
+    asyncio.run(main())
@@ -241,7 +241,7 @@ merge_env_fields() {
     if ! grep -q "^MAX_TEXT_LENGTH=" "${ENV_FILE}" 2>/dev/null; then
         echo "" >> "${ENV_FILE}"
         echo "# ========== 限制设置 ==========" >> "${ENV_FILE}"
-        echo "MAX_TEXT_LENGTH=5000" >> "${ENV_FILE}"
+        echo "MAX_TEXT_LENGTH=20000" >> "${ENV_FILE}"
         CHANGED=1
     fi
 